@@ -0,0 +1,98 @@
+"""
+AI Schemas
+Data models for Gemini structured (JSON) output. They are passed to Gemini as
+response schemas and used to validate what comes back.
+"""
+
+import json
+import logging
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field, ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerEvaluation(BaseModel):
+    """Verdict for one answer in a batch evaluation"""
+    item: int = Field(description="Number of the answer being evaluated, starting at 1")
+    evaluation_level: Literal["correct", "partially_correct", "incorrect"]
+    feedback: str = Field(description="One or two encouraging sentences for a 5th grade student")
+    improvement: Optional[str] = Field(default=None, description="What to improve, if not fully correct")
+
+
+class QuizQuestion(BaseModel):
+    """A practice quiz question"""
+    question: str
+    type: Literal["multiple_choice", "true_false", "short_answer"]
+    options: List[str] = Field(default_factory=list, description="Four options for multiple_choice, otherwise empty")
+    answer: str = Field(description="The correct answer; for multiple_choice, the full text of the correct option")
+    page: Optional[int] = Field(default=None, description="Page number where the answer is found")
+    topic: Optional[str] = Field(default=None, description='Short name of the concept tested, e.g. "Fractions"')
+
+
+class BankQuestion(QuizQuestion):
+    """A question-bank item, tagged with its difficulty"""
+    difficulty: Literal["basic", "intermediate", "advanced"] = "basic"
+
+
+class ExamQuestion(BaseModel):
+    """A mock exam question with its answer key"""
+    question: str
+    type: Literal["multiple_choice", "short_answer"]
+    options: List[str] = Field(default_factory=list, description="Four options for multiple_choice, otherwise empty")
+    correct_answer: str = Field(description="For multiple_choice, the full text of the correct option")
+    topic: Optional[str] = Field(default=None, description='Short name of the concept tested, e.g. "Fractions"')
+
+
+class PriorityTopic(BaseModel):
+    """An exam-priority topic within a lesson"""
+    topic: str
+    priority: Literal["high", "medium", "low"]
+    description: str = Field(description="Why the topic is important")
+    study_time: str = Field(description='Estimated study time, e.g. "2 hours" or "30 minutes"')
+
+
+class HintLadderResponse(BaseModel):
+    """All five progressive hint levels for one question"""
+    gentle_nudge: str = Field(description="Level 1: a small clue or guiding question, no answer")
+    conceptual_hint: str = Field(description="Level 2: the key concept or approach needed")
+    step_guidance: str = Field(description="Level 3: the problem broken into steps for the student to work through")
+    detailed_help: str = Field(description="Level 4: specific guidance that still leaves the final step to the student")
+    complete_explanation: str = Field(description="Level 5: the complete solution with the reasoning for each step")
+
+    def levels(self):
+        return [self.gentle_nudge, self.conceptual_hint, self.step_guidance,
+                self.detailed_help, self.complete_explanation]
+
+
+def parse_items(text, item_model):
+    """
+    Parse a JSON array response, validating each item on its own
+
+    Items that fail validation are logged and skipped, so one malformed item
+    does not discard the rest.
+
+    Args:
+        text (str): JSON response text
+        item_model: Pydantic model each item must satisfy
+
+    Returns:
+        list: Validated model instances
+    """
+    try:
+        raw_items = json.loads(text or "[]")
+    except ValueError as e:
+        logger.warning(f"Response is not valid JSON for {item_model.__name__}: {e}")
+        return []
+    if isinstance(raw_items, dict):
+        # Tolerate {"items": [...]}-style wrappers
+        raw_items = next((value for value in raw_items.values() if isinstance(value, list)), [])
+
+    items = []
+    for raw in raw_items if isinstance(raw_items, list) else []:
+        try:
+            items.append(item_model.model_validate(raw))
+        except ValidationError as e:
+            logger.warning(f"Skipping invalid {item_model.__name__}: {e}")
+    return items
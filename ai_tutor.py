@@ -1,92 +1,51 @@
+import json
 import logging
-import os
-from google import genai
-from google.genai import types
 from number_formatter import format_indian_numbers
+from single_flight import single_flight, make_key, SingleFlightTimeout
+from prompt_builder import build_page_context, context_budget
+from gemini_client import generate_content, get_client, GeminiUnavailable
+from model_router import model_router
+from context_cache import context_cache
+from language_detector import normalize_language
+from math_solver import math_solver
 
 logger = logging.getLogger(__name__)
 
-class AITutor:
-    """AI Tutor class that uses Gemini to answer questions about documents"""
-    
-    def __init__(self):
-        self.client = genai.Client(api_key=os.environ.get("GOOGLE_API_KEY"))
-        self.model = "gemini-1.5-flash"
-    
-    def ask_question(self, document_id, question):
-        """
-        Ask a question about a specific document
-        
-        Args:
-            document_id (int): ID of the document to query
-            question (str): The question to ask
-            
-        Returns:
-            dict: Contains the answer and relevant page references
-        """
-        try:
-            # Import here to avoid circular imports
-            from models import Document, DocumentPage
-            
-            # Get the document and its pages
-            document = Document.query.get(document_id)
-            if not document:
-                return {"error": "Document not found"}
-            
-            pages = DocumentPage.query.filter_by(document_id=document_id).order_by(DocumentPage.page_number).all()
-            if not pages:
-                return {"error": "No content found for this document"}
-            
-            # Prepare the context from all pages
-            context = self._prepare_context(document, pages)
-            
-            # Create the prompt
-            system_prompt = """You are an AI tutor helping 5th grade students (age 10-11) learn from their CBSE textbooks. Your goal is to provide detailed, educational answers that help students understand concepts thoroughly.
-
-            Guidelines:
-            - Support multiple languages: English, Hindi, Telugu, and other Indian languages
-            - Respond in the same language as the student's question when possible
-            - For Hindi/Telugu content, provide explanations in Hindi/Telugu or mix with English as appropriate for 5th graders
-            - Use simple, clear language appropriate for 5th graders
-            - Provide comprehensive answers with rich details from the textbook content
-            - Include relevant examples, explanations, and connections mentioned in the lesson
-            - Break down complex concepts into smaller, digestible parts
-            - Use encouraging and patient tone
-            - Always reference specific page numbers where information is found
-            - Include additional context and background information from the lesson
-            - Help students understand WHY things work the way they do, not just WHAT they are
-            - Connect concepts to real-life examples when possible
-            - If the question can't be answered from the provided content, say so clearly
-            - For poetry/literature questions, provide detailed analysis including themes, meanings, and literary devices
-
-            CRITICAL FOR MATHEMATICS:
-            - For ALL Math questions, you MUST provide step-by-step solutions with detailed explanations
-            - Never give just a final answer - always show the complete working
-            - Explain the reasoning behind each step
-            - Use proper mathematical formatting with clear steps
-            - Help students understand the concept, not just get the answer
-            - Include why each mathematical rule or method is used
-            
-            CRITICAL FOR INDIAN NUMBERS:
-            - When writing Indian currency amounts, use proper Indian numbering system
-            - Write ₹1,50,000 as "one lakh fifty thousand" NOT "one thousand fifty thousand"
-            - Write ₹10,000 as "ten thousand" NOT "ten zero zero zero"
-            - Write ₹2,00,000 as "two lakh" NOT "two thousand zero thousand"
-            - Always use Indian place value system: lakh (100,000), crore (10,000,000)
-            - This is essential for proper pronunciation and understanding
-            """
-            
-            user_prompt = f"""Based on the following lesson content, please provide a detailed and comprehensive answer to the student's question.
+# Static tutor instructions, shared by every question so they can be cached
+# together with a document's lesson context
+TUTOR_SYSTEM_PROMPT = """You are an AI tutor helping 5th grade students (age 10-11) learn from their CBSE textbooks. Your goal is to provide detailed, educational answers that help students understand concepts thoroughly.
 
-LESSON: {document.lesson_title}
-SUBJECT: {document.subject}
-
-IMPORTANT: The SUBJECT is "{document.subject}" - if this is "Maths", you MUST use the structured format with **Question:**, **Solution:**, **Step 1:**, **Step 2:**, etc. DO NOT use paragraph format for Math questions.
-
-CONTENT:
-{context}
-
-STUDENT'S QUESTION: {question}
+Guidelines:
+- Support multiple languages: English, Hindi, Telugu, and other Indian languages
+- Respond in the same language as the student's question when possible
+- For Hindi/Telugu content, provide explanations in Hindi/Telugu or mix with English as appropriate for 5th graders
+- Use simple, clear language appropriate for 5th graders
+- Provide comprehensive answers with rich details from the textbook content
+- Include relevant examples, explanations, and connections mentioned in the lesson
+- Break down complex concepts into smaller, digestible parts
+- Use encouraging and patient tone
+- Always reference specific page numbers where information is found
+- Include additional context and background information from the lesson
+- Help students understand WHY things work the way they do, not just WHAT they are
+- Connect concepts to real-life examples when possible
+- If the question can't be answered from the provided content, say so clearly
+- For poetry/literature questions, provide detailed analysis including themes, meanings, and literary devices
+
+CRITICAL FOR MATHEMATICS:
+- For ALL Math questions, you MUST provide step-by-step solutions with detailed explanations
+- Never give just a final answer - always show the complete working
+- Explain the reasoning behind each step
+- Use proper mathematical formatting with clear steps
+- Help students understand the concept, not just get the answer
+- Include why each mathematical rule or method is used
+
+CRITICAL FOR INDIAN NUMBERS:
+- When writing Indian currency amounts, use proper Indian numbering system
+- Write ₹1,50,000 as "one lakh fifty thousand" NOT "one thousand fifty thousand"
+- Write ₹10,000 as "ten thousand" NOT "ten zero zero zero"
+- Write ₹2,00,000 as "two lakh" NOT "two thousand zero thousand"
+- Always use Indian place value system: lakh (100,000), crore (10,000,000)
+- This is essential for proper pronunciation and understanding
 
 Instructions for your response:
 CRITICAL LANGUAGE REQUIREMENT - This MUST be followed exactly:
@@ -94,7 +53,7 @@ CRITICAL LANGUAGE REQUIREMENT - This MUST be followed exactly:
 - If SUBJECT is "Telugu": Respond ONLY in Telugu language (తెలుగులో మాత్రమే సమాధానం ఇవ్వండి)
 - If SUBJECT is "English", "Maths", "Science", "Social", "IT-Computers", "GK", or "Value Education": Respond ONLY in English language
 
-CHECK THE SUBJECT ABOVE AND USE THE CORRECT LANGUAGE FOR YOUR ENTIRE RESPONSE.
+CHECK THE LESSON'S SUBJECT AND USE THE CORRECT LANGUAGE FOR YOUR ENTIRE RESPONSE.
 
 CRITICAL FOR MATHEMATICS QUESTIONS:
 If the SUBJECT is "Maths", you MUST format your response EXACTLY like this example (this is MANDATORY):
@@ -144,26 +103,150 @@ Subject-specific guidelines:
 6. Include any interesting facts or connections mentioned in the textbook
 7. If the question is not related to the document content, politely explain what the document is actually about and suggest relevant questions
 
-Make your answer educational, detailed, and engaging for a 5th grade student. Handle multilingual content appropriately. If the question doesn't match the document content, provide helpful guidance about what the lesson contains.
+Make your answer educational, detailed, and engaging for a 5th grade student. Handle multilingual content appropriately. If the question doesn't match the document content, provide helpful guidance about what the lesson contains."""
+
+LESSON_CONTEXT_TEMPLATE = """Based on the following lesson content, please provide a detailed and comprehensive answer to the student's question.
+
+LESSON: {lesson_title}
+SUBJECT: {subject}
+
+IMPORTANT: The SUBJECT is "{subject}" - if this is "Maths", you MUST use the structured format with **Question:**, **Solution:**, **Step 1:**, **Step 2:**, etc. DO NOT use paragraph format for Math questions.
+
+CONTENT:
+{context}"""
+
+QUESTION_TEMPLATE = """STUDENT'S QUESTION: {question}
 
 FINAL REMINDER FOR MATHS: If subject is "Maths", you MUST start your response with "**Question:**" followed by "**Solution:**" followed by "**Step 1:**" etc. DO NOT write paragraphs for Math questions."""
+
+QUIZ_SYSTEM_PROMPT = """You are an AI tutor creating quiz questions for 5th grade students (age 10-11).
+
+Guidelines:
+- Create questions appropriate for 5th graders
+- Mix different types: multiple choice, true/false, and short answer
+- Focus on key concepts and important facts
+- Make questions clear and unambiguous
+- Include the page number where the answer can be found
+- Tag each question with the short name of the concept it tests (e.g. "Fractions")
+- Support multiple languages: English, Hindi, and Telugu"""
+
+QUIZ_PROMPT_TEMPLATE = """Based on this lesson content, create {num_questions} quiz questions for 5th grade students.
+
+LESSON: {lesson_title}
+SUBJECT: {subject}
+
+CONTENT:
+{context}
+
+CRITICAL LANGUAGE REQUIREMENT - This MUST be followed exactly:
+- If SUBJECT is "Hindi": Write ALL question text, options and answers ONLY in Hindi language (सभी प्रश्न हिंदी में बनाएं)
+- If SUBJECT is "Telugu": Write ALL question text, options and answers ONLY in Telugu language (అన్ని ప్రశ్నలు తెలుగులో మాత్రమే రచించండి)
+- If SUBJECT is "English", "Maths", "Science", "Social", "IT-Computers", "GK", or "Value Education": Write everything ONLY in English language
+
+Keep the JSON field names in English. Give four options for multiple choice questions and
+use the full text of the correct option as the answer."""
+
+EXAM_PROMPT_TEMPLATE = """
+Create 2-3 exam questions based on this {subject} lesson content for a 5th grade student.
+{language_instruction}
+
+Lesson: {lesson_title}
+Content: {context}
+
+Create a mix of:
+1. Multiple choice questions (4 options each; the correct answer is the full text of the correct option)
+2. Short answer questions
+
+Make questions appropriate for 5th grade level and test understanding of key concepts.
+Tag each question with the short name of the concept it tests (e.g. "Fractions").
+"""
+
+PRIORITY_TOPICS_PROMPT_TEMPLATE = """
+Analyze this {subject} lesson content and identify 3-4 priority topics for 5th grade students preparing for exams.
+{language_instruction}
+
+Lesson: {lesson_title}
+Content: {context}
+
+For each priority topic, provide the topic name, its priority level (high, medium, low),
+a description of why it's important and the estimated study time needed.
+
+Consider:
+- Curriculum importance for 5th grade
+- Typical exam weightage
+- Fundamental concepts that build to advanced topics
+- Common areas where students struggle
+
+Focus on core concepts that are most likely to appear in exams.
+"""
+
+LANGUAGE_INSTRUCTIONS = {
+    'hi': "Please write everything in Hindi language.",
+    'te': "Please write everything in Telugu language.",
+    'en': "Please write everything in English language."
+}
+
+class AITutor:
+    """AI Tutor class that uses Gemini to answer questions about documents"""
+    
+    def __init__(self):
+        self.client = get_client()
+    
+    def ask_question(self, document_id, question):
+        """
+        Ask a question about a specific document
+        
+        Args:
+            document_id (int): ID of the document to query
+            question (str): The question to ask
             
-            # Get response from Gemini
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=[
-                    types.Content(
-                        role="user", 
-                        parts=[types.Part(text=user_prompt)]
-                    )
-                ],
-                config=types.GenerateContentConfig(
-                    system_instruction=system_prompt,
-                    temperature=0,  # Zero temperature for maximum format consistency
-                    max_output_tokens=4000,  # Significantly increased for detailed, comprehensive answers
-                    response_mime_type="text/plain"  # Ensure plain text response for better handling
-                )
+        Returns:
+            dict: Contains the answer and relevant page references
+        """
+        from google.genai import types
+        
+        try:
+            # Import here to avoid circular imports
+            from models import Document, DocumentPage
+            
+            # Get the document and its pages
+            document = Document.query.get(document_id)
+            if not document:
+                return {"error": "Document not found"}
+            
+            pages = DocumentPage.query.filter_by(document_id=document_id).order_by(DocumentPage.page_number).all()
+            if not pages:
+                return {"error": "No content found for this document"}
+            
+            # Arithmetic the local solver recognises needs no Gemini call
+            if document.subject == 'Maths':
+                solution = math_solver.solve(question)
+                if solution:
+                    logger.info(f"Solved {solution.kind} question locally for document {document_id}")
+                    return {
+                        "answer": format_indian_numbers(self._make_kid_friendly(solution.text)),
+                        "document_title": document.lesson_title,
+                        "subject": document.subject,
+                        "total_pages": len(pages)
+                    }
+            
+            # Lesson context and tutor instructions are registered once per document;
+            # each question then only sends the student's question
+            route = model_router.route('ask_question', document.subject)
+            prefix = context_cache.get_prefix(
+                self.client, route.model, document.id,
+                version=f"{document.upload_date}|{len(pages)}",
+                build=lambda: self._build_question_prefix(document, pages)
             )
+            question_contents = [
+                types.Content(
+                    role="user",
+                    parts=[types.Part(text=QUESTION_TEMPLATE.format(question=question))]
+                )
+            ]
+            
+            # Get response from Gemini
+            response = self._generate_with_prefix(prefix, question_contents, route)
             
             if response.text:
                 logger.info(f"AI response received for document {document_id}, length: {len(response.text)}")
@@ -171,7 +254,6 @@ FINAL REMINDER FOR MATHS: If subject is "Maths", you MUST start your response wi
                 kid_friendly_answer = self._make_kid_friendly(response.text)
                 
                 # Apply Indian number formatting as post-processing
-                from number_formatter import format_indian_numbers
                 formatted_answer = format_indian_numbers(kid_friendly_answer)
                 
                 logger.info(f"Kid-friendly response prepared, length: {len(formatted_answer)}")
@@ -189,14 +271,189 @@ FINAL REMINDER FOR MATHS: If subject is "Maths", you MUST start your response wi
             logger.error(f"Error in ask_question: {str(e)}")
             return {"error": f"Sorry, I encountered an error: {str(e)}"}
     
-    def _prepare_context(self, document, pages):
-        """Prepare context from document pages"""
-        context_parts = []
+    def _build_question_prefix(self, document, pages):
+        """Build the cacheable system instruction and lesson context for a document"""
+        from google.genai import types
+        
+        context = self._prepare_context(document, pages, context_budget('ask_question'))
+        lesson_context = LESSON_CONTEXT_TEMPLATE.format(
+            lesson_title=document.lesson_title,
+            subject=document.subject,
+            context=context
+        )
+        return TUTOR_SYSTEM_PROMPT, [types.Content(role="user", parts=[types.Part(text=lesson_context)])]
+    
+    def _generate_with_prefix(self, prefix, question_contents, route):
+        """Answer using a registered prefix, resending it inline if its provider cache is gone"""
+        config_kwargs = route.generation_kwargs(
+            response_mime_type="text/plain"  # Ensure plain text response for better handling
+        )
+        contents, config = prefix.build_request(question_contents, **config_kwargs)
+        try:
+            return generate_content(self.client, 'ask_question', model=route.model, contents=contents, config=config)
+        except GeminiUnavailable:
+            raise
+        except Exception as e:
+            if not prefix.cache_name:
+                raise
+            # The cache expired early or was deleted by another worker
+            logger.warning(f"Context cache {prefix.cache_name} unusable, sending prefix inline: {e}")
+            context_cache.discard(self.client, prefix)
+            return generate_content(
+                self.client, 'ask_question',
+                model=route.model,
+                contents=prefix.contents + question_contents,
+                config=route.config(system_instruction=prefix.system_instruction, **config_kwargs)
+            )
+    
+    def forget_document(self, document_id):
+        """Invalidate cached prompt prefixes for a deleted document"""
+        context_cache.invalidate(self.client, document_id)
+    
+    def _prepare_context(self, document, pages, max_tokens=None):
+        """Prepare context from document pages, trimmed on page/paragraph boundaries to max_tokens"""
+        return build_page_context(pages, max_tokens)
+    
+    def generate_bank_questions(self, document, pages, num_questions, avoid=None):
+        """
+        Generate a batch of difficulty-tagged questions for the question bank
+        
+        Args:
+            document: Document row
+            pages (list): The document's pages
+            num_questions (int): Number of questions to generate
+            avoid (list): Existing question texts that should not be repeated
+            
+        Returns:
+            list: Question dicts with question, type, options, answer, page, difficulty and topic
+        """
+        from ai_schemas import BankQuestion, parse_items
         
-        for page in pages:
-            context_parts.append(f"--- Page {page.page_number} ---\n{page.content}\n")
+        prompt = QUIZ_PROMPT_TEMPLATE.format(
+            num_questions=num_questions,
+            lesson_title=document.lesson_title,
+            subject=document.subject,
+            context=self._prepare_context(document, pages, context_budget('quiz'))
+        )
+        prompt += "\n\nTag each question with its difficulty (basic, intermediate or advanced) and include all three levels."
+        if avoid:
+            prompt += "\n\nDo NOT repeat any of these existing questions:\n" + "\n".join(f"- {text}" for text in avoid)
+        
+        route = model_router.route('question_bank', document.subject)
+        response = generate_content(
+            self.client, 'question_bank',
+            model=route.model,
+            contents=prompt,
+            config=route.config(
+                system_instruction=QUIZ_SYSTEM_PROMPT,
+                response_mime_type="application/json",
+                response_schema=list[BankQuestion]
+            )
+        )
+        
+        return [question.model_dump() for question in parse_items(response.text, BankQuestion)]
+    
+    def generate_exam_questions(self, document, pages):
+        """
+        Generate mock exam questions with answer keys for one document
+        
+        Returns:
+            list: Question dicts with question, type, options, correct_answer, topic and chapter
+        """
+        from ai_schemas import ExamQuestion, parse_items
+        
+        language = normalize_language(document.subject)
+        prompt = EXAM_PROMPT_TEMPLATE.format(
+            subject=document.subject,
+            language_instruction=LANGUAGE_INSTRUCTIONS[language],
+            lesson_title=document.lesson_title,
+            context=self._prepare_context(document, pages, context_budget('mock_exam'))
+        )
+        
+        route = model_router.route('mock_exam', document.subject)
+        response = generate_content(
+            self.client, 'mock_exam',
+            model=route.model,
+            contents=prompt,
+            config=route.config(
+                response_mime_type="application/json",
+                response_schema=list[ExamQuestion]
+            )
+        )
         
-        return "\n".join(context_parts)
+        chapter = document.lesson_title or f"Chapter {document.chapter_number}"
+        items = [dict(question.model_dump(), chapter=chapter) for question in parse_items(response.text, ExamQuestion)]
+        if items:
+            self.save_generated_items(document, 'mock_exam', items, route.model)
+        return items
+    
+    def get_priority_topics(self, document, pages):
+        """
+        Return exam-priority topics for a document, generating them on first use
+        
+        Returns:
+            list: Topic dicts with topic, priority, description, study_time,
+            chapter and subject
+        """
+        from ai_schemas import PriorityTopic, parse_items
+        
+        stored = self.load_generated_items(document, 'priority_topics')
+        if stored:
+            return stored
+        
+        language = normalize_language(document.subject)
+        prompt = PRIORITY_TOPICS_PROMPT_TEMPLATE.format(
+            subject=document.subject,
+            language_instruction=LANGUAGE_INSTRUCTIONS[language],
+            lesson_title=document.lesson_title,
+            context=self._prepare_context(document, pages, context_budget('priority_topics'))
+        )
+        
+        route = model_router.route('priority_topics', document.subject)
+        response = generate_content(
+            self.client, 'priority_topics',
+            model=route.model,
+            contents=prompt,
+            config=route.config(
+                response_mime_type="application/json",
+                response_schema=list[PriorityTopic]
+            )
+        )
+        
+        chapter = document.lesson_title or f"Chapter {document.chapter_number}"
+        items = [
+            dict(topic.model_dump(), chapter=chapter, subject=document.subject)
+            for topic in parse_items(response.text, PriorityTopic)
+        ]
+        if items:
+            self.save_generated_items(document, 'priority_topics', items, route.model)
+        return items
+    
+    def save_generated_items(self, document, content_type, items, model):
+        """Store validated generated items so later requests can reuse them"""
+        from models import db, GeneratedContent
+        
+        try:
+            db.session.add(GeneratedContent(
+                document_id=document.id,
+                content_type=content_type,
+                language=normalize_language(document.subject),
+                items=json.dumps(items, ensure_ascii=False),
+                model=model
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error storing generated {content_type} for document {document.id}: {e}")
+    
+    def load_generated_items(self, document, content_type):
+        """Return the most recently stored items of a type for a document, or an empty list"""
+        from models import GeneratedContent
+        
+        stored = GeneratedContent.query.filter_by(
+            document_id=document.id, content_type=content_type
+        ).order_by(GeneratedContent.created_date.desc()).first()
+        return json.loads(stored.items) if stored else []
     
     def _make_kid_friendly(self, text):
         """Convert markdown formatting to kid-friendly emojis"""
@@ -261,6 +518,9 @@ FINAL REMINDER FOR MATHS: If subject is "Maths", you MUST start your response wi
         """
         Generate quiz questions based on the document content
         
+        Concurrent requests for the same quiz (e.g. a whole class opening the
+        same chapter) share a single Gemini call.
+        
         Args:
             document_id (int): ID of the document
             num_questions (int): Number of questions to generate
@@ -268,6 +528,23 @@ FINAL REMINDER FOR MATHS: If subject is "Maths", you MUST start your response wi
         Returns:
             dict: Contains the quiz questions
         """
+        try:
+            return single_flight.do(
+                make_key('quiz', document_id, num_questions),
+                lambda: self._generate_quiz_questions(document_id, num_questions),
+                timeout=90,
+                shared=True,
+                share_result=lambda result: 'error' not in result
+            )
+        except SingleFlightTimeout as e:
+            logger.error(f"Timed out waiting for quiz generation: {str(e)}")
+            return {"error": "Quiz generation is taking longer than expected. Please try again."}
+    
+    def _generate_quiz_questions(self, document_id, num_questions):
+        """Generate quiz questions with a Gemini call"""
+        from google.genai import types
+        from ai_schemas import QuizQuestion, parse_items
+        
         try:
             # Import here to avoid circular imports
             from models import Document, DocumentPage
@@ -280,80 +557,36 @@ FINAL REMINDER FOR MATHS: If subject is "Maths", you MUST start your response wi
             if not pages:
                 return {"error": "No content found for this document"}
             
-            context = self._prepare_context(document, pages)
+            context = self._prepare_context(document, pages, context_budget('quiz'))
             
-            system_prompt = """You are an AI tutor creating quiz questions for 5th grade students (age 10-11).
-
-Guidelines:
-- Create questions appropriate for 5th graders
-- Mix different types: multiple choice, true/false, and short answer
-- Focus on key concepts and important facts
-- Make questions clear and unambiguous
-- Include the page number where the answer can be found
-- Return in a structured format
-- Support multiple languages: English, Hindi, and Telugu"""
-            
-            user_prompt = f"""Based on this lesson content, create {num_questions} quiz questions for 5th grade students.
-
-LESSON: {document.lesson_title}
-SUBJECT: {document.subject}
-
-CONTENT:
-{context}
-
-CRITICAL LANGUAGE REQUIREMENT - This MUST be followed exactly:
-- If SUBJECT is "Hindi": Generate ALL quiz questions, answers, and instructions ONLY in Hindi language (सभी प्रश्न हिंदी में बनाएं)
-- If SUBJECT is "Telugu": Generate ALL quiz questions, answers, and instructions ONLY in Telugu language (అన్ని ప్రశ్నలు తెలుగులో మాత్రమే రచించండి)
-- If SUBJECT is "English", "Maths", "Science", "Social", "IT-Computers", "GK", or "Value Education": Generate ALL quiz questions, answers, and instructions ONLY in English language
-
-CHECK THE SUBJECT ABOVE AND USE THE CORRECT LANGUAGE FOR YOUR ENTIRE RESPONSE INCLUDING QUESTIONS, ANSWERS, AND FORMATTING.
-
-Please format your response as:
-
-Question 1: [Question text in appropriate language]
-Type: [Multiple Choice/True False/Short Answer in appropriate language]
-Answer: [Correct answer in appropriate language]
-Page: [Page number where answer is found]
-
-Question 2: [Question text in appropriate language]
-Type: [Multiple Choice/True False/Short Answer in appropriate language]
-Answer: [Correct answer in appropriate language]
-Page: [Page number where answer is found]
-
-... and so on.
-
-IMPORTANT: If the subject is Hindi, use Hindi formatting labels like:
-प्रश्न 1: [प्रश्न]
-प्रकार: [बहुविकल्पीय/सत्य असत्य/लघु उत्तर]
-उत्तर: [सही उत्तर]
-पृष्ठ: [पृष्ठ संख्या]
-
-If the subject is Telugu, use Telugu formatting labels like:
-ప్రశ్న 1: [ప్రశ్న]
-రకం: [బహుళ ఎంపిక/సత్యం అసత్యం/చిన్న సమాధానం]
-సమాధానం: [సరైన సమాధానం]
-పేజీ: [పేజీ సంఖ్య]"""
-            
-            response = self.client.models.generate_content(
-                model=self.model,
+            route = model_router.route('quiz', document.subject)
+            response = generate_content(
+                self.client, 'quiz',
+                model=route.model,
                 contents=[
                     types.Content(
                         role="user", 
-                        parts=[types.Part(text=user_prompt)]
+                        parts=[types.Part(text=QUIZ_PROMPT_TEMPLATE.format(
+                            num_questions=num_questions,
+                            lesson_title=document.lesson_title,
+                            subject=document.subject,
+                            context=context
+                        ))]
                     )
                 ],
-                config=types.GenerateContentConfig(
-                    system_instruction=system_prompt,
-                    temperature=0.5,
-                    max_output_tokens=1500
+                config=route.config(
+                    system_instruction=QUIZ_SYSTEM_PROMPT,
+                    response_mime_type="application/json",
+                    response_schema=list[QuizQuestion]
                 )
             )
             
-            if response.text:
-                # Make quiz questions kid-friendly too
-                kid_friendly_quiz = self._make_kid_friendly(response.text)
+            questions = parse_items(response.text, QuizQuestion)
+            if questions:
+                items = [question.model_dump() for question in questions]
+                self.save_generated_items(document, 'quiz', items, route.model)
                 return {
-                    "quiz": kid_friendly_quiz,
+                    "questions": items,
                     "document_title": document.lesson_title,
                     "subject": document.subject
                 }
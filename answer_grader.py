@@ -0,0 +1,401 @@
+"""
+Answer Grader
+Deterministic local grading for answers that do not need an LLM: multiple
+choice letters, true/false, and numeric answers (integers, decimals,
+fractions, mixed numbers, percentages and Indian-grouped amounts). Pure
+arithmetic questions are solved with a safe expression evaluator. Anything
+else returns None so the caller can escalate to Gemini.
+"""
+
+import re
+import ast
+import math
+import string
+import logging
+import operator
+from fractions import Fraction
+
+from math_solver import UNITS, UNIT_LOOKUP
+
+logger = logging.getLogger(__name__)
+
+RELATIVE_TOLERANCE = Fraction(1, 10**6)
+ABSOLUTE_TOLERANCE = Fraction(1, 10**9)
+MAX_EXPONENT = 10
+
+MCQ_TYPES = {'multiple_choice', 'mcq'}
+TRUE_FALSE_TYPES = {'true_false', 'true/false', 'boolean'}
+NUMERIC_TYPES = {'numeric', 'math_problem', 'math', 'calculation'}
+
+TRUE_WORDS = {'true', 't', 'yes', 'y', 'correct', 'right', 'सही', 'सत्य', 'హా', 'అవును', 'నిజం', 'సరైనది'}
+FALSE_WORDS = {'false', 'f', 'no', 'n', 'wrong', 'incorrect', 'गलत', 'असत्य', 'కాదు', 'తప్పు'}
+
+# "B", "(b)", "b)", "Option B", "B. Delhi"
+MCQ_LETTER_PATTERN = re.compile(r'^\(?(?:option\s*)?([a-d])\s*(?:[).:\-]|$)\s*(.*)$', re.IGNORECASE)
+INDIAN_GROUPED_PATTERN = re.compile(r'(?<![\d.])\d{1,3}(?:,\d{2})*,\d{3}(?![\d,])')
+MIXED_NUMBER_PATTERN = re.compile(r'^(-?\d+)\s+(\d+)\s*/\s*(\d+)$')
+NUMBER_PATTERN = re.compile(r'^-?(?:\d+(?:\.\d*)?|\.\d+)(?:\s*/\s*\d+)?$')
+CURRENCY_PATTERN = re.compile(r'(₹|rs\.?|inr|rupees?|\$)', re.IGNORECASE)
+ARITHMETIC_PATTERN = re.compile(r'[\d.]+(?:\s*[-+*/×÷x^]\s*\(?\s*[\d.]+\s*\)?)+|\(\s*[\d.][\d.\s+\-*/×÷x^()]*\)[\d.\s+\-*/×÷x^()]*')
+# Questions that ask for an approximate answer, so a rounded decimal is right
+ROUNDING_PATTERN = re.compile(
+    r'\b(round(?:ed|ing)?|nearest|approximate(?:ly)?|estimate|decimal places?|correct to)\b', re.IGNORECASE
+)
+# One trailing word ("12 cm", "5 apples"); "4 is not the answer" is a sentence, not a quantity
+UNIT_SUFFIX_PATTERN = re.compile(r'(?<=[\d)])\s*([^\W\d_]+)$')
+TRAILING_ONLY_PATTERN = re.compile(r'\s+only$')
+ARITHMETIC_FILLER_PATTERN = re.compile(
+    r'\b(what|is|are|calculate|compute|find|solve|evaluate|simplify|work|out|the|value|of|answer|equals?)\b|[?=:,.!]',
+    re.IGNORECASE
+)
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+def grade_answer(question, student_answer, expected_answer=None, question_type=None, options=None):
+    """
+    Grade an answer locally when it can be decided deterministically
+
+    Args:
+        question (str): The question text
+        student_answer (str): The student's answer
+        expected_answer (str): Answer key, if known (e.g. "B", "True", "3/4")
+        question_type (str): Optional type hint such as 'multiple_choice'
+        options (list): Optional MCQ options, e.g. ["A) Delhi", "B) Mumbai"]
+
+    Returns:
+        dict or None: {"is_correct", "method", "expected"} or None when the
+        answer needs an LLM to judge
+    """
+    if not student_answer or not student_answer.strip():
+        return None
+    question_type = (question_type or "").strip().lower()
+
+    if expected_answer is None or not str(expected_answer).strip():
+        # Without a key we can still solve a pure arithmetic question ourselves
+        expected_value = solve_arithmetic_question(question or "")
+        if expected_value is None:
+            return None
+        student_value, student_unit = parse_quantity(student_answer)
+        if student_value is None or (student_unit and student_unit not in UNIT_LOOKUP):
+            return None
+        matched = numbers_match(student_value, expected_value, _decimal_places(student_answer))
+        return _result(matched, "arithmetic", _format_number(expected_value))
+
+    expected_answer = str(expected_answer).strip()
+
+    if question_type in MCQ_TYPES or (not question_type and options):
+        verdict = grade_multiple_choice(student_answer, expected_answer, options)
+        if verdict is not None:
+            return _result(verdict, "multiple_choice", expected_answer)
+
+    if question_type in TRUE_FALSE_TYPES or _truth_value(expected_answer) is not None:
+        expected_truth = _truth_value(expected_answer)
+        student_truth = _truth_value(student_answer)
+        if expected_truth is not None and student_truth is not None:
+            return _result(student_truth == expected_truth, "true_false", expected_answer)
+
+    expected_value, expected_unit = parse_quantity(expected_answer)
+    if expected_value is None and question_type in NUMERIC_TYPES:
+        expected_value = evaluate_expression(expected_answer)
+    if expected_value is not None:
+        student_value, student_unit = parse_quantity(student_answer)
+        if student_value is not None:
+            if student_unit and student_unit not in UNIT_LOOKUP and not (expected_unit and _same_unit(student_unit, expected_unit)):
+                # A word that is neither a known unit nor the key's ("4 marks" for "4") needs judging
+                return None
+            student_decimals = _decimal_places(student_answer)
+            if student_unit and expected_unit and not _same_unit(student_unit, expected_unit):
+                # "300 cm" for "3 m" is right, "3000 cm" for "3000 m" is not;
+                # units that can't be converted ("5 mangoes") need judging
+                student_value = convert_quantity(student_value, student_unit, expected_unit)
+                if student_value is None:
+                    return None
+                student_decimals = None
+            allow_rounding = bool(ROUNDING_PATTERN.search(question or ""))
+            if allow_rounding and student_decimals is None:
+                student_decimals = 0
+            matched = numbers_match(student_value, expected_value, student_decimals, allow_rounding)
+            if not matched and '%' in expected_answer and '%' not in student_answer:
+                # "50" for an expected "50%"
+                matched = numbers_match(student_value / 100, expected_value)
+            return _result(matched, "numeric", expected_answer)
+        if question_type in NUMERIC_TYPES:
+            return _result(False, "numeric", expected_answer)
+        return None
+
+    if _normalize_text(student_answer) == _normalize_text(expected_answer):
+        return _result(True, "exact", expected_answer)
+
+    # Free text that does not match the key verbatim - let the LLM judge it
+    return None
+
+
+def grade_multiple_choice(student_answer, expected_answer, options=None):
+    """
+    Compare MCQ answers by option letter or option text; None if undecidable
+
+    The key may be a letter ("B") or the option text ("Delhi"), and so may the
+    student's answer. Options may be lettered ("B) Delhi") or plain, in which
+    case their position gives the letter.
+    """
+    option_texts = {}
+    for position, option in enumerate(options or []):
+        letter, text = _split_option(option)
+        if letter is None and position < len(string.ascii_lowercase):
+            letter = string.ascii_lowercase[position]
+        if letter and letter not in option_texts:
+            option_texts[letter] = _normalize_text(text)
+
+    expected_letter, expected_text = _resolve_option(expected_answer, option_texts)
+    student_letter, student_text = _resolve_option(student_answer, option_texts)
+
+    if expected_letter and student_letter:
+        return student_letter == expected_letter
+    if option_texts and student_letter is None:
+        # Free text that isn't one of the options ("yes" for "True", "New Delhi")
+        return None
+    if expected_text and student_text:
+        return student_text == expected_text
+    return None
+
+
+def parse_number(text):
+    """
+    Parse a numeric answer into an exact Fraction
+
+    Accepts "42", "-3.5", "3/4", "1 1/2", "75%", "₹1,50,000", "x = 12" and a
+    single trailing unit word such as "12 cm" or "5 apples"; the unit is
+    ignored (use parse_quantity() to get it). More trailing words ("4 is not
+    the answer") make it not a number.
+
+    Returns:
+        Fraction or None
+    """
+    return parse_quantity(text)[0]
+
+
+def parse_quantity(text):
+    """
+    Parse a numeric answer and its trailing unit word
+
+    Currency symbols and words are not treated as units, so "₹20" and
+    "20 rupees" both parse as (20, None); a trailing "only" ("₹40 only") is
+    dropped. Any other single word is returned as the unit, for the caller to
+    check against known units or the key's unit.
+
+    Returns:
+        tuple: (Fraction or None, unit str or None)
+    """
+    if text is None:
+        return None, None
+    value = str(text).strip().lower()
+    if '=' in value:
+        value = value.rsplit('=', 1)[1]
+    value = CURRENCY_PATTERN.sub('', value)
+    value = INDIAN_GROUPED_PATTERN.sub(lambda m: m.group(0).replace(',', ''), value)
+    value = TRAILING_ONLY_PATTERN.sub('', value.strip().rstrip('.'))
+
+    unit = None
+    percent = value.endswith('%')
+    if percent:
+        value = value[:-1].strip()
+    else:
+        # Split off a trailing unit word ("12 cm", "5 apples")
+        match = UNIT_SUFFIX_PATTERN.search(value)
+        if match:
+            unit = match.group(1)
+            value = value[:match.start()].strip()
+
+    mixed = MIXED_NUMBER_PATTERN.match(value)
+    try:
+        if mixed:
+            whole, numerator, denominator = (int(group) for group in mixed.groups())
+            number = abs(whole) + Fraction(numerator, denominator)
+            number = -number if whole < 0 or value.startswith('-') else number
+        elif NUMBER_PATTERN.match(value):
+            number = Fraction(value.replace(' ', ''))
+        else:
+            return None, None
+    except (ValueError, ZeroDivisionError):
+        return None, None
+
+    return (number / 100 if percent else number), unit
+
+
+def convert_quantity(value, unit, target_unit):
+    """
+    Convert a value between metric, time or money units ("300 cm" -> 3 m)
+
+    Returns:
+        Fraction or None if the units are unknown or measure different things
+    """
+    unit, target_unit = UNIT_LOOKUP.get(unit), UNIT_LOOKUP.get(target_unit)
+    for sizes in UNITS.values():
+        if unit in sizes and target_unit in sizes:
+            return value * sizes[unit] / sizes[target_unit]
+    return None
+
+
+def numbers_match(student_value, expected_value, student_decimals=None, allow_rounding=False):
+    """
+    Compare two numbers with tolerance
+
+    A rounded answer ("0.33" for 1/3) is accepted when it equals the expected
+    value rounded half up to the student's number of decimal places, but only
+    if the expected value has no exact decimal form or the question asks for
+    rounding (allow_rounding). Otherwise "2.8" would pass for 2.75.
+    """
+    difference = abs(student_value - expected_value)
+    scale = max(abs(student_value), abs(expected_value))
+    if difference <= max(ABSOLUTE_TOLERANCE, RELATIVE_TOLERANCE * scale):
+        return True
+    if student_decimals is not None and (allow_rounding or not _terminates(expected_value)):
+        return _round_half_up(expected_value, student_decimals) == student_value
+    return False
+
+
+def evaluate_expression(expression):
+    """
+    Safely evaluate an arithmetic expression
+
+    Only numbers, + - * / ^ and parentheses are allowed; × ÷ and Indian digit
+    grouping are understood. Evaluation is exact (fractions), exponents are
+    bounded and nothing is ever passed to eval().
+
+    Returns:
+        Fraction or None
+    """
+    if not expression:
+        return None
+    text = INDIAN_GROUPED_PATTERN.sub(lambda m: m.group(0).replace(',', ''), expression)
+    text = text.replace('×', '*').replace('÷', '/').replace('^', '**').replace('−', '-')
+    text = re.sub(r'(?<=[\d)\s])x(?=[\s\d(])', '*', text)
+    if not re.fullmatch(r'[\d.\s+\-*/()]+', text):
+        return None
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+        return _evaluate_node(tree.body)
+    except (SyntaxError, ValueError, ZeroDivisionError, OverflowError, TypeError):
+        return None
+
+
+def solve_arithmetic_question(question):
+    """Return the value of a question that is only an arithmetic expression, e.g. "What is 3/4 + 1/8?" """
+    match = None
+    for candidate in ARITHMETIC_PATTERN.finditer(question):
+        if match is None or len(candidate.group(0)) > len(match.group(0)):
+            match = candidate
+    if not match:
+        return None
+
+    leftover = question[:match.start()] + " " + question[match.end():]
+    if ARITHMETIC_FILLER_PATTERN.sub(' ', leftover).strip():
+        # Words remain (a word problem or "round to") - not a pure expression
+        return None
+    return evaluate_expression(match.group(0).rstrip('.'))
+
+
+def _evaluate_node(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return Fraction(str(node.value))
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        left = _evaluate_node(node.left)
+        right = _evaluate_node(node.right)
+        if isinstance(node.op, ast.Pow):
+            if right.denominator != 1 or abs(right) > MAX_EXPONENT:
+                raise ValueError("Unsupported exponent")
+            right = int(right)
+        return _BINARY_OPERATORS[type(node.op)](left, right)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _UNARY_OPERATORS[type(node.op)](_evaluate_node(node.operand))
+    raise ValueError(f"Unsupported expression element: {type(node).__name__}")
+
+
+def _split_option(text):
+    match = MCQ_LETTER_PATTERN.match(str(text).strip())
+    if not match:
+        return None, str(text).strip()
+    return match.group(1).lower(), match.group(2).strip()
+
+
+def _resolve_option(answer, option_texts):
+    """Return (letter, normalized text) for an MCQ answer, filling in whichever is missing"""
+    letter, text = _split_option(answer)
+    if letter and not text:
+        # "B" on its own; without options it can't be turned into text
+        return letter, option_texts.get(letter, "")
+    text = _normalize_text(text)
+    if letter is None:
+        letter = next((key for key, option in option_texts.items() if option and option == text), None)
+    return letter, text
+
+
+def _truth_value(text):
+    normalized = _normalize_text(text)
+    if normalized in TRUE_WORDS:
+        return True
+    if normalized in FALSE_WORDS:
+        return False
+    return None
+
+
+def _normalize_text(text):
+    text = re.sub(r'[^\w\s]', ' ', str(text).lower())
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def _decimal_places(text):
+    match = re.search(r'\.(\d+)\s*[^\d]*$', str(text))
+    return len(match.group(1)) if match else None
+
+
+def _singular(word):
+    if word.endswith('es') and word[:-2].endswith(('s', 'x', 'ch', 'sh')):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def _same_unit(unit, other):
+    """True if two unit words name the same unit ("metre"/"m", "apple"/"apples")"""
+    unit, other = unit.lower(), other.lower()
+    return _singular(UNIT_LOOKUP.get(unit, unit)) == _singular(UNIT_LOOKUP.get(other, other))
+
+
+def _terminates(value):
+    """True if a fraction has an exact decimal form (its denominator is 2^a × 5^b)"""
+    denominator = value.denominator
+    for prime in (2, 5):
+        while denominator % prime == 0:
+            denominator //= prime
+    return denominator == 1
+
+
+def _round_half_up(value, places):
+    """Round the way pupils are taught: 0.25 -> 0.3, not banker's rounding"""
+    scale = Fraction(10) ** places
+    rounded = Fraction(math.floor(abs(value) * scale + Fraction(1, 2))) / scale
+    return rounded if value >= 0 else -rounded
+
+
+def _format_number(value):
+    if value.denominator == 1:
+        return str(value.numerator)
+    decimal = float(value)
+    return f"{value.numerator}/{value.denominator}" if len(repr(decimal)) > 8 else repr(decimal)
+
+
+def _result(is_correct, method, expected):
+    return {"is_correct": is_correct, "method": method, "expected": expected}
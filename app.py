@@ -1,53 +1,123 @@
 import os
 import logging
 
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 
-# Configure logging for debugging
-logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
 
 class Base(DeclarativeBase):
     pass
 
 db = SQLAlchemy(model_class=Base)
 
-# Create the app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
-
-# Configure the database
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///tutor_app.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-
-# Configure upload settings
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-app.config['UPLOAD_FOLDER'] = 'uploads'
-
-# Create upload directory if it doesn't exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
-# Initialize the app with the extension
-db.init_app(app)
-
-with app.app_context():
-    # Import models to ensure tables are created
-    import models
-    db.create_all()
-
-# Add custom template filters
-@app.template_filter('nl2br')
-def nl2br_filter(text):
-    """Convert newlines to HTML line breaks"""
-    if text is None:
-        return ''
-    return text.replace('\n', '<br>\n')
-
-# Import routes after app creation
-import routes
+
+def create_app(config=None):
+    """
+    Build and configure the Flask application
+
+    Creating the app does no database or network work, so it is cheap enough
+    to call from gunicorn's master with --preload. Tables are created
+    separately by init_db() or `flask --app main init-db`.
+
+    Args:
+        config (dict): Optional settings applied over the defaults
+
+    Returns:
+        Flask: The configured application
+    """
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
+
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+
+    # Configure the database
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///tutor_app.db")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+        # Threaded workers keep a connection per in-flight request (also while it
+        # waits on Gemini), so the pool has to cover the worker's thread count
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", os.environ.get("GUNICORN_THREADS", "32"))),
+    }
+
+    # Configure upload settings
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    app.config['UPLOAD_FOLDER'] = 'uploads'
+
+    # Let the front proxy send generated audio: 'x-sendfile' (Apache, lighttpd)
+    # or 'x-accel-redirect' (nginx, with an internal location at the prefix)
+    app.config['AUDIO_OFFLOAD'] = os.environ.get('AUDIO_OFFLOAD')
+    app.config['AUDIO_ACCEL_PREFIX'] = os.environ.get('AUDIO_ACCEL_PREFIX', '/protected-audio/')
+
+    if config:
+        app.config.update(config)
+
+    # Create upload directory if it doesn't exist
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    # Initialize the app with the extension
+    db.init_app(app)
+    import models  # Register the tables on db.metadata
+
+    from routes import bp
+    app.register_blueprint(bp)
+
+    # Send Hindi/Telugu text and emoji as UTF-8 rather than 6-byte \u escapes
+    app.json.ensure_ascii = False
+
+    from response_compression import compressor
+    compressor.init_app(app)
+
+    # Add custom template filters
+    @app.template_filter('nl2br')
+    def nl2br_filter(text):
+        """Convert newlines to HTML line breaks"""
+        if text is None:
+            return ''
+        return text.replace('\n', '<br>\n')
+
+    @app.cli.command("init-db")
+    def init_db_command():
+        """Create missing database tables and add columns to existing ones"""
+        init_db(app)
+        click.echo("Database tables are up to date")
+
+    @app.cli.command("transcode-audio")
+    def transcode_audio_command():
+        """Transcode existing generated audio into AUDIO_PROFILE"""
+        from audio_transcoder import transcoder
+        click.echo(f"Transcoded {transcoder.transcode_all()} file(s) to {transcoder.profile_name}")
+
+    @app.cli.command("compress-static")
+    def compress_static_command():
+        """Write .br/.gz versions of static CSS and JS"""
+        from response_compression import compressor
+        click.echo(f"Wrote {compressor.precompress_static(app.static_folder)} precompressed file(s)")
+
+    return app
+
+
+def init_db(app):
+    """
+    Create any missing database tables and upgrade existing ones
+
+    Run once per deployment (gunicorn's master does it on start) rather than
+    in every worker as it imports the app.
+
+    Args:
+        app (Flask): Application whose database to initialize
+    """
+    from schema_migrations import upgrade_schema
+    with app.app_context():
+        db.create_all()
+        # create_all() never alters existing tables; add columns models gained since
+        upgrade_schema(db)
+        # Don't let forked workers inherit the connections used here
+        db.engine.dispose()
+    logger.info("Database tables are up to date")
@@ -0,0 +1,96 @@
+"""
+Audio Prefetcher
+Speculatively synthesizes upcoming reading chunks in the background so the
+browser finds their audio already on disk when it asks for it.
+"""
+
+import os
+import logging
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class AudioPrefetcher:
+    """Background synthesis queue with per-session cancellation"""
+
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="audio-prefetch")
+        self._lock = threading.Lock()
+        self._inflight = {}      # audio key -> Future
+        self._pending = {}       # session key -> list of (audio key, Future)
+        self._generations = {}   # session key -> generation of its current lookahead
+        self._next_generation = itertools.count(1)  # Process-wide, so a forgotten session's jobs never match again
+
+    def schedule(self, session_key, jobs):
+        """
+        Queue lookahead synthesis jobs for a reading session
+
+        Any lookahead still queued for the session is superseded, so only the
+        chunks following the student's current position are synthesized.
+
+        Args:
+            session_key (str): Identifies the reading session
+            jobs (list): List of (audio_key, callable) tuples
+        """
+        with self._lock:
+            generation = self._cancel_locked(session_key)
+            futures = []
+            for audio_key, synthesize in jobs:
+                if audio_key in self._inflight:
+                    continue
+                future = self._executor.submit(self._run, session_key, generation, audio_key, synthesize)
+                self._inflight[audio_key] = future
+                futures.append((audio_key, future))
+            if futures:
+                self._pending[session_key] = futures
+            else:
+                self._generations.pop(session_key, None)
+
+        if futures:
+            logger.debug(f"Prefetching {len(futures)} audio chunk(s) for session {session_key}")
+
+    def cancel(self, session_key):
+        """Cancel lookahead for a session (student stopped or jumped pages)"""
+        with self._lock:
+            self._cancel_locked(session_key)
+            self._generations.pop(session_key, None)
+
+    def _cancel_locked(self, session_key):
+        generation = next(self._next_generation)
+        self._generations[session_key] = generation
+        for audio_key, future in self._pending.pop(session_key, []):
+            # Jobs that never started will not reach _run's cleanup
+            if future.cancel():
+                self._inflight.pop(audio_key, None)
+        return generation
+
+    def _run(self, session_key, generation, audio_key, synthesize):
+        try:
+            with self._lock:
+                if self._generations.get(session_key) != generation:
+                    return None
+            return synthesize()
+        except Exception as e:
+            logger.warning(f"Audio prefetch failed for {audio_key}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._inflight.pop(audio_key, None)
+                self._finish_locked(session_key, generation, audio_key)
+
+    def _finish_locked(self, session_key, generation, audio_key):
+        """Forget a session once the last job of its current lookahead is done"""
+        if self._generations.get(session_key) != generation:
+            return
+        pending = [(key, future) for key, future in self._pending.get(session_key, []) if key != audio_key]
+        if pending:
+            self._pending[session_key] = pending
+        else:
+            self._pending.pop(session_key, None)
+            self._generations.pop(session_key, None)
+
+
+prefetcher = AudioPrefetcher(max_workers=int(os.environ.get("AUDIO_PREFETCH_WORKERS", "2")))
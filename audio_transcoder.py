@@ -0,0 +1,248 @@
+"""
+Audio Transcoder
+Re-encodes gTTS speech into a compact profile for slow school networks. gTTS
+returns 64 kbps MP3; speech stays clear at a fraction of that as low-bitrate
+mono MP3 or Opus. Each generated file is transcoded once, by ffmpeg in a
+background pool, and the compact version is served once it exists.
+
+The profile is chosen per deployment with AUDIO_PROFILE ('original',
+'speech-mp3' or 'speech-opus'). AUDIO_KEEP_ORIGINAL=1 keeps the gTTS file
+next to the compact one; otherwise it is removed after a successful
+transcode.
+"""
+
+import os
+import re
+import shutil
+import logging
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from single_flight import single_flight, make_key
+
+logger = logging.getLogger(__name__)
+
+AUDIO_DIR = os.path.join('static', 'audio')
+
+# Bitrate of the MP3s gTTS returns
+SOURCE_BITRATE_KBPS = 64
+
+PROFILES = {
+    'original': None,
+    # Plays everywhere MP3 does
+    'speech-mp3': {
+        'extension': 'mp3',
+        'mimetype': 'audio/mpeg',
+        'bitrate_kbps': 24,
+        'ffmpeg_args': ['-ac', '1', '-ar', '16000', '-codec:a', 'libmp3lame', '-b:a', '24k']
+    },
+    # Smaller still; needs a browser that plays Opus in WebM
+    'speech-opus': {
+        'extension': 'webm',
+        'mimetype': 'audio/webm',
+        'bitrate_kbps': 16,
+        'ffmpeg_args': ['-ac', '1', '-codec:a', 'libopus', '-b:a', '16k', '-application', 'voip']
+    }
+}
+
+AUDIO_MIMETYPES = {'mp3': 'audio/mpeg', 'webm': 'audio/webm'}
+
+# tts_<hash>.mp3 from gTTS, or tts_<hash>.<profile>.<ext> after transcoding
+AUDIO_FILENAME_PATTERN = re.compile(r'^tts_([0-9a-f]{32})(?:\.([a-z0-9-]+))?\.(mp3|webm)$')
+
+
+def find_ffmpeg():
+    """Return the path of the ffmpeg binary (FFMPEG_BINARY or ffmpeg on PATH), or '' if missing"""
+    return shutil.which(os.environ.get('FFMPEG_BINARY', 'ffmpeg')) or ''
+
+
+class AudioTranscoder:
+    """Background transcoding of generated speech into the deployment's profile"""
+
+    def __init__(self, audio_dir, profile='original', keep_original=False, max_workers=2, min_savings=0.1):
+        if profile not in PROFILES:
+            logger.warning(f"Unknown audio profile '{profile}', keeping original audio")
+            profile = 'original'
+        self.audio_dir = audio_dir
+        self.profile_name = profile
+        self.profile = PROFILES[profile]
+        self.keep_original = keep_original
+        self.min_savings = min_savings
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="audio-transcode")
+        self._lock = threading.Lock()
+        self._scheduled = set()
+        self._not_smaller = set()  # Files the profile could not shrink enough
+        self._ffmpeg = None
+        self._served = {"files": 0, "bytes": 0, "original_bytes": 0}
+
+    def compact_filename(self, filename):
+        """Return the compact filename for a gTTS file, or None when not transcoding"""
+        match = AUDIO_FILENAME_PATTERN.match(filename)
+        if not self.profile or not match or match.group(2):
+            return None
+        return f"tts_{match.group(1)}.{self.profile_name}.{self.profile['extension']}"
+
+    def served_filename(self, filename):
+        """
+        Return the file to give clients for a generated gTTS file
+
+        Args:
+            filename (str): gTTS filename (tts_<hash>.mp3)
+
+        Returns:
+            str: The compact file if it exists, else the original if it exists, else None
+        """
+        compact = self.compact_filename(filename)
+        if compact and os.path.exists(os.path.join(self.audio_dir, compact)):
+            return compact
+        if os.path.exists(os.path.join(self.audio_dir, filename)):
+            return filename
+        return None
+
+    def schedule(self, filename):
+        """Queue a gTTS file for transcoding unless it is done, queued or not needed"""
+        compact = self.compact_filename(filename)
+        if not compact or os.path.exists(os.path.join(self.audio_dir, compact)) or not self._ffmpeg_path():
+            return
+        with self._lock:
+            if filename in self._scheduled or filename in self._not_smaller:
+                return
+            self._scheduled.add(filename)
+        self._executor.submit(self._transcode_in_background, filename, compact)
+
+    def transcode_all(self):
+        """
+        Transcode every gTTS file that has no compact version yet, in this thread
+
+        Returns:
+            int: Number of files transcoded
+        """
+        if not self.profile or not self._ffmpeg_path():
+            return 0
+        transcoded = 0
+        for filename in sorted(os.listdir(self.audio_dir)):
+            compact = self.compact_filename(filename)
+            if compact and not os.path.exists(os.path.join(self.audio_dir, compact)):
+                transcoded += 1 if self._transcode_once(filename, compact) else 0
+        return transcoded
+
+    def record_served(self, filename, byte_count):
+        """Count bytes sent for a compact file and what the original would have cost"""
+        match = AUDIO_FILENAME_PATTERN.match(filename)
+        if not match or not match.group(2):
+            return
+        profile = PROFILES.get(match.group(2))
+        ratio = SOURCE_BITRATE_KBPS / profile['bitrate_kbps'] if profile else 1
+        with self._lock:
+            self._served["files"] += 1
+            self._served["bytes"] += byte_count
+            self._served["original_bytes"] += int(byte_count * ratio)
+
+    def report(self):
+        """
+        Report storage and bandwidth savings
+
+        Storage comes from the audio directory, so it covers every worker;
+        an original that was removed is estimated from the bitrate ratio.
+        Bandwidth covers compact files served by this worker.
+
+        Returns:
+            dict: Profile, storage and bandwidth figures in bytes
+        """
+        originals = {}
+        compacts = {}
+        for entry in os.scandir(self.audio_dir):
+            match = AUDIO_FILENAME_PATTERN.match(entry.name)
+            if not match:
+                continue
+            target = compacts if match.group(2) else originals
+            target[match.group(1)] = (match.group(2), entry.stat().st_size)
+
+        stored_bytes = sum(size for _, size in originals.values()) + sum(size for _, size in compacts.values())
+        without_transcoding = sum(size for _, size in originals.values())
+        for digest, (profile_name, size) in compacts.items():
+            if digest not in originals:
+                profile = PROFILES.get(profile_name)
+                without_transcoding += int(size * SOURCE_BITRATE_KBPS / profile['bitrate_kbps']) if profile else size
+
+        with self._lock:
+            served = dict(self._served)
+        return {
+            "profile": self.profile_name,
+            "keep_original": self.keep_original,
+            "storage": {
+                "original_files": len(originals),
+                "compact_files": len(compacts),
+                "stored_bytes": stored_bytes,
+                "bytes_without_transcoding": without_transcoding,
+                "saved_bytes": without_transcoding - stored_bytes
+            },
+            "bandwidth": {
+                "compact_responses": served["files"],
+                "sent_bytes": served["bytes"],
+                "bytes_without_transcoding": served["original_bytes"],
+                "saved_bytes": served["original_bytes"] - served["bytes"]
+            }
+        }
+
+    def _transcode_in_background(self, filename, compact):
+        try:
+            # Only one worker transcodes a given file at a time
+            single_flight.do(make_key('transcode', filename), lambda: self._transcode_once(filename, compact),
+                             timeout=120, shared=True)
+        except Exception as e:
+            logger.error(f"Error transcoding {filename}: {e}")
+        finally:
+            with self._lock:
+                self._scheduled.discard(filename)
+
+    def _transcode_once(self, filename, compact):
+        source = os.path.join(self.audio_dir, filename)
+        target = os.path.join(self.audio_dir, compact)
+        if os.path.exists(target) or not os.path.exists(source):
+            return False
+
+        temp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.part"
+        try:
+            subprocess.run(
+                [self._ffmpeg_path(), '-nostdin', '-loglevel', 'error', '-y', '-i', source,
+                 *self.profile['ffmpeg_args'], '-f', self.profile['extension'], temp_path],
+                check=True, capture_output=True, timeout=120
+            )
+            original_size = os.path.getsize(source)
+            compact_size = os.path.getsize(temp_path)
+            if compact_size > original_size * (1 - self.min_savings):
+                logger.info(f"Keeping original {filename}: {self.profile_name} saves too little "
+                            f"({original_size} -> {compact_size} bytes)")
+                with self._lock:
+                    self._not_smaller.add(filename)
+                return False
+            os.replace(temp_path, target)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"ffmpeg failed for {filename}: {e.stderr.decode('utf-8', 'replace').strip()}")
+            return False
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        if not self.keep_original:
+            os.remove(source)
+        logger.info(f"Transcoded {filename} to {self.profile_name}: {original_size} -> {compact_size} bytes "
+                    f"({100 - compact_size * 100 // original_size}% smaller)")
+        return True
+
+    def _ffmpeg_path(self):
+        if self._ffmpeg is None:
+            self._ffmpeg = find_ffmpeg()
+            if not self._ffmpeg and self.profile:
+                logger.warning(f"ffmpeg not found; serving original audio instead of {self.profile_name}")
+        return self._ffmpeg
+
+
+transcoder = AudioTranscoder(
+    AUDIO_DIR,
+    profile=os.environ.get('AUDIO_PROFILE', 'original'),
+    keep_original=os.environ.get('AUDIO_KEEP_ORIGINAL') == '1',
+    max_workers=int(os.environ.get('AUDIO_TRANSCODE_WORKERS', '2'))
+)
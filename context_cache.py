@@ -0,0 +1,214 @@
+"""
+Context Cache
+Registers stable prompt prefixes - the tutor's system instructions plus one
+document's lesson content - so follow-up questions on the same chapter only
+send the new question. Uses Gemini context caching where the model supports
+it and falls back to a local in-memory prefix cache otherwise.
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+
+from prompt_builder import estimate_tokens
+from gemini_client import is_available
+
+logger = logging.getLogger(__name__)
+
+
+class CachedPrefix:
+    """A registered prompt prefix and, if provider-cached, its cache handle"""
+
+    def __init__(self, key, document_id, model, system_instruction, contents,
+                 cache_name=None, expires_at=None):
+        self.key = key
+        self.document_id = document_id
+        self.model = model
+        self.system_instruction = system_instruction
+        self.contents = contents
+        self.cache_name = cache_name
+        self.expires_at = expires_at
+
+    def is_expired(self):
+        return self.expires_at is not None and time.time() >= self.expires_at
+
+    def build_request(self, question_contents, **config_kwargs):
+        """
+        Combine the prefix with the per-request contents
+
+        Returns:
+            tuple: (contents, GenerateContentConfig) ready for generate_content
+        """
+        from google.genai import types
+
+        if self.cache_name:
+            # The cached content already carries the system instruction
+            return question_contents, types.GenerateContentConfig(cached_content=self.cache_name, **config_kwargs)
+        return self.contents + question_contents, types.GenerateContentConfig(
+            system_instruction=self.system_instruction, **config_kwargs
+        )
+
+
+class LocalPrefixBackend:
+    """Keeps the assembled prefix in memory and sends it inline with each request"""
+
+    name = "local"
+
+    def create(self, client, key, document_id, model, system_instruction, contents, ttl):
+        return CachedPrefix(key, document_id, model, system_instruction, contents,
+                            expires_at=time.time() + ttl)
+
+    def delete(self, client, prefix):
+        pass
+
+    def delete_for_document(self, client, document_id):
+        pass
+
+
+class GeminiPrefixBackend:
+    """Stores the prefix with Gemini's context caching so only the question is billed in full"""
+
+    name = "gemini"
+
+    def __init__(self, min_tokens=4096, retry_after=600):
+        self.min_tokens = min_tokens
+        self.retry_after = retry_after
+        self._unavailable_until = {}  # model -> timestamp
+
+    def create(self, client, key, document_id, model, system_instruction, contents, ttl):
+        from google.genai import types
+
+        if time.time() < self._unavailable_until.get(model, 0) or not is_available(model):
+            return None
+
+        prompt_tokens = estimate_tokens(system_instruction) + sum(
+            estimate_tokens("".join(part.text or "" for part in content.parts)) for content in contents
+        )
+        if prompt_tokens < self.min_tokens:
+            # Below the provider's minimum cacheable size
+            return None
+
+        try:
+            cache = client.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    display_name=key,
+                    system_instruction=system_instruction,
+                    contents=contents,
+                    ttl=f"{ttl}s"
+                )
+            )
+        except Exception as e:
+            logger.warning(f"Context caching unavailable for {model}, using local prefixes: {e}")
+            self._unavailable_until[model] = time.time() + self.retry_after
+            return None
+
+        logger.info(f"Created context cache {cache.name} for document {document_id} (~{prompt_tokens} tokens)")
+        # Expire our handle a little early so we never reference a cache the provider dropped
+        return CachedPrefix(key, document_id, model, system_instruction, contents,
+                            cache_name=cache.name, expires_at=time.time() + ttl - 60)
+
+    def delete(self, client, prefix):
+        if not prefix.cache_name:
+            return
+        try:
+            client.caches.delete(name=prefix.cache_name)
+        except Exception as e:
+            logger.warning(f"Could not delete context cache {prefix.cache_name}: {e}")
+
+    def delete_for_document(self, client, document_id):
+        """Delete caches other workers created for the document"""
+        try:
+            for cache in client.caches.list():
+                if (cache.display_name or "").startswith(f"doc-{document_id}-"):
+                    client.caches.delete(name=cache.name)
+                    logger.info(f"Deleted context cache {cache.name} for document {document_id}")
+        except Exception as e:
+            logger.warning(f"Could not list context caches for document {document_id}: {e}")
+
+
+class ContextCache:
+    """Registry of per-document prompt prefixes with TTL and invalidation"""
+
+    def __init__(self, backends, ttl=3600):
+        self.backends = backends
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._prefixes = {}  # (document_id, model) -> CachedPrefix
+
+    def get_prefix(self, client, model, document_id, version, build):
+        """
+        Return the registered prefix for a document, creating it if needed
+
+        Args:
+            client: google.genai Client
+            model (str): Model the prefix is used with
+            document_id (int): Document the context belongs to
+            version (str): Changes whenever the document content changes
+            build (callable): Returns (system_instruction, contents); only
+                called when the prefix has to be (re)created
+
+        Returns:
+            CachedPrefix
+        """
+        with self._lock:
+            prefix = self._prefixes.get((document_id, model))
+        if prefix and not prefix.is_expired() and prefix.key.endswith(self._fingerprint(model, version)):
+            return prefix
+        if prefix:
+            self._drop(client, prefix)
+
+        system_instruction, contents = build()
+        key = f"doc-{document_id}-{self._fingerprint(model, version)}"
+
+        for backend in self.backends:
+            prefix = backend.create(client, key, document_id, model, system_instruction, contents, self.ttl)
+            if prefix:
+                break
+
+        with self._lock:
+            self._prefixes[(document_id, model)] = prefix
+        return prefix
+
+    def discard(self, client, prefix):
+        """Forget a prefix whose provider cache turned out to be unusable"""
+        with self._lock:
+            if self._prefixes.get((prefix.document_id, prefix.model)) is prefix:
+                del self._prefixes[(prefix.document_id, prefix.model)]
+
+    def invalidate(self, client, document_id):
+        """Drop every prefix for a document, e.g. when it is deleted"""
+        with self._lock:
+            stale = [prefix for (doc_id, _), prefix in self._prefixes.items() if doc_id == document_id]
+            for prefix in stale:
+                del self._prefixes[(prefix.document_id, prefix.model)]
+        for prefix in stale:
+            self._drop(client, prefix)
+        for backend in self.backends:
+            backend.delete_for_document(client, document_id)
+
+    def _drop(self, client, prefix):
+        self.discard(client, prefix)
+        for backend in self.backends:
+            backend.delete(client, prefix)
+
+    def _fingerprint(self, model, version):
+        return hashlib.sha256(f"{model}|{version}".encode('utf-8')).hexdigest()[:16]
+
+
+def _build_backends():
+    backend_names = os.environ.get("CONTEXT_CACHE_BACKENDS", "gemini,local").split(",")
+    available = {
+        "gemini": lambda: GeminiPrefixBackend(min_tokens=int(os.environ.get("CONTEXT_CACHE_MIN_TOKENS", "4096"))),
+        "local": LocalPrefixBackend
+    }
+    backends = [available[name.strip()]() for name in backend_names if name.strip() in available]
+    # The local backend always works, so keep it as the last resort
+    if not any(isinstance(backend, LocalPrefixBackend) for backend in backends):
+        backends.append(LocalPrefixBackend())
+    return backends
+
+
+context_cache = ContextCache(_build_backends(), ttl=int(os.environ.get("CONTEXT_CACHE_TTL", "3600")))
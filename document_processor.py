@@ -1,6 +1,4 @@
 import logging
-from docx import Document as DocxDocument
-from docx.shared import Inches
 import re
 
 logger = logging.getLogger(__name__)
@@ -26,6 +24,7 @@ class DocumentProcessor:
             list: List of tuples (page_number, content)
         """
         try:
+            from docx import Document as DocxDocument
             doc = DocxDocument(file_path)
             pages = []
             current_page = 1
@@ -134,6 +133,7 @@ class DocumentProcessor:
     def extract_document_metadata(self, file_path):
         """Extract basic metadata from the document"""
         try:
+            from docx import Document as DocxDocument
             doc = DocxDocument(file_path)
             
             # Try to extract title from the first few paragraphs
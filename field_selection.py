@@ -0,0 +1,60 @@
+"""
+Field Selection
+Lets API clients ask for only the JSON fields they use with a `fields` query
+parameter of comma-separated dotted paths, e.g.
+
+    /api/document/3/pages?fields=document.title,pages.page_number,pages.content
+
+Paths apply to every item of a list, so `pages.content` keeps the content of
+each page. `success` and `message` are always kept so errors stay readable.
+"""
+
+ALWAYS_KEPT = ('success', 'message')
+
+
+def parse_fields(spec):
+    """
+    Parse a fields parameter into a tree of nested dicts
+
+    Args:
+        spec (str): Comma-separated dotted paths
+
+    Returns:
+        dict: {'pages': {'content': {}}, ...}; empty if no paths were given
+    """
+    tree = {}
+    for path in spec.split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def select_fields(value, tree):
+    """
+    Keep only the fields named in a tree from parse_fields()
+
+    Args:
+        value: Decoded JSON value
+        tree (dict): Field tree; an empty tree keeps the whole value
+
+    Returns:
+        The trimmed value
+    """
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [select_fields(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: select_fields(value[key], subtree) for key, subtree in tree.items() if key in value}
+    return value
+
+
+def trim_payload(payload, spec):
+    """Apply a fields parameter to a response payload, keeping success and message"""
+    tree = parse_fields(spec)
+    if tree and isinstance(payload, dict):
+        for key in ALWAYS_KEPT:
+            tree.setdefault(key, {})
+    return select_fields(payload, tree)
@@ -0,0 +1,534 @@
+"""
+Gemini Call Layer
+Single entry point for Gemini generate_content calls. Records estimated and
+actual prompt/response token usage per call site so prompt sizes, cost and
+latency can be tuned.
+
+Calls are also kept fast when Gemini is slow or failing:
+- each model has a circuit breaker; while it is open calls fail at once
+- failed attempts are retried with jittered backoff, within a retry budget
+  so retries cannot multiply load during an outage
+- attempts never outlive the HTTP request's deadline (set_request_deadline)
+- calls a student is waiting on are hedged: if the first request is slower
+  than usual a second one is sent and the first answer wins
+- when a call still fails, callers get the last good response for the same
+  prompt, then a smaller model's answer, then their own local template
+"""
+
+import os
+import time
+import random
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from prompt_builder import estimate_tokens
+from model_router import estimate_cost
+
+logger = logging.getLogger(__name__)
+
+_usage_lock = threading.Lock()
+_usage_stats = {}
+
+_client_lock = threading.Lock()
+_clients = {}
+
+# Smaller model to try when a model is unavailable
+FALLBACK_MODELS = {
+    "gemini-2.5-pro": "gemini-2.5-flash",
+    "gemini-2.5-flash": "gemini-2.5-flash-lite",
+    "gemini-1.5-flash": "gemini-1.5-flash-8b"
+}
+
+# Call sites a student is actively waiting on; these are hedged
+HEDGED_CALL_SITES = {"ask_question", "answer_doubt", "homework_fallback", "hint", "evaluate_response"}
+
+MAX_ATTEMPTS = int(os.environ.get("GEMINI_MAX_ATTEMPTS", "3"))
+ATTEMPT_TIMEOUT_SECONDS = float(os.environ.get("GEMINI_TIMEOUT_SECONDS", "60"))
+HEDGE_AFTER_SECONDS = float(os.environ.get("GEMINI_HEDGE_AFTER_SECONDS", "5"))
+
+
+class GeminiUnavailable(Exception):
+    """Gemini could not answer in time; the caller should degrade"""
+
+
+class CircuitOpenError(GeminiUnavailable):
+    """The model's circuit breaker is open, so no request was sent"""
+
+
+class DeadlineExceeded(GeminiUnavailable):
+    """The request's deadline leaves no time for another attempt"""
+
+
+class CircuitBreaker:
+    """
+    Per-model breaker: opens after consecutive failures, then lets a single
+    probe through once reset_after has passed
+    """
+
+    def __init__(self, failure_threshold=5, reset_after=30.0, name="Gemini"):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def allow(self):
+        """Return True if a request may be sent now"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.reset_after:
+                return False
+            self._probing = True  # Half-open: this caller probes
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    logger.warning(f"{self.name} circuit opened after {self._failures} failures")
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if self._probing else "open"
+
+
+class RetryBudget:
+    """
+    Caps retries and hedges to a fraction of calls, so an outage adds at
+    most that much extra load instead of multiplying it
+    """
+
+    def __init__(self, ratio=0.2, initial=10.0, cap=20.0):
+        self.ratio = ratio
+        self.cap = cap
+        self._tokens = initial
+        self._lock = threading.Lock()
+
+    def record_call(self):
+        with self._lock:
+            self._tokens = min(self.cap, self._tokens + self.ratio)
+
+    def try_spend(self):
+        """Take one retry from the budget; False if it is used up"""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+_breaker_lock = threading.Lock()
+_breakers = {}
+_retry_budget = RetryBudget()
+_hedge_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("GEMINI_HEDGE_THREADS", "64")), thread_name_prefix="gemini-call"
+)
+_recent_latency = {}  # call site -> deque of recent latencies, for the hedge delay
+_route_stats = {}  # (call site, model) -> measured latency and cost
+_deadline = threading.local()
+
+
+class _ResponseCache:
+    """Last good response text per prompt, served when Gemini is unavailable"""
+
+    def __init__(self, max_entries=500):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+            return text
+
+    def put(self, key, text):
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_responses = _ResponseCache()
+
+
+class FallbackResponse:
+    """Stands in for a Gemini response served from the cache or a template"""
+    usage_metadata = None
+
+    def __init__(self, text, source):
+        self.text = text
+        self.source = source
+
+
+def set_request_deadline(seconds):
+    """
+    Bound all Gemini calls made by the current thread's request
+
+    Args:
+        seconds (float): Time the request has left, or None for no deadline
+    """
+    _deadline.at = time.monotonic() + seconds if seconds else None
+
+
+def clear_request_deadline():
+    _deadline.at = None
+
+
+def remaining_time():
+    """Seconds left before the current request's deadline, or None"""
+    at = getattr(_deadline, "at", None)
+    return None if at is None else at - time.monotonic()
+
+
+def is_available(model):
+    """Return False while the model's circuit breaker is open"""
+    return _breaker_for(model).state() == "closed"
+
+
+def get_circuit_states():
+    """Return each model's breaker state in this worker"""
+    with _breaker_lock:
+        return {model: breaker.state() for model, breaker in _breakers.items()}
+
+
+def get_client(api_key=None):
+    """
+    Return the process-wide google.genai Client for an API key
+
+    Building a client costs tens of milliseconds of CPU (mostly TLS setup),
+    which caps how many requests a threaded worker can serve, so one
+    thread-safe client is shared instead of creating one per request.
+
+    Args:
+        api_key (str): API key, defaults to GOOGLE_API_KEY
+
+    Returns:
+        google.genai Client
+    """
+    api_key = api_key or os.environ.get("GOOGLE_API_KEY")
+    client = _clients.get(api_key)
+    if client is None:
+        with _client_lock:
+            client = _clients.get(api_key)
+            if client is None:
+                from google import genai
+                client = _clients[api_key] = genai.Client(api_key=api_key)
+    return client
+
+
+def generate_content(client, call_site, model, contents, config=None, fallback=None):
+    """
+    Call Gemini and account for token usage under the given call site
+
+    If Gemini stays unavailable after retries, the last good response for
+    the same request is returned, then the smaller model is tried, then
+    fallback() is used. Errors caused by the request itself (4xx) are
+    raised without falling back.
+
+    Args:
+        client: google.genai Client
+        call_site (str): Name of the calling feature, e.g. 'ask_question'
+        model (str): Model name
+        contents: Prompt string or list of types.Content
+        config: Optional types.GenerateContentConfig
+        fallback (callable): Optional; returns local text to answer with
+            when Gemini is unavailable
+
+    Returns:
+        The Gemini response, or a FallbackResponse
+
+    Raises:
+        GeminiUnavailable: If Gemini is unavailable and nothing could stand in
+    """
+    estimated_prompt_tokens = estimate_prompt_tokens(contents, config)
+    cache_key = _response_key(model, contents, config)
+
+    try:
+        return _call(client, call_site, model, contents, config, estimated_prompt_tokens, cache_key)
+    except GeminiUnavailable as e:
+        error = e
+
+    cached_text = _responses.get(cache_key)
+    if cached_text is not None:
+        logger.info(f"Gemini [{call_site}] unavailable ({error}); serving last good response")
+        _count(call_site, "degraded")
+        return FallbackResponse(cached_text, "cache")
+
+    smaller_model = FALLBACK_MODELS.get(model)
+    # Provider context caches belong to one model, so those requests can't switch
+    if smaller_model and getattr(config, "cached_content", None) is None:
+        try:
+            response = _call(client, call_site, smaller_model, contents, config, estimated_prompt_tokens,
+                             cache_key, max_attempts=1)
+            logger.info(f"Gemini [{call_site}] {model} unavailable; answered by {smaller_model}")
+            _count(call_site, "degraded")
+            return response
+        except GeminiUnavailable as e:
+            error = e
+
+    if fallback is not None:
+        logger.info(f"Gemini [{call_site}] unavailable ({error}); using local fallback")
+        _count(call_site, "degraded")
+        return FallbackResponse(fallback(), "template")
+    raise error
+
+
+def _call(client, call_site, model, contents, config, estimated_prompt_tokens, cache_key,
+          max_attempts=MAX_ATTEMPTS):
+    """Send a request to one model with retries, the breaker and the deadline applied"""
+    breaker = _breaker_for(model)
+    _retry_budget.record_call()
+
+    for attempt in range(1, max_attempts + 1):
+        timeout = _attempt_timeout()
+        if not breaker.allow():
+            raise CircuitOpenError(f"{model} circuit open")
+
+        start = time.monotonic()
+        try:
+            if call_site in HEDGED_CALL_SITES:
+                response = _send_hedged(client, call_site, model, contents, config, timeout)
+            else:
+                response = _send(client, model, contents, config, timeout)
+        except Exception as e:
+            if not _is_unavailable(e):
+                breaker.record_success()  # Gemini answered; the request was at fault
+                raise
+            breaker.record_failure()
+            logger.warning(f"Gemini [{call_site}] {model} attempt {attempt} failed: {e}")
+            if attempt == max_attempts or not _retry_budget.try_spend():
+                raise GeminiUnavailable(f"{model}: {e}") from e
+            _count(call_site, "retries")
+            _sleep_before_retry(attempt)
+            continue
+
+        breaker.record_success()
+        record_usage(call_site, model, estimated_prompt_tokens, response, time.monotonic() - start)
+        text = getattr(response, "text", None)
+        if text:
+            _responses.put(cache_key, text)
+        return response
+
+
+def _send(client, model, contents, config, timeout):
+    from google.genai import types
+
+    http_options = types.HttpOptions(timeout=int(timeout * 1000))
+    if config is None:
+        config = types.GenerateContentConfig(http_options=http_options)
+    else:
+        config = config.model_copy(update={"http_options": http_options})
+    return client.models.generate_content(model=model, contents=contents, config=config)
+
+
+def _send_hedged(client, call_site, model, contents, config, timeout):
+    """Send the request, and a second copy if the first is slower than usual"""
+    hedge_after = min(_hedge_delay(call_site), timeout)
+    first = _hedge_executor.submit(_send, client, model, contents, config, timeout)
+    done, _ = wait([first], timeout=hedge_after)
+    if done or not _retry_budget.try_spend():
+        done, _ = wait([first], timeout=timeout - hedge_after)
+        if not done:
+            raise TimeoutError(f"No response within {timeout:.1f}s")
+        return first.result()
+
+    logger.info(f"Gemini [{call_site}] hedging after {hedge_after:.1f}s")
+    _count(call_site, "hedged")
+    second = _hedge_executor.submit(_send, client, model, contents, config, timeout - hedge_after)
+    pending = {first, second}
+    error = None
+    deadline = time.monotonic() + timeout - hedge_after
+    while pending:
+        done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            try:
+                return future.result()
+            except Exception as e:
+                error = e
+    raise error or TimeoutError(f"No response within {timeout:.1f}s")
+
+
+def _hedge_delay(call_site):
+    """Hedge at the call site's recent p95 latency, once there are enough samples"""
+    with _usage_lock:
+        samples = sorted(_recent_latency.get(call_site, ()))
+    if len(samples) < 20:
+        return HEDGE_AFTER_SECONDS
+    return max(1.0, samples[int(len(samples) * 0.95) - 1])
+
+
+def _attempt_timeout():
+    remaining = remaining_time()
+    if remaining is None:
+        return ATTEMPT_TIMEOUT_SECONDS
+    if remaining < 0.5:
+        raise DeadlineExceeded("request deadline reached")
+    return min(ATTEMPT_TIMEOUT_SECONDS, remaining)
+
+
+def _sleep_before_retry(attempt):
+    # Full jitter keeps retries from many threads from arriving together
+    delay = random.uniform(0, min(8.0, 0.5 * 2 ** attempt))
+    remaining = remaining_time()
+    if remaining is not None and delay >= remaining - 0.5:
+        raise DeadlineExceeded("request deadline reached")
+    time.sleep(delay)
+
+
+def _is_unavailable(error):
+    """True for errors worth retrying: overload, server errors, timeouts and network failures"""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code in (408, 429) or code >= 500
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(error, httpx.TransportError)
+
+
+def _breaker_for(model):
+    with _breaker_lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            breaker = _breakers[model] = CircuitBreaker(
+                failure_threshold=int(os.environ.get("GEMINI_BREAKER_FAILURES", "5")),
+                reset_after=float(os.environ.get("GEMINI_BREAKER_RESET_SECONDS", "30"))
+            )
+        return breaker
+
+
+def _response_key(model, contents, config):
+    digest = hashlib.sha256(f"{model}|{contents!r}|{config!r}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def estimate_prompt_tokens(contents, config=None):
+    """Estimate prompt tokens for contents plus any system instruction"""
+    total = 0
+    system_instruction = getattr(config, 'system_instruction', None) if config is not None else None
+    for item in [system_instruction] + (contents if isinstance(contents, list) else [contents]):
+        total += estimate_tokens(_text_of(item))
+    return total
+
+
+def _text_of(item):
+    if item is None:
+        return ""
+    if isinstance(item, str):
+        return item
+    parts = getattr(item, 'parts', None)
+    if parts:
+        return "".join(getattr(part, 'text', None) or "" for part in parts)
+    return getattr(item, 'text', None) or ""
+
+
+def record_usage(call_site, model, estimated_prompt_tokens, response, elapsed_seconds):
+    """Log and aggregate token usage reported for a response"""
+    usage = getattr(response, 'usage_metadata', None)
+    prompt_tokens = getattr(usage, 'prompt_token_count', None) or estimated_prompt_tokens
+    response_tokens = getattr(usage, 'candidates_token_count', None)
+    if response_tokens is None:
+        response_tokens = estimate_tokens(getattr(response, 'text', None) or "")
+    cached_tokens = getattr(usage, 'cached_content_token_count', None) or 0
+    cost = estimate_cost(model, prompt_tokens, response_tokens, cached_tokens)
+
+    logger.info(
+        f"Gemini usage [{call_site}] model={model} prompt={prompt_tokens} "
+        f"(estimated {estimated_prompt_tokens}, cached {cached_tokens}) "
+        f"response={response_tokens} latency={elapsed_seconds:.2f}s cost=${cost:.6f}"
+    )
+
+    with _usage_lock:
+        stats = _usage_stats.setdefault(call_site, _new_stats())
+        stats["calls"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["estimated_prompt_tokens"] += estimated_prompt_tokens
+        stats["cached_tokens"] += cached_tokens
+        stats["response_tokens"] += response_tokens
+        stats["total_latency_seconds"] += elapsed_seconds
+        stats["estimated_cost_usd"] += cost
+        _recent_latency.setdefault(call_site, deque(maxlen=200)).append(elapsed_seconds)
+
+        route = _route_stats.setdefault((call_site, model), {
+            "calls": 0,
+            "estimated_cost_usd": 0.0,
+            "latencies": deque(maxlen=500)
+        })
+        route["calls"] += 1
+        route["estimated_cost_usd"] += cost
+        route["latencies"].append(elapsed_seconds)
+
+
+def _count(call_site, key):
+    with _usage_lock:
+        _usage_stats.setdefault(call_site, _new_stats())[key] += 1
+
+
+def _new_stats():
+    return {
+        "calls": 0,
+        "prompt_tokens": 0,
+        "estimated_prompt_tokens": 0,
+        "cached_tokens": 0,
+        "response_tokens": 0,
+        "total_latency_seconds": 0.0,
+        "estimated_cost_usd": 0.0,
+        "retries": 0,
+        "hedged": 0,
+        "degraded": 0
+    }
+
+
+def get_usage_stats():
+    """Return a snapshot of per-call-site usage in this worker"""
+    with _usage_lock:
+        return {call_site: dict(stats) for call_site, stats in _usage_stats.items()}
+
+
+def get_route_stats():
+    """
+    Return measured latency and cost per call site and model in this worker
+
+    Returns:
+        list: One dict per route with calls, p50/p95 latency and cost
+    """
+    with _usage_lock:
+        routes = [(key, route["calls"], route["estimated_cost_usd"], sorted(route["latencies"]))
+                  for key, route in _route_stats.items()]
+    stats = []
+    for (call_site, model), calls, cost, latencies in sorted(routes):
+        stats.append({
+            "call_site": call_site,
+            "model": model,
+            "calls": calls,
+            "p50_latency_seconds": round(latencies[len(latencies) // 2], 3),
+            "p95_latency_seconds": round(latencies[max(0, int(len(latencies) * 0.95) - 1)], 3),
+            "estimated_cost_usd": round(cost, 6),
+            "cost_per_call_usd": round(cost / calls, 6)
+        })
+    return stats
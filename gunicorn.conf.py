@@ -0,0 +1,48 @@
+"""
+Gunicorn configuration
+Request time is dominated by network waits on Gemini and gTTS, so workers are
+threaded: a thread blocked on an AI call costs little, and one worker serves
+as many concurrent requests as it has threads. Gunicorn loads this file
+automatically from the working directory; command-line flags still override it.
+"""
+
+import os
+import sys
+import subprocess
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+
+# 'gthread' needs no extra packages; 'gevent' can be used if it is installed
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+threads = int(os.environ.get("GUNICORN_THREADS", "32"))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "500"))  # gevent only
+
+# AI and TTS calls can take tens of seconds; don't recycle workers mid-call
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# Import the app once in the master and fork workers from it, so they share
+# its memory copy-on-write and start serving without re-importing. --reload
+# needs each worker to import fresh code, so it turns preloading off.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1" and "--reload" not in sys.argv
+
+
+def on_starting(server):
+    """Create database tables once, in the master, before any worker starts"""
+    if os.environ.get("SKIP_INIT_DB") != "1":
+        if server.cfg.preload_app:
+            from app import init_db
+            init_db(server.app.wsgi())
+        else:
+            # Keep the app out of the master so reloaded workers import fresh code
+            subprocess.run([sys.executable, "-m", "flask", "--app", "main", "init-db"], check=True)
+
+    if server.cfg.preload_app:
+        # SDKs that the app imports on first use; loading them here means workers
+        # inherit them instead of paying the import on their first request
+        import google.genai.types  # noqa: F401
+        import ai_schemas  # noqa: F401
+        import gtts  # noqa: F401
+        import docx  # noqa: F401
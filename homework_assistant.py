@@ -3,20 +3,112 @@ Homework & Worksheet Assistant
 Provides adaptive AI tutoring with progressive hint systems for homework and worksheets.
 """
 
-import os
+import re
 import json
+import hashlib
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
-from google import genai
-from google.genai import types
-from models import db, Document, DocumentPage
-from sqlalchemy import desc
+from models import db, Document, DocumentPage, HomeworkSession, HomeworkQuestion, HomeworkAttempt, HomeworkHint, HintLadder
+from sqlalchemy import desc, func
+from sqlalchemy.exc import IntegrityError
+from prompt_builder import build_page_context, context_budget, truncate_text
+from gemini_client import generate_content, get_client
+from model_router import model_router
+from answer_grader import grade_answer
+from single_flight import single_flight, make_key
+from progress_tracker import progress_tracker
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Marks awarded per evaluation level
+EVALUATION_SCORES = {
+    "correct": 1.0,
+    "partially_correct": 0.5,
+    "incorrect": 0.0
+}
+
+# Output tokens budgeted per verdict in a batch evaluation, plus a fixed overhead;
+# batches larger than the route's max_output_tokens allows are split into chunks
+BATCH_TOKENS_PER_ITEM = 150
+BATCH_TOKENS_OVERHEAD = 200
+
+# Prompt for generating every hint level in one call
+HINT_LADDER_PROMPT = """
+Create five progressive hints for this {subject} question for a 5th grade student (age 10-11).
+Each level gives a little more help than the one before. Only the last level may give the answer.
+
+Question: {question}
+Context: {context}
+
+1. gentle_nudge: Point the student in the right direction with a small clue or reminder. Keep it brief.
+2. conceptual_hint: Help the student understand the key concept or approach, without the direct answer.
+3. step_guidance: Break the problem into smaller steps, but let the student work through each step.
+4. detailed_help: Give specific guidance while still encouraging the student to think it through.
+5. complete_explanation: Explain the complete solution and the reasoning behind each step.
+
+Keep every hint encouraging and age-appropriate. Respond in {language}.
+"""
+
+# Single-level prompts, used only when the ladder cannot be generated
+HINT_LEVEL_PROMPTS = {
+    1: """
+    Provide a gentle nudge hint for this {subject} question. Don't give away the answer directly.
+    Just point the student in the right direction with a small clue or reminder.
+    
+    Question: {question}
+    Context: {context}
+    
+    Keep the hint encouraging and brief. Respond in {language}.
+    """,
+    
+    2: """
+    Provide a conceptual hint for this {subject} question. Help the student understand the 
+    key concept or approach they need to solve the problem.
+    
+    Question: {question}
+    Context: {context}
+    Previous attempts: {previous_attempts}
+    
+    Focus on the underlying concept without giving the direct answer. Respond in {language}.
+    """,
+    
+    3: """
+    Provide step-by-step guidance for this {subject} question. Break down the problem into 
+    smaller, manageable steps that guide the student's thinking.
+    
+    Question: {question}
+    Context: {context}
+    Previous attempts: {previous_attempts}
+    
+    Show the logical progression but let the student work through each step. Respond in {language}.
+    """,
+    
+    4: """
+    Provide detailed help for this {subject} question. Give more specific guidance while 
+    still encouraging the student to think through the problem.
+    
+    Question: {question}
+    Context: {context}
+    Previous attempts: {previous_attempts}
+    
+    Provide clear direction but maintain educational value. Respond in {language}.
+    """,
+    
+    5: """
+    Provide a complete explanation for this {subject} question. Since this is the final hint level,
+    give a thorough explanation of how to solve the problem, including the reasoning behind each step.
+    
+    Question: {question}
+    Context: {context}
+    Previous attempts: {previous_attempts}
+    
+    Explain the complete solution process while helping the student understand the logic. Respond in {language}.
+    """
+}
+
 class HomeworkAssistant:
     """
     AI-powered homework and worksheet assistant with adaptive hint systems.
@@ -25,8 +117,7 @@ class HomeworkAssistant:
     
     def __init__(self):
         """Initialize the homework assistant with Gemini AI client."""
-        self.client = genai.Client(api_key=os.environ.get("GOOGLE_API_KEY"))
-        self.progress_file = "homework_progress.json"
+        self.client = get_client()
         self.hint_levels = {
             1: "gentle_nudge",
             2: "conceptual_hint", 
@@ -53,8 +144,8 @@ class HomeworkAssistant:
                 
             pages = DocumentPage.query.filter_by(document_id=document_id).order_by(DocumentPage.page_number).all()
             
-            # Combine all content
-            full_content = "\n".join([page.content for page in pages])
+            # Combine page content within the parsing budget
+            full_content = build_page_context(pages, context_budget('parse_document_questions'))
             
             # Use AI to parse questions from the content
             prompt = f"""
@@ -73,13 +164,12 @@ class HomeworkAssistant:
             Return the response in JSON format with an array of questions.
             """
             
-            response = self.client.models.generate_content(
-                model="gemini-1.5-flash",
+            route = model_router.route('parse_document_questions', document.subject)
+            response = generate_content(
+                self.client, 'parse_document_questions',
+                model=route.model,
                 contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=0.3,
-                    max_output_tokens=2000
-                )
+                config=route.config()
             )
             
             # Parse the AI response to extract questions
@@ -100,7 +190,7 @@ class HomeworkAssistant:
                         "question_type": "mixed",
                         "difficulty_level": "basic",
                         "page_number": 1,
-                        "context": full_content[:500] + "..." if len(full_content) > 500 else full_content
+                        "context": truncate_text(full_content, 150)
                     }]
             
             return questions
@@ -109,55 +199,21 @@ class HomeworkAssistant:
             logger.error(f"Error parsing document questions: {e}")
             return []
         
-    def _load_student_progress(self) -> Dict:
-        """Load student progress data from file."""
-        try:
-            if os.path.exists(self.progress_file):
-                with open(self.progress_file, 'r') as f:
-                    return json.load(f)
-        except Exception as e:
-            logger.error(f"Error loading progress: {e}")
-        return {
-            "homework_sessions": [],
-            "worksheet_sessions": [],
-            "performance_data": {},
-            "hint_usage": {},
-            "subject_strengths": {}
-        }
-    
-    def _save_student_progress(self, progress: Dict):
-        """Save student progress data to file."""
-        try:
-            with open(self.progress_file, 'w') as f:
-                json.dump(progress, f, indent=2, default=str)
-        except Exception as e:
-            logger.error(f"Error saving progress: {e}")
-    
-    def get_adaptive_difficulty(self, subject: str, student_progress: Dict) -> str:
+    def get_adaptive_difficulty(self, subject: str, student_key: Optional[str] = None) -> str:
         """
         Determine appropriate difficulty level based on student's past performance.
         
+        The level is kept up to date in StudentProgress as answers are
+        evaluated, so this is a single-row read.
+        
         Args:
             subject: Subject name
-            student_progress: Student's historical performance data
+            student_key: Identifies the student
             
         Returns:
             Difficulty level: 'basic', 'intermediate', 'advanced'
         """
-        performance_data = student_progress.get("performance_data", {})
-        subject_data = performance_data.get(subject, {"correct": 0, "total": 0})
-        
-        if subject_data["total"] == 0:
-            return "basic"  # Start with basic for new subjects
-        
-        success_rate = subject_data["correct"] / subject_data["total"]
-        
-        if success_rate >= 0.8:
-            return "advanced"
-        elif success_rate >= 0.6:
-            return "intermediate"
-        else:
-            return "basic"
+        return progress_tracker.difficulty_for(student_key, subject)
     
     def generate_progressive_hint(self, question: str, subject: str, hint_level: int, 
                                 context: str = "", previous_attempts: List[str] = None) -> Dict:
@@ -175,90 +231,14 @@ class HomeworkAssistant:
             Dict containing hint text and metadata
         """
         try:
-            # Get appropriate language for the subject
-            language_map = {
-                'Hindi': 'Hindi',
-                'Telugu': 'Telugu',
-                'English': 'English',
-                'Maths': 'English',
-                'Science': 'English',
-                'Social': 'English',
-                'IT-Computers': 'English',
-                'GK': 'English',
-                'Value Education': 'English'
-            }
-            
-            response_language = language_map.get(subject, 'English')
+            context = truncate_text(context or "", context_budget('hint'))
+            hint_level = hint_level if hint_level in self.hint_levels else 1
             
-            # Define hint level prompts
-            hint_prompts = {
-                1: f"""
-                Provide a gentle nudge hint for this {subject} question. Don't give away the answer directly.
-                Just point the student in the right direction with a small clue or reminder.
-                
-                Question: {question}
-                Context: {context}
-                
-                Keep the hint encouraging and brief. Respond in {response_language}.
-                """,
-                
-                2: f"""
-                Provide a conceptual hint for this {subject} question. Help the student understand the 
-                key concept or approach they need to solve the problem.
-                
-                Question: {question}
-                Context: {context}
-                Previous attempts: {previous_attempts}
-                
-                Focus on the underlying concept without giving the direct answer. Respond in {response_language}.
-                """,
-                
-                3: f"""
-                Provide step-by-step guidance for this {subject} question. Break down the problem into 
-                smaller, manageable steps that guide the student's thinking.
-                
-                Question: {question}
-                Context: {context}
-                Previous attempts: {previous_attempts}
-                
-                Show the logical progression but let the student work through each step. Respond in {response_language}.
-                """,
-                
-                4: f"""
-                Provide detailed help for this {subject} question. Give more specific guidance while 
-                still encouraging the student to think through the problem.
-                
-                Question: {question}
-                Context: {context}
-                Previous attempts: {previous_attempts}
-                
-                Provide clear direction but maintain educational value. Respond in {response_language}.
-                """,
-                
-                5: f"""
-                Provide a complete explanation for this {subject} question. Since this is the final hint level,
-                give a thorough explanation of how to solve the problem, including the reasoning behind each step.
-                
-                Question: {question}
-                Context: {context}
-                Previous attempts: {previous_attempts}
-                
-                Explain the complete solution process while helping the student understand the logic. Respond in {response_language}.
-                """
-            }
-            
-            prompt = hint_prompts.get(hint_level, hint_prompts[1])
-            
-            response = self.client.models.generate_content(
-                model="gemini-1.5-flash",
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=0.7,
-                    max_output_tokens=1000
-                )
-            )
-            
-            hint_text = response.text if response.text else "I need more information to provide a helpful hint."
+            ladder = self._get_hint_ladder(question, subject, context)
+            if ladder:
+                hint_text = ladder[hint_level - 1]
+            else:
+                hint_text = self._generate_single_hint(question, subject, hint_level, context, previous_attempts)
             
             return {
                 "hint_text": hint_text,
@@ -280,135 +260,133 @@ class HomeworkAssistant:
                 "is_final_hint": hint_level == 5,
                 "error": str(e)
             }
-        hint_type = self.hint_levels.get(hint_level, "gentle_nudge")
+    
+    def _get_hint_ladder(self, question: str, subject: str, context: str) -> Optional[List[str]]:
+        """
+        Return all five hint levels for a question, generating them in one call if needed.
         
-        # Build context for AI
-        ai_context = f"""
-        Subject: {subject}
-        Question: {question}
-        Context: {context}
-        Hint Level: {hint_level} ({hint_type})
-        Previous Attempts: {previous_attempts or 'None'}
+        Ladders are stored by (normalized question, subject, context hash), so
+        the ladder is generated once and every later level, attempt and
+        student is served from the stored copy.
         
-        CRITICAL INSTRUCTIONS:
-        - This is for a 5th grade student (age 10-11)
-        - DO NOT provide direct answers
-        - Focus on guiding thinking process
-        - Encourage independent problem-solving
-        - Use age-appropriate language
+        Returns:
+            List of five hint texts, or None if the ladder could not be generated
         """
+        ladder_key = self._hint_ladder_key(question, subject, context)
         
-        if hint_level == 1:  # Gentle nudge
-            prompt = f"""
-            {ai_context}
-            
-            Provide a very gentle hint that encourages the student to think about the question.
-            Just point them in the right direction without giving away the answer.
-            Ask a guiding question that helps them start thinking.
-            
-            Example format:
-            "Think about what this question is really asking. What key information do you see?"
-            """
-            
-        elif hint_level == 2:  # Conceptual hint
-            prompt = f"""
-            {ai_context}
-            
-            Provide a conceptual hint that explains the underlying concept or method needed.
-            Help them understand WHAT type of problem this is, but don't solve it.
-            
-            Example format:
-            "This is a [type of problem]. Remember when we learned about [concept]?"
-            """
-            
-        elif hint_level == 3:  # Step guidance
-            prompt = f"""
-            {ai_context}
-            
-            Break down the problem into logical steps, but don't solve each step.
-            Show them the structure of how to approach it.
-            
-            Example format:
-            "Here's how you can approach this:
-            Step 1: [what to do first]
-            Step 2: [what to do next]
-            Try the first step and see what you get!"
-            """
-            
-        elif hint_level == 4:  # Detailed help
-            prompt = f"""
-            {ai_context}
-            
-            Provide more detailed guidance with partial solutions.
-            Show them how to start the first step, but let them complete it.
-            
-            Example format:
-            "Let me show you how to start:
-            For Step 1, you need to [specific guidance]
-            Here's an example of the first part: [partial example]
-            Now you try the rest!"
-            """
-            
-        else:  # Complete explanation (level 5)
-            prompt = f"""
-            {ai_context}
-            
-            Provide a complete step-by-step explanation, but focus on the learning process.
-            Explain WHY each step is needed and HOW it connects to the concept.
-            Still encourage them to verify and understand each step.
-            
-            Example format:
-            "Let me walk you through this step by step:
-            Step 1: [complete explanation with reasoning]
-            Step 2: [complete explanation with reasoning]
-            
-            Do you understand why we did each step? Try a similar problem to practice!"
-            """
+        stored = HintLadder.query.filter_by(ladder_key=ladder_key).first()
+        if stored:
+            stored.times_used = (stored.times_used or 0) + 1
+            db.session.commit()
+            return json.loads(stored.hints)
+        
+        hints = single_flight.do(
+            make_key('hint-ladder', ladder_key),
+            lambda: self._generate_hint_ladder(question, subject, context),
+            timeout=60
+        )
+        if not hints:
+            return None
+        
+        try:
+            db.session.add(HintLadder(
+                ladder_key=ladder_key,
+                question_text=question,
+                subject=subject,
+                hints=json.dumps(hints, ensure_ascii=False),
+                times_used=1
+            ))
+            db.session.commit()
+        except IntegrityError:
+            # Another request stored the same ladder first
+            db.session.rollback()
+        return hints
+    
+    def _hint_ladder_key(self, question: str, subject: str, context: str) -> str:
+        normalized_question = re.sub(r'\W+', ' ', str(question).lower()).strip()
+        context_hash = hashlib.sha256(context.encode('utf-8')).hexdigest()
+        payload = json.dumps([normalized_question, subject, context_hash], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _generate_hint_ladder(self, question: str, subject: str, context: str) -> Optional[List[str]]:
+        """Generate all five hint levels with one structured Gemini call."""
+        from ai_schemas import HintLadderResponse
+        
+        prompt = HINT_LADDER_PROMPT.format(
+            subject=subject,
+            question=question,
+            context=context,
+            language=self._response_language(subject)
+        )
         
         try:
-            response = self.client.models.generate_content(
-                model="gemini-1.5-flash",
+            route = model_router.route('hint_ladder', subject)
+            response = generate_content(
+                self.client, 'hint_ladder',
+                model=route.model,
                 contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=0.7,
-                    max_output_tokens=1000
+                config=route.config(
+                    response_mime_type="application/json",
+                    response_schema=HintLadderResponse
                 )
             )
-            
-            hint_text = response.text if response.text else "I need more information to help you with this question."
-            
-            return {
-                "hint_text": hint_text,
-                "hint_level": hint_level,
-                "hint_type": hint_type,
-                "subject": subject,
-                "timestamp": datetime.now().isoformat()
-            }
-            
+            return HintLadderResponse.model_validate_json(response.text or "").levels()
         except Exception as e:
-            logger.error(f"Error generating hint: {e}")
-            return {
-                "hint_text": "I'm having trouble generating a hint right now. Can you try rephrasing your question?",
-                "hint_level": hint_level,
-                "hint_type": hint_type,
-                "subject": subject,
-                "timestamp": datetime.now().isoformat()
-            }
+            logger.error(f"Error generating hint ladder, falling back to a single hint: {e}")
+            return None
+    
+    def _generate_single_hint(self, question: str, subject: str, hint_level: int,
+                              context: str, previous_attempts: List[str]) -> str:
+        """Generate just the requested hint level."""
+        prompt = HINT_LEVEL_PROMPTS[hint_level].format(
+            subject=subject,
+            question=question,
+            context=context,
+            previous_attempts=previous_attempts,
+            language=self._response_language(subject)
+        )
+        
+        route = model_router.route('hint', subject)
+        response = generate_content(
+            self.client, 'hint',
+            model=route.model,
+            contents=prompt,
+            config=route.config()
+        )
+        return response.text if response.text else "I need more information to provide a helpful hint."
+    
+    def _response_language(self, subject: str) -> str:
+        return {'Hindi': 'Hindi', 'Telugu': 'Telugu'}.get(subject, 'English')
     
     def evaluate_student_response(self, question: str, student_answer: str, 
-                                subject: str, context: str = "") -> Dict:
+                                subject: str, context: str = "",
+                                expected_answer: Optional[str] = None,
+                                question_type: Optional[str] = None,
+                                options: Optional[List[str]] = None) -> Dict:
         """
         Evaluate student's response and provide constructive feedback.
         
+        Multiple-choice, true/false, numeric and pure arithmetic answers are
+        graded locally; only free-text answers are sent to Gemini.
+        
         Args:
             question: The original question
             student_answer: Student's response
             subject: Subject area
             context: Additional context from lesson
+            expected_answer: Answer key, if known
+            question_type: Question type, e.g. 'multiple_choice' or 'numeric'
+            options: Multiple-choice options, if any
             
         Returns:
             Dict containing evaluation results and feedback
         """
+        local_grade = grade_answer(question, student_answer, expected_answer, question_type, options)
+        if local_grade is not None:
+            return self._local_evaluation(local_grade, subject)
+        
+        context = truncate_text(context or "", context_budget('evaluate_response'))
+        
         prompt = f"""
         Subject: {subject}
         Question: {question}
@@ -439,30 +417,25 @@ class HomeworkAssistant:
         """
         
         try:
-            response = self.client.models.generate_content(
-                model="gemini-1.5-flash",
+            route = model_router.route('evaluate_response', subject)
+            response = generate_content(
+                self.client, 'evaluate_response',
+                model=route.model,
                 contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=0.6,
-                    max_output_tokens=800
-                )
+                config=route.config()
             )
             
             evaluation_text = response.text if response.text else "I need to review this more carefully."
             
             # Extract evaluation level for progress tracking
-            evaluation_level = "incorrect"
-            if "correct" in evaluation_text.lower():
-                if "partially" in evaluation_text.lower():
-                    evaluation_level = "partially_correct"
-                else:
-                    evaluation_level = "correct"
+            evaluation_level = self._parse_evaluation_level(evaluation_text)
             
             return {
                 "evaluation_text": evaluation_text,
                 "evaluation_level": evaluation_level,
                 "is_correct": evaluation_level == "correct",
                 "feedback": evaluation_text,
+                "grading_method": "ai",
                 "subject": subject,
                 "timestamp": datetime.now().isoformat()
             }
@@ -478,7 +451,51 @@ class HomeworkAssistant:
                 "timestamp": datetime.now().isoformat()
             }
     
-    def start_enhanced_session(self, subject: str, session_type: str, document_id: int = None) -> Dict:
+    def _parse_evaluation_level(self, evaluation_text: str) -> str:
+        """Read the verdict from the **Evaluation:** line ("incorrect" must not count as "correct")."""
+        match = re.search(r'\*\*Evaluation:\*\*\s*\[?\s*(partially[\s_-]*correct|incorrect|not correct|correct)',
+                          evaluation_text, re.IGNORECASE)
+        verdict = match.group(1).lower() if match else evaluation_text.lower()
+        
+        if re.search(r'partially[\s_-]*correct', verdict):
+            return "partially_correct"
+        if re.search(r'\b(incorrect|not correct)\b', verdict):
+            return "incorrect"
+        if re.search(r'\bcorrect\b', verdict):
+            return "correct"
+        return "incorrect"
+    
+    def _local_evaluation(self, grade: Dict, subject: str) -> Dict:
+        """Build encouraging feedback for an answer graded without the AI."""
+        if grade["is_correct"]:
+            evaluation_level = "correct"
+            evaluation_text = (
+                "**Evaluation:** correct\n"
+                "**What you did well:** You got the right answer!\n"
+                "**Encouragement:** Fantastic work - keep it up! 🌟\n"
+                "**Next steps:** Try the next question."
+            )
+        else:
+            evaluation_level = "incorrect"
+            evaluation_text = (
+                "**Evaluation:** incorrect\n"
+                "**Areas to improve:** That's not quite right yet. Check your working step by step.\n"
+                "**Encouragement:** Mistakes help us learn - you can do this! 💪\n"
+                "**Next steps:** Try again, or ask for a hint if you're stuck."
+            )
+        
+        return {
+            "evaluation_text": evaluation_text,
+            "evaluation_level": evaluation_level,
+            "is_correct": grade["is_correct"],
+            "feedback": evaluation_text,
+            "grading_method": grade["method"],
+            "subject": subject,
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    def start_enhanced_session(self, subject: str, session_type: str, document_id: int = None,
+                               student_key: Optional[str] = None) -> Dict:
         """
         Start an enhanced homework/worksheet/exam session with document support.
         
@@ -486,41 +503,35 @@ class HomeworkAssistant:
             subject: Subject area
             session_type: Type of session (homework, worksheet, exam)
             document_id: Optional document ID if document was uploaded
+            student_key: Identifies the student
             
         Returns:
             Dict containing session information
         """
         try:
             import uuid
-            session_id = str(uuid.uuid4())
-            
-            # Get current progress
-            progress = self._load_student_progress()
             
             # Determine difficulty level
-            difficulty = self.get_adaptive_difficulty(subject, progress)
+            difficulty = self.get_adaptive_difficulty(subject, student_key)
+            
+            session = self._create_session(
+                str(uuid.uuid4()), student_key, subject, session_type,
+                document_id=document_id, difficulty_level=difficulty
+            )
             
-            # Create session data
             session_data = {
-                "session_id": session_id,
+                "session_id": session.session_id,
                 "subject": subject,
                 "session_type": session_type,
                 "document_id": document_id,
                 "difficulty_level": difficulty,
-                "start_time": datetime.now().isoformat(),
-                "status": "active",
+                "start_time": session.start_time.isoformat(),
+                "status": session.status,
                 "questions_completed": 0,
                 "hints_used": 0,
                 "performance_score": 0.0
             }
             
-            # Add to progress tracking
-            progress["active_sessions"] = progress.get("active_sessions", {})
-            progress["active_sessions"][session_id] = session_data
-            
-            # Save progress
-            self._save_student_progress(progress)
-            
             # Generate welcome message based on session type
             welcome_messages = {
                 "homework": f"Welcome to your {subject} homework session! I'm here to guide you through each question step by step.",
@@ -530,7 +541,7 @@ class HomeworkAssistant:
             
             return {
                 "success": True,
-                "session_id": session_id,
+                "session_id": session.session_id,
                 "message": f"Enhanced {session_type} session started successfully!",
                 "welcome_message": welcome_messages.get(session_type, "Let's begin learning!"),
                 "session_data": session_data,
@@ -538,6 +549,7 @@ class HomeworkAssistant:
             }
             
         except Exception as e:
+            db.session.rollback()
             logger.error(f"Error starting enhanced session: {e}")
             return {
                 "success": False,
@@ -545,38 +557,29 @@ class HomeworkAssistant:
                 "error": str(e)
             }
 
-    def start_homework_session(self, subject: str, task_description: str) -> Dict:
+    def start_homework_session(self, subject: str, task_description: str,
+                               student_key: Optional[str] = None) -> Dict:
         """
         Start a new homework session for the student.
         
         Args:
             subject: Subject area
             task_description: Description of the homework task
+            student_key: Identifies the student
             
         Returns:
             Dict containing session information
         """
-        progress = self._load_student_progress()
-        
-        session_id = f"hw_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        
-        session_data = {
-            "session_id": session_id,
-            "subject": subject,
-            "task_description": task_description,
-            "start_time": datetime.now().isoformat(),
-            "questions": [],
-            "current_question": None,
-            "status": "active"
-        }
-        
-        progress["homework_sessions"].append(session_data)
-        self._save_student_progress(progress)
+        import uuid
         
-        difficulty = self.get_adaptive_difficulty(subject, progress)
+        difficulty = self.get_adaptive_difficulty(subject, student_key)
+        session = self._create_session(
+            f"hw_{uuid.uuid4().hex}", student_key, subject, "homework",
+            task_description=task_description, difficulty_level=difficulty
+        )
         
         return {
-            "session_id": session_id,
+            "session_id": session.session_id,
             "subject": subject,
             "task_description": task_description,
             "difficulty_level": difficulty,
@@ -584,45 +587,58 @@ class HomeworkAssistant:
             "success": True
         }
     
-    def start_worksheet_session(self, subject: str) -> Dict:
+    def start_worksheet_session(self, subject: str, student_key: Optional[str] = None) -> Dict:
         """
         Start a weekly worksheet session (typically on Fridays).
         
         Args:
             subject: Subject area for the worksheet
+            student_key: Identifies the student
             
         Returns:
             Dict containing worksheet session information
         """
-        progress = self._load_student_progress()
-        
-        session_id = f"ws_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        
-        session_data = {
-            "session_id": session_id,
-            "subject": subject,
-            "session_type": "worksheet",
-            "start_time": datetime.now().isoformat(),
-            "questions": [],
-            "current_question": None,
-            "status": "active"
-        }
+        import uuid
         
-        progress["worksheet_sessions"].append(session_data)
-        self._save_student_progress(progress)
+        session = self._create_session(
+            f"ws_{uuid.uuid4().hex}", student_key, subject, "worksheet",
+            difficulty_level=self.get_adaptive_difficulty(subject, student_key)
+        )
         
         return {
-            "session_id": session_id,
+            "session_id": session.session_id,
             "subject": subject,
             "session_type": "worksheet",
             "welcome_message": f"Welcome to your {subject} worksheet session! Let's work through these problems together. I'll guide you step by step to help you understand each concept.",
             "success": True
         }
     
+    def _create_session(self, session_id: str, student_key: Optional[str], subject: str,
+                        session_type: str, **fields) -> HomeworkSession:
+        """Create a session row and count it in the student's progress, in one transaction."""
+        session = HomeworkSession(
+            session_id=session_id,
+            student_key=student_key,
+            subject=subject,
+            session_type=session_type,
+            start_time=datetime.utcnow(),
+            status='active',
+            **fields
+        )
+        db.session.add(session)
+        progress_tracker.record_session(student_key, subject, commit=False)
+        db.session.commit()
+        return session
+    
     def process_homework_question(self, session_id: str, question: str, 
                                  student_response: str = None, 
                                  request_hint: bool = False,
-                                 hint_level: int = 1) -> Dict:
+                                 hint_level: int = 1,
+                                 expected_answer: str = None,
+                                 question_type: str = None,
+                                 options: List[str] = None,
+                                 student_key: Optional[str] = None,
+                                 subject: Optional[str] = None) -> Dict:
         """
         Process a homework question with adaptive hint system.
         
@@ -632,53 +648,50 @@ class HomeworkAssistant:
             student_response: Student's answer (if provided)
             request_hint: Whether student is requesting a hint
             hint_level: Level of hint requested (1-5)
+            expected_answer: Answer key, if known, for local grading
+            question_type: Question type, e.g. 'multiple_choice'
+            options: Multiple-choice options, if any
+            student_key: Identifies the student; only their sessions are used
+            subject: Subject for a standalone question without a session
             
         Returns:
             Dict containing response and next steps
         """
         try:
-            # Load current progress and find session
-            progress = self._load_student_progress()
-            active_sessions = progress.get("active_sessions", {})
-            
-            if session_id and session_id not in active_sessions:
+            session = None
+            if session_id:
+                session = HomeworkSession.query.filter_by(session_id=session_id, student_key=student_key).first()
+            if not session:
                 # Create a temporary session for standalone questions
                 import uuid
-                temp_session_id = str(uuid.uuid4())
-                temp_session = {
-                    "session_id": temp_session_id,
-                    "subject": "English",
-                    "session_type": "standalone",
-                    "start_time": datetime.now().isoformat(),
-                    "status": "active",
-                    "questions_completed": 0,
-                    "hints_used": 0,
-                    "performance_score": 0.0
-                }
-                active_sessions[temp_session_id] = temp_session
-                session_id = temp_session_id
-            
-            session = active_sessions.get(session_id, {
-                "subject": "English",
-                "session_type": "standalone",
-                "hints_used": 0,
-                "questions_completed": 0,
-                "performance_score": 0.0
-            })
+                session = self._create_session(str(uuid.uuid4()), student_key, subject or "English", "standalone")
             
-            subject = session.get("subject", "English")
+            subject = session.subject
+            homework_question = self._get_session_question(session, question)
+            previous_attempts = [
+                attempt.student_response for attempt in
+                HomeworkAttempt.query.filter_by(question_id=homework_question.id).order_by(HomeworkAttempt.attempt_number)
+            ]
             
             # Handle hint request
             if request_hint:
                 hint_result = self.generate_progressive_hint(
                     question, subject, hint_level, 
-                    context=session.get("context", ""),
-                    previous_attempts=session.get("previous_attempts", [])
+                    context="",
+                    previous_attempts=previous_attempts
                 )
                 
-                # Update session with hint usage
-                session["hints_used"] = session.get("hints_used", 0) + 1
-                self._save_student_progress(progress)
+                # Record the hint with the session, question and progress counters together
+                db.session.add(HomeworkHint(
+                    question_id=homework_question.id,
+                    hint_level=hint_result["hint_level"],
+                    hint_type=hint_result["hint_type"],
+                    hint_text=hint_result["hint_text"]
+                ))
+                homework_question.hints_used = (homework_question.hints_used or 0) + 1
+                session.total_hints_used = (session.total_hints_used or 0) + 1
+                progress_tracker.record_hint(student_key, subject, hint_result["hint_level"], commit=False)
+                db.session.commit()
                 
                 return {
                     "success": True,
@@ -687,37 +700,49 @@ class HomeworkAssistant:
                     "hint_type": hint_result["hint_type"],
                     "can_request_next": hint_result["can_request_next"],
                     "is_final_hint": hint_result["is_final_hint"],
-                    "session_id": session_id
+                    "session_id": session.session_id
                 }
             
             # Handle answer evaluation
             if student_response:
                 evaluation = self.evaluate_student_response(
                     question, student_response, subject,
-                    context=session.get("context", "")
+                    context="",
+                    expected_answer=expected_answer,
+                    question_type=question_type,
+                    options=options
                 )
+                level = evaluation["evaluation_level"]
                 
-                # Update session with attempt
-                session["previous_attempts"] = session.get("previous_attempts", [])
-                session["previous_attempts"].append(student_response)
-                session["questions_completed"] = session.get("questions_completed", 0) + 1
+                # Record the attempt
+                homework_question.attempts_count = (homework_question.attempts_count or 0) + 1
+                homework_question.final_answer = student_response
+                homework_question.is_correct = evaluation["is_correct"]
+                homework_question.evaluation_score = EVALUATION_SCORES.get(level, 0.0)
+                if expected_answer and not homework_question.correct_answer:
+                    homework_question.correct_answer = expected_answer
+                db.session.add(HomeworkAttempt(
+                    question_id=homework_question.id,
+                    attempt_number=homework_question.attempts_count,
+                    student_response=student_response,
+                    evaluation_result=evaluation["feedback"],
+                    evaluation_level=level
+                ))
                 
                 # Calculate performance score
-                if evaluation["is_correct"]:
-                    session["performance_score"] = session.get("performance_score", 0) + 1.0
-                elif evaluation["evaluation_level"] == "partially_correct":
-                    session["performance_score"] = session.get("performance_score", 0) + 0.5
-                
-                self._save_student_progress(progress)
+                session.total_attempts = (session.total_attempts or 0) + 1
+                session.performance_score = (session.performance_score or 0) + EVALUATION_SCORES.get(level, 0.0)
+                progress_tracker.record_attempts(student_key, subject, [level], commit=False)
+                db.session.commit()
                 
                 return {
                     "success": True,
                     "evaluation": evaluation,
                     "feedback": evaluation["feedback"],
-                    "evaluation_level": evaluation["evaluation_level"],
+                    "evaluation_level": level,
                     "is_correct": evaluation["is_correct"],
-                    "session_id": session_id,
-                    "performance_score": session["performance_score"]
+                    "session_id": session.session_id,
+                    "performance_score": session.performance_score
                 }
             
             return {
@@ -726,108 +751,29 @@ class HomeworkAssistant:
             }
             
         except Exception as e:
+            db.session.rollback()
             logger.error(f"Error processing homework question: {e}")
             return {
                 "success": False,
                 "message": "Failed to process question",
                 "error": str(e)
             }
-        progress = self._load_student_progress()
-        
-        # Find the current session
-        session = None
-        for hw_session in progress["homework_sessions"]:
-            if hw_session["session_id"] == session_id:
-                session = hw_session
-                break
-        
-        if not session:
-            return {"success": False, "message": "Session not found"}
-        
-        subject = session["subject"]
-        
-        # Initialize question tracking
-        if not session.get("current_question") or session["current_question"]["text"] != question:
-            session["current_question"] = {
-                "text": question,
-                "attempts": [],
-                "hints_used": 0,
-                "start_time": datetime.now().isoformat()
-            }
-        
-        current_q = session["current_question"]
-        
-        # Handle hint request
-        if request_hint:
-            current_q["hints_used"] += 1
-            hint_level = min(current_q["hints_used"], 5)
-            
-            # Get context from related documents
-            context = self._get_question_context(question, subject)
-            
-            hint_data = self.generate_progressive_hint(
-                question, subject, hint_level, context, 
-                [attempt["response"] for attempt in current_q["attempts"]]
+    
+    def _get_session_question(self, session: HomeworkSession, question: str) -> HomeworkQuestion:
+        """Return the session's row for a question, creating it on first use."""
+        homework_question = HomeworkQuestion.query.filter_by(session_id=session.id, question_text=question).first()
+        if not homework_question:
+            homework_question = HomeworkQuestion(
+                session_id=session.id,
+                position=session.total_questions or 0,
+                question_text=question,
+                subject=session.subject,
+                difficulty_level=session.difficulty_level
             )
-            
-            # Update hint usage statistics
-            if subject not in progress["hint_usage"]:
-                progress["hint_usage"][subject] = {}
-            if str(hint_level) not in progress["hint_usage"][subject]:
-                progress["hint_usage"][subject][str(hint_level)] = 0
-            progress["hint_usage"][subject][str(hint_level)] += 1
-            
-            self._save_student_progress(progress)
-            
-            return {
-                "success": True,
-                "type": "hint",
-                "hint_data": hint_data,
-                "hints_used": current_q["hints_used"],
-                "message": f"Here's hint #{hint_level} to help you think about this question."
-            }
-        
-        # Handle student response
-        if student_response:
-            context = self._get_question_context(question, subject)
-            evaluation = self.evaluate_student_response(question, student_response, subject, context)
-            
-            # Record the attempt
-            current_q["attempts"].append({
-                "response": student_response,
-                "timestamp": datetime.now().isoformat(),
-                "evaluation": evaluation
-            })
-            
-            # Update performance data
-            if subject not in progress["performance_data"]:
-                progress["performance_data"][subject] = {"correct": 0, "total": 0}
-            
-            progress["performance_data"][subject]["total"] += 1
-            if evaluation["evaluation_level"] == "correct":
-                progress["performance_data"][subject]["correct"] += 1
-            elif evaluation["evaluation_level"] == "partially_correct":
-                progress["performance_data"][subject]["correct"] += 0.5
-            
-            self._save_student_progress(progress)
-            
-            return {
-                "success": True,
-                "type": "evaluation",
-                "evaluation": evaluation,
-                "attempts": len(current_q["attempts"]),
-                "hints_used": current_q["hints_used"]
-            }
-        
-        # Initial question presentation
-        return {
-            "success": True,
-            "type": "question",
-            "question": question,
-            "subject": subject,
-            "session_id": session_id,
-            "message": "I'm ready to help you with this question! You can either try answering it or ask for a hint to get started."
-        }
+            session.total_questions = (session.total_questions or 0) + 1
+            db.session.add(homework_question)
+            db.session.flush()
+        return homework_question
     
     def _get_question_context(self, question: str, subject: str) -> str:
         """
@@ -849,8 +795,8 @@ class HomeworkAssistant:
                 # Get a sample of content from each document
                 pages = DocumentPage.query.filter_by(document_id=doc.id).limit(2).all()
                 for page in pages:
-                    # Take first 300 characters as context
-                    context_parts.append(page.content[:300])
+                    # Take roughly the first 300 characters as context
+                    context_parts.append(truncate_text(page.content, 75))
             
             return "\n\n".join(context_parts)
             
@@ -858,53 +804,40 @@ class HomeworkAssistant:
             logger.error(f"Error getting context: {e}")
             return ""
     
-    def generate_homework_summary(self, session_id: str) -> Dict:
+    def generate_homework_summary(self, session_id: str, student_key: Optional[str] = None) -> Dict:
         """
         Generate a summary of the homework session for review.
         
         Args:
             session_id: Session ID to summarize
+            student_key: Identifies the student the session belongs to
             
         Returns:
             Dict containing session summary
         """
-        progress = self._load_student_progress()
-        
-        # Find the session
-        session = None
-        for hw_session in progress["homework_sessions"]:
-            if hw_session["session_id"] == session_id:
-                session = hw_session
-                break
-        
+        session = HomeworkSession.query.filter_by(session_id=session_id, student_key=student_key).first()
         if not session:
             return {"success": False, "message": "Session not found"}
         
         # Mark session as completed
-        session["status"] = "completed"
-        session["end_time"] = datetime.now().isoformat()
+        session.status = "completed"
+        session.end_time = datetime.utcnow()
+        db.session.commit()
         
-        # Generate summary
-        total_questions = len(session["questions"])
-        if session.get("current_question"):
-            total_questions += 1
-        
-        hints_used = session.get("current_question", {}).get("hints_used", 0)
-        attempts = len(session.get("current_question", {}).get("attempts", []))
+        hints_used = session.total_hints_used or 0
+        attempts = session.total_attempts or 0
         
         summary = {
             "session_id": session_id,
-            "subject": session["subject"],
-            "total_questions": total_questions,
+            "subject": session.subject,
+            "total_questions": session.total_questions or 0,
             "total_hints_used": hints_used,
             "total_attempts": attempts,
-            "session_duration": self._calculate_duration(session["start_time"], session["end_time"]),
-            "performance_summary": f"Completed {session['subject']} homework with {hints_used} hints and {attempts} attempts",
+            "session_duration": self._calculate_duration(session.start_time.isoformat(), session.end_time.isoformat()),
+            "performance_summary": f"Completed {session.subject} homework with {hints_used} hints and {attempts} attempts",
             "ready_for_submission": True
         }
         
-        self._save_student_progress(progress)
-        
         return {
             "success": True,
             "summary": summary,
@@ -928,55 +861,333 @@ class HomeworkAssistant:
         except:
             return "Unknown duration"
     
-    def get_student_progress_report(self) -> Dict:
+    def get_student_progress_report(self, student_key: Optional[str] = None) -> Dict:
         """
         Generate a comprehensive progress report for parents/teachers.
         
+        Only the student's own rows are read: their per-subject aggregates,
+        session counts and five most recent sessions.
+        
+        Args:
+            student_key: Identifies the student
+            
         Returns:
             Dict containing detailed progress information
         """
-        progress = self._load_student_progress()
-        
         # Calculate overall statistics
-        total_homework_sessions = len(progress["homework_sessions"])
-        total_worksheet_sessions = len(progress["worksheet_sessions"])
+        session_counts = dict(
+            db.session.query(HomeworkSession.session_type, func.count(HomeworkSession.id))
+            .filter(HomeworkSession.student_key == student_key)
+            .group_by(HomeworkSession.session_type)
+        )
         
-        # Subject-wise performance
+        # Subject-wise performance and hint usage, read from the maintained aggregates
         subject_performance = {}
-        for subject, data in progress.get("performance_data", {}).items():
-            if data["total"] > 0:
-                success_rate = (data["correct"] / data["total"]) * 100
-                subject_performance[subject] = {
-                    "success_rate": round(success_rate, 1),
-                    "total_attempts": data["total"],
-                    "correct_answers": data["correct"]
-                }
-        
-        # Hint usage analysis
         hint_analysis = {}
-        for subject, hints in progress.get("hint_usage", {}).items():
-            total_hints = sum(hints.values())
-            hint_analysis[subject] = {
-                "total_hints_used": total_hints,
-                "hint_distribution": hints
-            }
+        for subject_progress in progress_tracker.all(student_key):
+            if subject_progress.total_questions:
+                subject_performance[subject_progress.subject] = {
+                    "success_rate": round(subject_progress.success_rate, 1),
+                    "total_attempts": subject_progress.total_questions,
+                    "correct_answers": subject_progress.correct_answers,
+                    "partially_correct_answers": subject_progress.partially_correct_answers,
+                    "difficulty_level": subject_progress.difficulty_level
+                }
+            if subject_progress.total_hints_used:
+                hint_analysis[subject_progress.subject] = {
+                    "total_hints_used": subject_progress.total_hints_used,
+                    "average_hints_per_question": round(subject_progress.average_hints_per_question, 2),
+                    "hint_distribution": json.loads(subject_progress.hint_distribution or "{}")
+                }
         
         # Recent activity
         recent_sessions = []
-        all_sessions = progress["homework_sessions"] + progress["worksheet_sessions"]
-        for session in sorted(all_sessions, key=lambda x: x["start_time"], reverse=True)[:5]:
+        for session in (HomeworkSession.query.filter_by(student_key=student_key)
+                        .order_by(HomeworkSession.start_time.desc()).limit(5)):
             recent_sessions.append({
-                "subject": session["subject"],
-                "type": session.get("session_type", "homework"),
-                "date": session["start_time"][:10],
-                "status": session.get("status", "active")
+                "subject": session.subject,
+                "type": session.session_type or "homework",
+                "date": session.start_time.strftime('%Y-%m-%d'),
+                "status": session.status or "active"
             })
         
         return {
-            "total_homework_sessions": total_homework_sessions,
-            "total_worksheet_sessions": total_worksheet_sessions,
+            "total_homework_sessions": session_counts.get("homework", 0),
+            "total_worksheet_sessions": session_counts.get("worksheet", 0),
             "subject_performance": subject_performance,
             "hint_usage_analysis": hint_analysis,
             "recent_activity": recent_sessions,
             "generated_at": datetime.now().isoformat()
-        }
\ No newline at end of file
+        }
+    
+    def create_mock_exam(self, subject: str, questions: List[Dict], duration: int,
+                         student_key: Optional[str] = None) -> str:
+        """
+        Persist a generated mock exam together with its answer keys.
+        
+        Args:
+            subject: Subject area
+            questions: Generated questions with "question", "type", "options",
+                "correct_answer", "chapter" and optionally "topic"
+            duration: Exam duration in minutes
+            student_key: Identifies the student taking the exam
+            
+        Returns:
+            The exam ID the student submits answers against
+        """
+        import uuid
+        exam_id = str(uuid.uuid4())
+        
+        session = HomeworkSession(
+            session_id=exam_id,
+            student_key=student_key,
+            subject=subject,
+            session_type='mock_exam',
+            task_description=f"{subject} mock exam ({duration} minutes)",
+            total_questions=len(questions)
+        )
+        db.session.add(session)
+        db.session.flush()
+        
+        for position, question in enumerate(questions):
+            db.session.add(HomeworkQuestion(
+                session_id=session.id,
+                position=position,
+                question_text=question["question"],
+                question_type=question.get("type"),
+                options=json.dumps(question["options"], ensure_ascii=False) if question.get("options") else None,
+                correct_answer=question.get("correct_answer"),
+                subject=subject,
+                chapter=question.get("chapter"),
+                topic=question.get("topic") or question.get("chapter")
+            ))
+        
+        progress_tracker.record_session(student_key, subject, commit=False)
+        db.session.commit()
+        return exam_id
+    
+    def score_mock_exam(self, exam_id: str, answers: List[str], student_key: Optional[str] = None) -> Dict:
+        """
+        Score a submitted mock exam against its stored answer keys.
+        
+        Answers are evaluated with evaluate_student_responses, so objective
+        answers are graded locally and the short answers share one Gemini
+        call. Per-question results are recorded as HomeworkQuestion/HomeworkAttempt rows.
+        
+        Args:
+            exam_id: ID returned when the exam was generated
+            answers: Student answers in question order
+            student_key: Identifies the student; only their own exams can be scored
+            
+        Returns:
+            Dict containing the exam results
+        """
+        session = HomeworkSession.query.filter_by(
+            session_id=exam_id, session_type='mock_exam', student_key=student_key
+        ).first()
+        if not session:
+            return {"success": False, "message": "Exam not found. Please generate a new mock exam."}
+        if session.status == 'submitted':
+            return {"success": False, "message": "This exam has already been submitted."}
+        
+        questions = HomeworkQuestion.query.filter_by(session_id=session.id).order_by(HomeworkQuestion.position).all()
+        student_answers = [str(answers[i] or "").strip() if i < len(answers) else "" for i in range(len(questions))]
+        
+        evaluations = self.evaluate_student_responses([
+            {
+                "question": question.question_text,
+                "student_answer": answer,
+                "expected_answer": question.correct_answer,
+                "question_type": question.question_type,
+                "options": json.loads(question.options) if question.options else None
+            }
+            for question, answer in zip(questions, student_answers)
+        ], session.subject)
+        grades = [(evaluation["evaluation_level"], evaluation["grading_method"]) for evaluation in evaluations]
+        
+        now = datetime.utcnow()
+        question_results = []
+        for question, answer, evaluation in zip(questions, student_answers, evaluations):
+            level = evaluation["evaluation_level"]
+            question.attempts_count = (question.attempts_count or 0) + 1
+            question.final_answer = answer
+            question.is_correct = level == "correct"
+            question.evaluation_score = EVALUATION_SCORES.get(level, 0.0)
+            question.end_time = now
+            db.session.add(HomeworkAttempt(
+                question_id=question.id,
+                attempt_number=question.attempts_count,
+                student_response=answer,
+                evaluation_result=evaluation["feedback"],
+                evaluation_level=level
+            ))
+            question_results.append({
+                "question": question.question_text,
+                "your_answer": answer,
+                "correct_answer": question.correct_answer,
+                "evaluation_level": level
+            })
+        
+        total_questions = len(questions)
+        correct_answers = sum(1 for level, _ in grades if level == "correct")
+        partially_correct = sum(1 for level, _ in grades if level == "partially_correct")
+        points = sum(EVALUATION_SCORES.get(level, 0.0) for level, _ in grades)
+        score = int(round(points / total_questions * 100)) if total_questions else 0
+        
+        session.status = 'submitted'
+        session.end_time = now
+        session.total_attempts = (session.total_attempts or 0) + total_questions
+        session.performance_score = score
+        progress_tracker.record_attempts(session.student_key, session.subject, [level for level, _ in grades], commit=False)
+        db.session.commit()
+        
+        if score >= 80:
+            feedback = "Excellent work! You have a strong understanding of the subject."
+        elif score >= 60:
+            feedback = "Good effort! Review the topics you missed and practice more."
+        else:
+            feedback = "Keep practicing! Focus on understanding the basic concepts better."
+        
+        return {
+            "success": True,
+            "results": {
+                "score": score,
+                "total_questions": total_questions,
+                "correct_answers": correct_answers,
+                "partially_correct_answers": partially_correct,
+                "incorrect_answers": total_questions - correct_answers - partially_correct,
+                "time_taken": self._calculate_duration(session.start_time.isoformat(), now.isoformat()),
+                "feedback": feedback,
+                "questions": question_results
+            }
+        }
+    
+    def evaluate_student_responses(self, items: List[Dict], subject: str) -> List[Dict]:
+        """
+        Evaluate many answers at once, e.g. a whole worksheet or mock exam.
+        
+        Answers the local grader can decide never reach Gemini. All the others
+        are evaluated together in one structured-output request; only items
+        missing from or unreadable in that response fall back to individual
+        evaluate_student_response calls.
+        
+        Args:
+            items: Dicts with "question" and "student_answer", and optionally
+                "expected_answer", "question_type", "options" and "context"
+            subject: Subject area
+            
+        Returns:
+            One evaluation per item, shaped like evaluate_student_response()
+        """
+        evaluations = [None] * len(items)
+        needs_ai = []
+        
+        for index, item in enumerate(items):
+            answer = (item.get("student_answer") or "").strip()
+            if not answer:
+                evaluations[index] = self._local_evaluation({"is_correct": False, "method": "unanswered"}, subject)
+                continue
+            grade = grade_answer(item["question"], answer, item.get("expected_answer"),
+                                 item.get("question_type"), item.get("options"))
+            if grade is not None:
+                evaluations[index] = self._local_evaluation(grade, subject)
+            else:
+                needs_ai.append(index)
+        
+        if needs_ai:
+            batch_results = self._evaluate_batch([items[index] for index in needs_ai], subject)
+            fallbacks = 0
+            for index, evaluation in zip(needs_ai, batch_results):
+                if evaluation is None:
+                    item = items[index]
+                    fallbacks += 1
+                    evaluation = self.evaluate_student_response(
+                        item["question"], item["student_answer"], subject,
+                        context=item.get("context", ""),
+                        expected_answer=item.get("expected_answer"),
+                        question_type=item.get("question_type"),
+                        options=item.get("options")
+                    )
+                evaluations[index] = evaluation
+            logger.info(f"Evaluated {len(items)} answers: {len(items) - len(needs_ai)} locally, "
+                        f"{len(needs_ai) - fallbacks} in one batch, {fallbacks} individually")
+        
+        return evaluations
+    
+    def _evaluate_batch(self, items: List[Dict], subject: str) -> List[Optional[Dict]]:
+        """
+        Evaluate answers with JSON-schema-constrained Gemini requests.
+        
+        Items are sent in chunks small enough for every verdict to fit in the
+        route's max_output_tokens (12 at the default 2000), so a long worksheet
+        is never cut off mid-JSON.
+        
+        Returns:
+            One evaluation per item, or None for items whose verdict was missing
+            or could not be parsed
+        """
+        route = model_router.route('evaluate_response_batch', subject)
+        chunk_size = max(1, (route.max_output_tokens - BATCH_TOKENS_OVERHEAD) // BATCH_TOKENS_PER_ITEM)
+        results = []
+        for start in range(0, len(items), chunk_size):
+            results += self._evaluate_chunk(items[start:start + chunk_size], subject, route)
+        return results
+    
+    def _evaluate_chunk(self, items: List[Dict], subject: str, route) -> List[Optional[Dict]]:
+        """Evaluate one chunk of answers with a single Gemini request."""
+        from ai_schemas import AnswerEvaluation, parse_items
+        
+        numbered = "\n\n".join(
+            f"{number}. Question: {item['question']}\n"
+            + (f"   Expected answer: {item['expected_answer']}\n" if item.get("expected_answer") else "")
+            + (f"   Lesson context: {truncate_text(item['context'], 200)}\n" if item.get("context") else "")
+            + f"   Student's answer: {item['student_answer']}"
+            for number, item in enumerate(items, 1)
+        )
+        prompt = f"""
+        Subject: {subject}
+        You are evaluating answers from a 5th grade student (age 10-11).
+        Judge each answer for correctness, accepting answers with the same meaning
+        even if worded differently or with minor spelling mistakes. Give short,
+        encouraging feedback that focuses on the thinking process.
+        
+        {numbered}
+        
+        Return one verdict for every numbered answer.
+        """
+        
+        results = [None] * len(items)
+        try:
+            response = generate_content(
+                self.client, 'evaluate_response_batch',
+                model=route.model,
+                contents=prompt,
+                config=route.config(
+                    # Scale with the chunk; the policy's limit is the ceiling
+                    max_output_tokens=min(route.max_output_tokens, BATCH_TOKENS_PER_ITEM * len(items) + BATCH_TOKENS_OVERHEAD),
+                    response_mime_type="application/json",
+                    response_schema=list[AnswerEvaluation]
+                )
+            )
+        except Exception as e:
+            logger.error(f"Error in batch evaluation, falling back to individual calls: {e}")
+            return results
+        
+        for verdict in parse_items(response.text, AnswerEvaluation):
+            if not 1 <= verdict.item <= len(items) or results[verdict.item - 1] is not None:
+                continue
+            
+            evaluation_text = f"**Evaluation:** {verdict.evaluation_level.replace('_', ' ')}\n**Feedback:** {verdict.feedback}"
+            if verdict.improvement:
+                evaluation_text += f"\n**Areas to improve:** {verdict.improvement}"
+            results[verdict.item - 1] = {
+                "evaluation_text": evaluation_text,
+                "evaluation_level": verdict.evaluation_level,
+                "is_correct": verdict.evaluation_level == "correct",
+                "feedback": evaluation_text,
+                "grading_method": "ai_batch",
+                "subject": subject,
+                "timestamp": datetime.now().isoformat()
+            }
+        
+        return results
@@ -0,0 +1,111 @@
+"""
+Script-based Language Detection
+Detects English, Hindi and Telugu text from Unicode script blocks so speech
+can be routed to the matching voice without any network call.
+"""
+
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Unicode blocks used by the supported languages
+DEVANAGARI_PATTERN = re.compile(r'[ऀ-ॿ꣠-ꣿ᳐-᳿]')
+TELUGU_PATTERN = re.compile(r'[ఀ-౿]')
+LATIN_PATTERN = re.compile(r'[A-Za-zÀ-ɏ]')
+
+# Sentence boundaries, including the danda used in Hindi and Telugu text
+SENTENCE_PATTERN = re.compile(r'[^.!?।॥\n]+[.!?।॥\n]*')
+
+LANGUAGE_ALIASES = {
+    'en': 'en', 'english': 'en',
+    'hi': 'hi', 'hindi': 'hi',
+    'te': 'te', 'telugu': 'te'
+}
+
+
+def normalize_language(language, default='en'):
+    """
+    Normalize a language code or name to 'en', 'hi' or 'te'
+
+    Subject names such as "Maths" are not languages and fall back to the default.
+    """
+    if not language:
+        return default
+    return LANGUAGE_ALIASES.get(str(language).strip().lower(), default)
+
+
+def detect_language(text, default='en'):
+    """
+    Detect the language of a piece of text from its dominant script
+
+    Args:
+        text (str): Text to classify
+        default (str): Language returned when the text has no letters
+
+    Returns:
+        str: 'en', 'hi' or 'te'
+    """
+    if not text:
+        return default
+
+    counts = {
+        'hi': len(DEVANAGARI_PATTERN.findall(text)),
+        'te': len(TELUGU_PATTERN.findall(text)),
+        'en': len(LATIN_PATTERN.findall(text))
+    }
+    language, count = max(counts.items(), key=lambda item: item[1])
+    return language if count else default
+
+
+def split_by_language(text, default='en'):
+    """
+    Split text into consecutive same-language segments, sentence by sentence
+
+    Sentences without any letters (numbers, punctuation) stay with the
+    segment they appear in.
+
+    Args:
+        text (str): Possibly mixed-language text
+        default (str): Language for text that has no letters at all
+
+    Returns:
+        list: List of (language, segment_text) tuples in reading order
+    """
+    segments = []
+    for match in SENTENCE_PATTERN.finditer(text or ""):
+        sentence = match.group(0)
+        if not sentence.strip():
+            continue
+
+        previous = segments[-1][0] if segments else None
+        language = detect_language(sentence, default=previous or default)
+
+        if segments and language == previous:
+            segments[-1] = (language, segments[-1][1] + sentence)
+        else:
+            segments.append((language, sentence))
+
+    return [(language, segment.strip()) for language, segment in segments if segment.strip()]
+
+
+# Benchmark
+if __name__ == "__main__":
+    import timeit
+
+    test_answers = [
+        "The Earth has seven continents. पृथ्वी पर सात महाद्वीप हैं। Isn't that amazing?",
+        "భూమి సూర్యుని చుట్టూ తిరుగుతుంది। The Earth goes around the Sun in 365 days.",
+        "कविता का अर्थ समझिए। कवि प्रकृति की सुंदरता का वर्णन करता है। The poem is about nature.",
+        "Profit = Selling Price - Cost Price. So the profit is ₹40,000.",
+        "ఈ పాఠంలో మనం భిన్నాలు నేర్చుకుందాం। 1/2 + 1/4 = 3/4. చాలా బాగుంది!"
+    ] * 20
+
+    print("Segments for sample answers:")
+    for answer in test_answers[:5]:
+        print(f"  {split_by_language(answer)}")
+
+    runs = 100
+    elapsed = timeit.timeit(lambda: [split_by_language(answer) for answer in test_answers], number=runs)
+    per_answer_us = elapsed / (runs * len(test_answers)) * 1_000_000
+    print(f"Split {len(test_answers)} mixed-script answers x {runs} runs: {per_answer_us:.1f} µs per answer")
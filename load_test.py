@@ -0,0 +1,163 @@
+"""
+Load Test
+Measures how many concurrent AI requests one gunicorn worker can hold. The app
+is served with Gemini replaced by a stand-in that only sleeps, so the numbers
+reflect the serving mode rather than the model, and no API key is needed.
+
+Usage:
+    python load_test.py                       # sync vs threaded, 1 worker each
+    python load_test.py --concurrency 200 --requests 400 --threads 200
+
+The stand-in app is also importable by gunicorn as "load_test:app" when
+LOAD_TEST_SERVER=1 is set.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import statistics
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PATH = "/api/homework/ask-question"
+DEFAULT_BODY = {"question": "Why do plants need sunlight?", "subject": "Science"}
+
+
+class StandInResponse:
+    """Minimal stand-in for a Gemini response"""
+    usage_metadata = None
+
+    def __init__(self, text):
+        self.text = text
+
+
+def _standin_app():
+    """Build the app with Gemini calls replaced by a fixed-latency stand-in"""
+    from google.genai import models
+
+    latency = float(os.environ.get("STANDIN_LATENCY", "1.0"))
+
+    def generate_content(self, model, contents, config=None):
+        time.sleep(latency)
+        return StandInResponse("Plants use sunlight to make their food. What do you think happens at night?")
+
+    models.Models.generate_content = generate_content
+    os.environ.setdefault("GOOGLE_API_KEY", "stand-in")
+
+    import main
+    return main.app
+
+
+if os.environ.get("LOAD_TEST_SERVER") == "1":
+    app = _standin_app()
+
+
+def run_load(url, body, concurrency, total_requests):
+    """
+    Send total_requests POSTs with the given concurrency
+
+    Returns:
+        dict: Throughput, latency percentiles and error count
+    """
+    payload = json.dumps(body).encode("utf-8")
+
+    def send(_):
+        request = urllib.request.Request(url, data=payload, headers={"Content-Type": "application/json"})
+        start = time.monotonic()
+        try:
+            with urllib.request.urlopen(request, timeout=300) as response:
+                ok = response.status == 200 and json.loads(response.read()).get("success", False)
+        except Exception:
+            ok = False
+        return ok, time.monotonic() - start
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(send, range(total_requests)))
+    elapsed = time.monotonic() - start
+
+    latencies = sorted(latency for ok, latency in results if ok)
+    return {
+        "requests": total_requests,
+        "errors": sum(1 for ok, _ in results if not ok),
+        "elapsed_seconds": round(elapsed, 2),
+        "requests_per_second": round(total_requests / elapsed, 1),
+        "p50_seconds": round(statistics.median(latencies), 2) if latencies else None,
+        "p95_seconds": round(latencies[int(len(latencies) * 0.95) - 1], 2) if latencies else None
+    }
+
+
+def serve_and_measure(label, gunicorn_args, args):
+    """Start the stand-in app under gunicorn, run the load and stop it"""
+    port = _free_port()
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    env = dict(
+        os.environ,
+        LOAD_TEST_SERVER="1",
+        STANDIN_LATENCY=str(args.latency),
+        GUNICORN_THREADS=str(args.threads),
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'load_test.db')}",
+        PYTHONPATH=os.path.dirname(os.path.abspath(__file__))
+    )
+    command = [
+        sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}", "--workers", "1",
+        "--log-level", "warning", "--chdir", os.path.dirname(os.path.abspath(__file__)),
+        *gunicorn_args, "load_test:app"
+    ]
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_for_port(port)
+        result = run_load(f"http://127.0.0.1:{port}{args.path}", DEFAULT_BODY, args.concurrency, args.requests)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    print(f"{label:<28} {result['requests_per_second']:>8} req/s  p50 {result['p50_seconds']}s  "
+          f"p95 {result['p95_seconds']}s  errors {result['errors']}/{result['requests']}")
+    return result
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server did not start on port {port}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=DEFAULT_PATH, help="Endpoint to load")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=100, help="Total requests")
+    parser.add_argument("--latency", type=float, default=0.5, help="Stand-in Gemini latency in seconds")
+    parser.add_argument("--threads", type=int, default=100, help="Threads for the threaded worker")
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests to {args.path}, {args.concurrency} concurrent, "
+          f"stand-in latency {args.latency}s, 1 worker\n")
+    # A sync worker silently becomes gthread when threads > 1, so pin it to one
+    sync = serve_and_measure("sync worker", ["--worker-class", "sync", "--threads", "1"], args)
+    threaded = serve_and_measure(
+        f"gthread worker ({args.threads} threads)",
+        ["--worker-class", "gthread", "--threads", str(args.threads)], args
+    )
+    print(f"\nConcurrency gain: {threaded['requests_per_second'] / sync['requests_per_second']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
-from app import app
-import routes  # Import routes to register them
+from app import create_app, init_db
+
+app = create_app()
 
 if __name__ == '__main__':
+    init_db(app)
     app.run(host='0.0.0.0', port=5000, debug=True)
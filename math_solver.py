@@ -0,0 +1,924 @@
+"""
+Math Solver
+Solves the CBSE grade-5 Maths staples locally, in milliseconds, in the same
+**Question:** / **Solution:** / **Step N:** / **Answer:** / **Explanation:**
+format the tutor asks Gemini for:
+- HCF and LCM by prime factorization
+- adding, subtracting and simplifying fractions (including mixed numbers)
+- whole-number and decimal arithmetic, following BODMAS
+- metric, time and money unit conversion
+- percentages
+- one-step word problems, profit/loss and profit or loss percent
+
+The numbers are parsed out of the question. Anything the solver cannot
+classify with confidence returns None, and callers ask Gemini instead.
+"""
+
+import re
+import logging
+from decimal import Decimal
+from fractions import Fraction
+from functools import reduce
+from math import gcd
+
+logger = logging.getLogger(__name__)
+
+# 4,50,000 (Indian), 450,000 (international), 12 or 12.5
+NUMBER_PATTERN = re.compile(r'(?<![\d.])(?:\d{1,2}(?:,\d{2})*,\d{3}|\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?(?![\d])')
+
+# Kind -> unit -> size in that kind's smallest unit
+UNITS = {
+    'length': {'mm': 1, 'cm': 10, 'm': 1000, 'km': 1000000},
+    'mass': {'mg': 1, 'g': 1000, 'kg': 1000000},
+    'capacity': {'ml': 1, 'l': 1000},
+    'time': {'seconds': 1, 'minutes': 60, 'hours': 3600, 'days': 86400, 'weeks': 604800},
+    'money': {'paise': 1, 'rupees': 100}
+}
+
+UNIT_NAMES = {
+    'mm': ['millimetres', 'millimetre', 'millimeters', 'millimeter', 'mm'],
+    'cm': ['centimetres', 'centimetre', 'centimeters', 'centimeter', 'cm'],
+    'm': ['metres', 'metre', 'meters', 'meter', 'm'],
+    'km': ['kilometres', 'kilometre', 'kilometers', 'kilometer', 'km'],
+    'mg': ['milligrams', 'milligram', 'mg'],
+    'g': ['grams', 'gram', 'gm', 'g'],
+    'kg': ['kilograms', 'kilogram', 'kgs', 'kg'],
+    'ml': ['millilitres', 'millilitre', 'milliliters', 'milliliter', 'ml'],
+    'l': ['litres', 'litre', 'liters', 'liter', 'l'],
+    'seconds': ['seconds', 'second', 'secs', 'sec'],
+    'minutes': ['minutes', 'minute', 'mins', 'min'],
+    'hours': ['hours', 'hour', 'hrs', 'hr'],
+    'days': ['days', 'day'],
+    'weeks': ['weeks', 'week'],
+    'paise': ['paise', 'paisa'],
+    'rupees': ['rupees', 'rupee', 'rs']
+}
+UNIT_LOOKUP = {name: unit for unit, names in UNIT_NAMES.items() for name in names}
+UNIT_PATTERN = re.compile(
+    r'\b(' + '|'.join(sorted(map(re.escape, UNIT_LOOKUP), key=len, reverse=True)) + r')\b'
+)
+
+# One-step word problem cues, checked in this order
+DIVISION_CUES = ('equally', 'shared', 'share', 'distributed', 'distribute', 'divided among', 'divided between', 'split')
+TOTAL_CUES = ('in all', 'altogether', 'total', 'sum', 'together', 'combined')
+SUBTRACTION_CUES = ('left', 'remain', 'how many more', 'how much more', 'difference', 'fewer', 'gave away', 'lost')
+
+# A word problem must ask for an amount ...
+WORD_PROBLEM_ASK_PATTERN = re.compile(
+    r'\bhow (?:many|much)\b|\b(?:find|calculate|work out)\b|\bwhat (?:is|will be) the (?:total|cost|price)\b'
+)
+ASKED_NOUN_PATTERN = re.compile(r'how (?:many|much) (?!more|less|are|is|did|does|do|will|were|can|of)([a-z]+)')
+# ... and every number in it must be a quantity: "12 pencils", "8 more apples",
+# or the object of an action ("gave 18 to his friend"), never a reference
+# ("page 4", "Q3") or a choice ("8 or 9")
+QUANTITY_MODIFIERS = {'more', 'extra', 'fewer', 'less', 'other', 'new', 'old', 'big', 'small'}
+NON_NOUNS = {
+    'a', 'an', 'the', 'and', 'or', 'but', 'if', 'then', 'so', 'as', 'than', 'in', 'on', 'at', 'to', 'of', 'by', 'for',
+    'from', 'with', 'into', 'out', 'is', 'are', 'was', 'were', 'be', 'it', 'them', 'each', 'every', 'per', 'times',
+    'left', 'all', 'total', 'altogether', 'together', 'plus', 'minus', 'divided', 'multiplied', 'equals', 'more',
+    'less', 'fewer'
+}
+ACTION_VERBS = {
+    'has', 'had', 'have', 'gave', 'gives', 'give', 'got', 'gets', 'get', 'ate', 'eats', 'lost', 'loses', 'sold',
+    'sells', 'used', 'uses', 'spent', 'spends', 'received', 'receives', 'found', 'finds', 'took', 'takes', 'picked',
+    'bought', 'buys', 'added', 'adds', 'collected', 'collects', 'made', 'makes', 'paid', 'pays', 'saved', 'saves',
+    'needs', 'needed', 'scored', 'scores', 'won', 'wins', 'planted', 'plants', 'baked', 'bakes'
+}
+REFERENCE_WORDS = {
+    'page', 'pages', 'pg', 'p', 'exercise', 'ex', 'question', 'questions', 'q', 'chapter', 'ch', 'lesson', 'class',
+    'grade', 'std', 'standard', 'no', 'number', 'step', 'part', 'section', 'example', 'problem', 'table', 'figure',
+    'fig', 'activity', 'worksheet', 'line', 'unit', 'year'
+}
+
+# A rate names one group: "12 pencils in each box", "Each pencil costs 5 rupees",
+# "3 km every day", or a sentence opening "A box has 12 pencils"
+RATE_PATTERN = re.compile(r'\b(?:each|every|per)\s+([a-z]+)')
+OPENING_RATE_PATTERN = re.compile(r'^\s*(?:a|an|one)\s+([a-z]+)')
+IRREGULAR_PLURALS = {'children': 'child', 'people': 'person', 'men': 'man', 'women': 'woman', 'feet': 'foot', 'teeth': 'tooth'}
+
+# Why each operation was chosen, for the word-problem explanation
+WORD_PROBLEM_EXPLANATIONS = {
+    '+': "Words like 'in all', 'altogether' and 'total' tell us to put the amounts together, so we add.",
+    '-': "Words like 'left' and 'how many more' tell us to take one amount away from the other, so we subtract.",
+    '×': "When we know the amount for one group and want it for several groups, we multiply.",
+    '÷': "When a total is shared equally, or we want to know how many groups of a given size it makes, we divide."
+}
+
+# Words that may surround a bare calculation ("What is 3 + 4?", "Calculate 144 ÷ 12")
+ARITHMETIC_WORDS = {
+    'what', 'whats', 'is', 'are', 'calculate', 'compute', 'find', 'solve', 'evaluate', 'simplify', 'work', 'out',
+    'the', 'value', 'of', 'answer', 'result', 'equals', 'equal', 'to', 'please'
+}
+
+UNIT_LABELS = {'l': 'L', 'ml': 'mL'}
+
+OPERATION_WORDS = {'+': 'add', '-': 'subtract', '×': 'multiply', '÷': 'divide'}
+OPERATION_PHRASES = {'+': 'add {0} and {1}', '-': 'subtract {1} from {0}', '×': 'multiply {0} by {1}', '÷': 'divide {0} by {1}'}
+
+
+class MathSolution:
+    """A locally solved question"""
+
+    def __init__(self, kind, question, steps, answer, explanation):
+        self.kind = kind
+        self.question = question
+        self.steps = steps
+        self.answer = answer
+        self.explanation = explanation
+
+    @property
+    def text(self):
+        """The solution in the tutor's Question/Solution/Step/Answer/Explanation format"""
+        solution = f"**Question:** {self.question}\n\n**Solution:**\n"
+        for number, step in enumerate(self.steps, 1):
+            solution += f"**Step {number}:** {step}\n\n"
+        solution += f"**Answer:** {self.answer}\n\n"
+        solution += f"**Explanation:** {self.explanation}"
+        return solution
+
+
+def _numbers(text):
+    """Return the numbers in text as Fractions, in order"""
+    return [Fraction(match.replace(',', '')) for match in NUMBER_PATTERN.findall(text)]
+
+
+def _fmt(value):
+    """Format an exact value as a whole number or decimal, or None if it doesn't terminate"""
+    value = Fraction(value)
+    if value.denominator == 1:
+        return str(value.numerator)
+    denominator = value.denominator
+    for prime in (2, 5):
+        while denominator % prime == 0:
+            denominator //= prime
+    if denominator != 1:
+        return None
+    return format((Decimal(value.numerator) / Decimal(value.denominator)).normalize(), 'f')
+
+
+def _show(value):
+    """Format a value, rounding non-terminating decimals to 2 places"""
+    return _fmt(value) or f"about {float(value):.2f}"
+
+
+def _money(value):
+    """Format a rupee amount with Indian digit grouping: ₹4,70,000"""
+    text = _show(value)
+    whole, dot, fraction = text.partition('.')
+    if len(whole) > 3 and whole.isdigit():
+        head, tail = whole[:-3], whole[-3:]
+        whole = ','.join(re.findall(r'\d{1,2}(?=(?:\d{2})*$)', head)) + ',' + tail
+    return f"₹{whole}{dot}{fraction}"
+
+
+def _join(items):
+    """'a', 'a and b', 'a, b and c'"""
+    items = [str(item) for item in items]
+    return items[0] if len(items) == 1 else f"{', '.join(items[:-1])} and {items[-1]}"
+
+
+def _times(count):
+    return {1: 'once', 2: 'twice'}.get(count, f"{count} times")
+
+
+def _prime_factors(n):
+    factors = []
+    prime = 2
+    while prime * prime <= n:
+        while n % prime == 0:
+            factors.append(prime)
+            n //= prime
+        prime += 1
+    if n > 1:
+        factors.append(n)
+    return factors
+
+
+def _noun_forms(word):
+    """Singular guesses for a noun, so 'boxes' matches 'box' and 'children' matches 'child'"""
+    forms = {word, IRREGULAR_PLURALS.get(word, word)}
+    if word.endswith('ies'):
+        forms.add(word[:-3] + 'y')
+    if word.endswith('es'):
+        forms.add(word[:-2])
+    if word.endswith('s') and not word.endswith('ss'):
+        forms.add(word[:-1])
+    return forms
+
+
+def _same_noun(first, second):
+    return bool(first and second and _noun_forms(first) & _noun_forms(second))
+
+
+def _fraction_text(numerator, denominator):
+    return f"{numerator}/{denominator}"
+
+
+def _mixed_text(value):
+    """Show an improper fraction as a mixed number: 11/6 -> '1 5/6'"""
+    whole, remainder = divmod(abs(value.numerator), value.denominator)
+    sign = '-' if value < 0 else ''
+    if remainder == 0:
+        return f"{sign}{whole}"
+    return f"{sign}{whole} {remainder}/{value.denominator}" if whole else f"{sign}{remainder}/{value.denominator}"
+
+
+class MathSolver:
+    """Classifies a Maths question and solves it step by step"""
+
+    def solve(self, question):
+        """
+        Solve a question locally if it is one of the supported types
+
+        Args:
+            question (str): The student's question
+
+        Returns:
+            MathSolution: The worked solution, or None if the question was not recognised
+        """
+        question = (question or '').strip()
+        if not question or len(question) > 500:
+            return None
+        text = question.lower().replace('−', '-').replace('–', '-')
+        # ₹50 and Rs. 50 -> 50 rupees, so money reads like any other unit
+        text = re.sub(r'(?:₹|\brs\.?)\s*(\d[\d,]*(?:\.\d+)?)', r'\1 rupees', text)
+
+        for solver in (self._solve_hcf_lcm, self._solve_percentage, self._solve_units,
+                       self._solve_fractions, self._solve_expression, self._solve_word_problem):
+            try:
+                solution = solver(question, text)
+            except (ArithmeticError, ValueError) as e:
+                logger.debug(f"{solver.__name__} could not solve '{question}': {e}")
+                continue
+            if solution:
+                logger.info(f"Solved Maths question locally as {solution.kind}")
+                return solution
+        return None
+
+    def _solve_hcf_lcm(self, question, text):
+        hcf_match = re.search(r'\b(hcf|gcd|gcf|highest common factor|greatest common (?:factor|divisor))\b', text)
+        lcm_match = re.search(r'\b(lcm|lowest common multiple|least common multiple)\b', text)
+        if not (hcf_match or lcm_match):
+            return None
+
+        # Prefer the numbers after the keyword, so "Q3." or "chapter 4" is ignored
+        keyword_end = max(match.end() for match in (hcf_match, lcm_match) if match)
+        values = _numbers(text[keyword_end:]) or _numbers(text)
+        if not 2 <= len(values) <= 6 or any(v.denominator != 1 or not 2 <= v <= 1000000 for v in values):
+            return None
+        numbers = [int(v) for v in values]
+        factorizations = {n: _prime_factors(n) for n in numbers}
+        primes = sorted(set(p for factors in factorizations.values() for p in factors))
+
+        steps = []
+        lines = ["Find the prime factorization of each number by dividing by the smallest prime that divides it, until we reach 1."]
+        for n in numbers:
+            remaining = n
+            divisions = []
+            for p in factorizations[n]:
+                divisions.append(f"{remaining} ÷ {p} = {remaining // p}")
+                remaining //= p
+            lines.append(f"- **For {n}:** {', '.join(divisions)}. So {n} = {' × '.join(map(str, factorizations[n]))}")
+        steps.append("\n".join(lines))
+
+        answers = []
+        checks = []
+        if hcf_match:
+            lines = ["For the HCF, take the prime factors common to ALL the numbers, each as few times as it appears in any number."]
+            hcf_factors = []
+            for p in primes:
+                counts = [factorizations[n].count(p) for n in numbers]
+                if min(counts) == 0:
+                    missing = [n for n, count in zip(numbers, counts) if count == 0]
+                    lines.append(f"- Prime factor {p} is not in {_join(missing)}, so it is not common")
+                else:
+                    hcf_factors += [p] * min(counts)
+                    lines.append(f"- Prime factor {p} appears in every number, at least {_times(min(counts))}, so take it {_times(min(counts))}")
+            hcf = reduce(gcd, numbers)
+            if hcf_factors:
+                lines.append(f"- HCF = {' × '.join(map(str, hcf_factors))} = {hcf}")
+            else:
+                lines.append("- No prime factor is common to all the numbers, so HCF = 1")
+            steps.append("\n".join(lines))
+            answers.append(f"The HCF of {_join(numbers)} is {hcf}.")
+            checks.append(
+                "The HCF is the largest number that divides all the given numbers exactly. "
+                f"You can check: {', '.join(f'{n} ÷ {hcf} = {n // hcf}' for n in numbers)}, all with no remainder."
+            )
+
+        if lcm_match:
+            lines = ["For the LCM, take EVERY prime factor that appears, each as many times as it appears in the number that has it most."]
+            lcm_factors = []
+            for p in primes:
+                most = max(factorizations[n].count(p) for n in numbers)
+                lcm_factors += [p] * most
+                lines.append(f"- Prime factor {p}: appears at most {_times(most)}, so take it {_times(most)}")
+            lcm = reduce(lambda a, b: a * b // gcd(a, b), numbers)
+            lines.append(f"- LCM = {' × '.join(map(str, lcm_factors))} = {lcm}")
+            steps.append("\n".join(lines))
+            answers.append(f"The LCM of {_join(numbers)} is {lcm}.")
+            checks.append(
+                "The LCM is the smallest number that every given number divides exactly. "
+                f"You can check: {', '.join(f'{lcm} ÷ {n} = {lcm // n}' for n in numbers)}, all with no remainder."
+            )
+
+        return MathSolution('hcf_lcm', question, steps, " ".join(answers), " ".join(checks))
+
+    def _solve_percentage(self, question, text):
+        if not re.search(r'%|\bper ?cent', text):
+            return None
+        text = re.sub(r'\bper ?cent(age)?\b', '%', text)
+        number = r'(\d[\d,]*(?:\.\d+)?)'
+
+        match = re.search(number + r'\s*%\s*of\s*(?:rupees\s*)?' + number, text)
+        if match and len(_numbers(text)) == 2:
+            rate, whole = (Fraction(group.replace(',', '')) for group in match.groups())
+            result = rate * whole / 100
+            amount = _money if 'rupees' in text else _show
+            return MathSolution('percentage', question, [
+                f"{_fmt(rate)}% means {_fmt(rate)} out of every 100, so {_fmt(rate)}% = {_fmt(rate)}/100.",
+                f"Multiply the number by this fraction: {_fmt(rate)}/100 × {_fmt(whole)} = ({_fmt(rate)} × {_fmt(whole)}) ÷ 100 = {_fmt(rate * whole)} ÷ 100",
+                f"= {_show(result)}"
+            ], f"{_fmt(rate)}% of {amount(whole)} is {amount(result)}.",
+                "Per cent means 'out of 100', so to find a percentage of a number we find that many hundredths of it.")
+
+        part = whole = None
+        # (pattern, whether the whole comes before the part)
+        for pattern, whole_first in ((r'what\s*%\s*of\s*' + number + r'\s*is\s*' + number, True),
+                                     (r'what\s*%\s*is\s*' + number + r'\s*of\s*' + number, False),
+                                     (number + r'\s*is\s*what\s*%\s*of\s*' + number, False),
+                                     (number + r'\s*out\s*of\s*' + number, False)):
+            match = re.search(pattern, text)
+            if match and len(_numbers(text)) == 2:
+                first, second = (Fraction(group.replace(',', '')) for group in match.groups())
+                part, whole = (second, first) if whole_first else (first, second)
+                break
+        if part is None or whole == 0:
+            return None
+        result = part / whole * 100
+        return MathSolution('percentage', question, [
+            f"Write the part as a fraction of the whole: {_fmt(part)}/{_fmt(whole)}.",
+            f"To turn a fraction into a percentage, multiply by 100: {_fmt(part)}/{_fmt(whole)} × 100 = {_fmt(part * 100)} ÷ {_fmt(whole)}",
+            f"= {_show(result)}%"
+        ], f"{_fmt(part)} is {_show(result)}% of {_fmt(whole)}.",
+            "A percentage tells us how many parts out of 100. Multiplying the fraction by 100 tells us how many hundredths the part is of the whole.")
+
+    def _solve_units(self, question, text):
+        mentions = [(match.start(), match.end(), UNIT_LOOKUP[match.group(1)]) for match in UNIT_PATTERN.finditer(text)]
+        if len(mentions) < 2:
+            return None
+
+        quantities = []
+        targets = []
+        for start, end, unit in mentions:
+            before = re.search(r'(\d[\d,]*(?:\.\d+)?)\s*$', text[:start])
+            if before:
+                quantities.append((Fraction(before.group(1).replace(',', '')), unit))
+            else:
+                targets.append(unit)
+        if not quantities or len(set(targets)) != 1 or len(_numbers(text)) != len(quantities):
+            return None
+        target = targets[0]
+        kinds = {kind for kind, units in UNITS.items() for unit in [target] + [u for _, u in quantities] if unit in units}
+        if len(kinds) != 1:
+            return None
+        sizes = UNITS[kinds.pop()]
+        if all(unit == target for _, unit in quantities):
+            return None
+
+        def label(unit, singular=False):
+            if singular and unit.endswith('s'):
+                return 'paisa' if unit == 'paise' else unit[:-1]
+            return UNIT_LABELS.get(unit, unit)
+
+        steps = []
+        converted = []
+        for value, unit in quantities:
+            if unit == target:
+                converted.append(value)
+                continue
+            if sizes[unit] > sizes[target]:
+                factor = Fraction(sizes[unit], sizes[target])
+                steps.append(
+                    f"1 {label(unit, singular=True)} = {_fmt(factor)} {label(target)}. We are changing a bigger unit into a smaller one, so we multiply: "
+                    f"{_fmt(value)} × {_fmt(factor)} = {_show(value * factor)} {label(target)}."
+                )
+                converted.append(value * factor)
+            else:
+                factor = Fraction(sizes[target], sizes[unit])
+                steps.append(
+                    f"1 {label(target, singular=True)} = {_fmt(factor)} {label(unit)}. We are changing a smaller unit into a bigger one, so we divide: "
+                    f"{_fmt(value)} ÷ {_fmt(factor)} = {_show(value / factor)} {label(target)}."
+                )
+                converted.append(value / factor)
+        if len(converted) > 1:
+            steps.append(f"Add the parts: {' + '.join(_show(v) for v in converted)} = {_show(sum(converted))} {label(target)}.")
+        given = " ".join(f"{_fmt(value)} {label(unit)}" for value, unit in quantities)
+        steps.insert(0, f"We have {given} and need the answer in {label(target)}.")
+        return MathSolution('unit_conversion', question, steps, f"{given} = {_show(sum(converted))} {label(target)}.",
+                            "A bigger unit holds many smaller units, so converting to a smaller unit gives a bigger number "
+                            "(multiply), and converting to a bigger unit gives a smaller number (divide).")
+
+    def _solve_fractions(self, question, text):
+        matches = list(re.finditer(r'(?:(\d+)\s+)?(\d+)\s*/\s*(\d+)', text))
+        if not matches or any(int(m.group(3)) == 0 for m in matches):
+            return None
+        # Every number in the question must belong to a fraction
+        if len(_numbers(text)) != sum(3 if m.group(1) else 2 for m in matches):
+            return None
+
+        fractions = []
+        for m in matches:
+            whole = int(m.group(1) or 0)
+            fractions.append((whole, int(m.group(2)), int(m.group(3))))
+        wants_simplify = re.search(r'simplif|lowest terms|simplest form', text)
+
+        if len(matches) == 1:
+            if not wants_simplify or fractions[0][0]:
+                return None
+            return self._simplify_fraction(question, fractions[0][1], fractions[0][2])
+
+        subtract_from = re.search(r'subtract\s+.*?\s+from\s+', text)
+        operations = []
+        for previous, current in zip(matches, matches[1:]):
+            gap = text[previous.end():current.start()]
+            if '+' in gap or 'plus' in gap:
+                operations.append('+')
+            elif '-' in gap or 'minus' in gap:
+                operations.append('-')
+            elif re.search(r'\b(and|from)\b|,', gap) and len(matches) == 2:
+                if re.search(r'\b(add|sum|total|plus)\b', text):
+                    operations.append('+')
+                elif re.search(r'\b(subtract|difference|minus|take away)\b', text):
+                    operations.append('-')
+                else:
+                    return None
+            else:
+                return None
+        if subtract_from and len(fractions) == 2:
+            fractions.reverse()
+
+        steps = []
+        if any(whole for whole, _, _ in fractions):
+            lines = ["Change the mixed numbers into improper fractions (whole × denominator + numerator):"]
+            for whole, numerator, denominator in fractions:
+                if whole:
+                    lines.append(f"- {whole} {numerator}/{denominator} = ({whole} × {denominator} + {numerator})/{denominator} = "
+                                 f"{whole * denominator + numerator}/{denominator}")
+            steps.append("\n".join(lines))
+        terms = [(whole * denominator + numerator, denominator) for whole, numerator, denominator in fractions]
+
+        denominators = [d for _, d in terms]
+        common = reduce(lambda a, b: a * b // gcd(a, b), denominators)
+        if len(set(denominators)) == 1:
+            steps.append(f"The denominators are already the same ({common}), so we can work with the numerators directly.")
+            like_terms = terms
+        else:
+            steps.append(f"The denominators {_join(denominators)} are different. Their LCM is {common}, so we use {common} as the common denominator.")
+            like_terms = [(n * (common // d), common) for n, d in terms]
+            steps.append("Change each fraction into an equivalent fraction with denominator "
+                         f"{common}:\n" + "\n".join(
+                             f"- {n}/{d} = ({n} × {common // d})/({d} × {common // d}) = {n * (common // d)}/{common}"
+                             for n, d in terms if d != common
+                         ))
+
+        total = like_terms[0][0]
+        expression = str(like_terms[0][0])
+        for operation, (numerator, _) in zip(operations, like_terms[1:]):
+            total = total + numerator if operation == '+' else total - numerator
+            expression += f" {operation} {numerator}"
+        verb = 'Add' if set(operations) == {'+'} else 'Subtract' if set(operations) == {'-'} else 'Add and subtract'
+        steps.append(f"{verb} the numerators and keep the denominator: ({expression})/{common} = {total}/{common}.")
+
+        result = Fraction(total, common)
+        if result.denominator != common and total != 0:
+            divisor = gcd(abs(total), common)
+            steps.append(f"Simplify: the HCF of {abs(total)} and {common} is {divisor}, so divide both by {divisor}: "
+                         f"{total}/{common} = {result.numerator}/{result.denominator}.")
+        answer = _fraction_text(result.numerator, result.denominator) if result.denominator != 1 else str(result.numerator)
+        if abs(result) > 1 and result.denominator != 1:
+            steps.append(f"As a mixed number, {result.numerator}/{result.denominator} = {_mixed_text(result)}.")
+            answer += f" = {_mixed_text(result)}"
+        shown = f" {' '.join(f'{op} {n}/{d}' for op, (n, d) in zip(operations, terms[1:]))}"
+        return MathSolution('fractions', question, steps, f"{terms[0][0]}/{terms[0][1]}{shown} = {answer}",
+                            "We can only add or subtract fractions when they are parts of the same size, so we first make the "
+                            "denominators equal using their LCM, then add or subtract the numerators and simplify.")
+
+    def _simplify_fraction(self, question, numerator, denominator):
+        divisor = gcd(numerator, denominator)
+        steps = []
+        if max(numerator, denominator) <= 100:
+            factors = lambda n: [str(f) for f in range(1, n + 1) if n % f == 0]
+            steps.append(f"List the factors. Factors of {numerator}: {', '.join(factors(numerator))}. "
+                         f"Factors of {denominator}: {', '.join(factors(denominator))}.")
+        steps.append(f"The highest common factor (HCF) of {numerator} and {denominator} is {divisor}.")
+        result = Fraction(numerator, denominator)
+        if divisor == 1:
+            steps.append(f"The HCF is 1, so {numerator}/{denominator} is already in its simplest form.")
+        else:
+            steps.append(f"Divide the numerator and the denominator by {divisor}: "
+                         f"({numerator} ÷ {divisor})/({denominator} ÷ {divisor}) = {result.numerator}/{result.denominator}.")
+        answer = f"{numerator}/{denominator} = {result.numerator}/{result.denominator}" if result.denominator != 1 else f"{numerator}/{denominator} = {result.numerator}"
+        if result > 1 and result.denominator != 1:
+            answer += f" = {_mixed_text(result)}"
+        return MathSolution('fractions', question, steps, f"{answer} in its simplest form.",
+                            "Dividing the numerator and denominator by the same number gives an equal fraction. "
+                            "Dividing by their HCF makes them as small as possible in one step.")
+
+    def _solve_expression(self, question, text):
+        expression = text
+        for words, symbol in (('multiplied by', '*'), ('divided by', '÷'), ('times', '*'), ('plus', '+'), ('minus', '-')):
+            expression = re.sub(rf'\b{words}\b', f' {symbol} ', expression)
+        expression = expression.replace('×', '*')
+        expression = re.sub(r'(?<=\d)\s*x\s*(?=\d)', ' * ', expression)
+        expression = NUMBER_PATTERN.sub(lambda m: m.group(0).replace(',', ''), expression)
+        # a/b is a fraction, not a division: 3/4 ÷ 1/2 is (3/4) ÷ (1/2)
+        expression = re.sub(r'(?<=\d)\s*/\s*(?=\d)', '/', expression)
+        # "3 + 4%" or "2^3" use symbols the expression grammar doesn't know; don't drop them silently
+        if re.search(r"[^\w\s.+\-*/÷()=?!:,']", expression):
+            return None
+
+        candidates = [c.strip() for c in re.findall(r'[\d.\s+\-*/÷()]+', expression)]
+        candidates = [c for c in candidates if re.search(r'\d\s*[-+*÷]\s*[\d(]', c)]
+        if not candidates:
+            return None
+        candidate = re.sub(r'\s+', ' ', max(candidates, key=len)).strip(' =.')
+        if len(_numbers(candidate)) != len(_numbers(text)):
+            return None
+        # Only a bare calculation; "Explain 1/2" or "page 3 - 4" is not a sum to work out
+        if any(word not in ARITHMETIC_WORDS for word in re.findall(r'[^\W\d_]+', re.sub(r"'", '', expression))):
+            return None
+        fractions = '/' in candidate
+        if fractions and '.' in candidate:
+            return None  # leave 1/2 + 0.25 to the tutor rather than mix notations
+        tree = _ExpressionParser(candidate).parse()
+        if tree is None:
+            return None
+
+        operations = []
+        result = _evaluate(tree, operations)
+        if not operations or len(operations) > 8:
+            return None
+        shown = candidate.replace('*', '×')
+        if fractions:
+            # Keep fractions exact: 2/3 + 5 = 17/3 = 5 2/3, not "about 5.67"
+            steps = [] if len(operations) == 1 else [
+                "Follow BODMAS: Brackets first, then Division and Multiplication, then Addition and Subtraction, working from left to right."
+            ]
+            steps += [_fraction_step(*operation) for operation in operations]
+            answer = f"{shown} = {_exact_text(result)}"
+            if result.denominator != 1 and abs(result) > 1:
+                steps.append(f"As a mixed number, {_exact_text(result)} = {_mixed_text(result)}.")
+                answer += f" = {_mixed_text(result)}"
+            return MathSolution('arithmetic', question, steps, answer,
+                                "Fractions add and subtract only when they have the same denominator, multiply numerator by "
+                                "numerator and denominator by denominator, and dividing by a fraction is multiplying by its "
+                                "reciprocal. Keeping the fractions exact gives the answer in its simplest form.")
+
+        if len(operations) == 1:
+            left, symbol, right, _ = operations[0]
+            steps = [f"We need to {OPERATION_PHRASES[symbol].format(_fmt(left), _fmt(right))}."]
+            steps.append(_operation_step(*operations[0]))
+            steps.append(_check_step(*operations[0]))
+        else:
+            steps = ["Follow BODMAS: Brackets first, then Division and Multiplication, then Addition and Subtraction, working from left to right."]
+            steps += [_operation_step(*operation) for operation in operations]
+        return MathSolution('arithmetic', question, steps, f"{shown} = {_show(result)}",
+                            "Doing the operations in the right order (BODMAS) and working carefully with place value, "
+                            "lining up the decimal points, gives the correct result.")
+
+    def _solve_word_problem(self, question, text):
+        values = _numbers(text)
+        money = 'rupees' in text or re.search(r'\brs\.?\s*\d', text)
+        amount = _money if money else _show
+        noun_match = ASKED_NOUN_PATTERN.search(text)
+        noun = f" {noun_match.group(1)}" if noun_match and not money else ''
+
+        profit_loss = self._solve_profit_loss(question, text, values, amount)
+        if profit_loss:
+            return profit_loss
+        if len(values) != 2 or '%' in text or '/' in text:
+            return None
+        quantities = self._word_problem_quantities(text)
+        if not quantities:
+            return None
+
+        def has(cues):
+            return any(re.search(rf'\b{re.escape(cue)}\b', text) for cue in cues)
+
+        first, second = values
+        rate = self._solve_rate(text, quantities)
+        if rate:
+            left, symbol, right, reason, asked = rate
+            amount = _money if asked == 'rupees' else _show
+            noun = f" {asked}" if asked != 'rupees' else ''
+        elif RATE_PATTERN.search(text):
+            return None  # "each" that doesn't fit a rate we can read: let Gemini work it out
+        elif has(DIVISION_CUES):
+            symbol, (left, right) = '÷', (max(values), min(values))
+            reason = "The question shares a quantity out equally, so we divide"
+        elif has(SUBTRACTION_CUES) and not has(TOTAL_CUES):
+            symbol, (left, right) = '-', (max(values), min(values))
+            reason = "The question asks what is left or how much more, so we subtract the smaller number from the bigger one"
+        elif has(TOTAL_CUES) and not has(SUBTRACTION_CUES):
+            symbol, (left, right) = '+', (first, second)
+            reason = "The question asks for the total, so we add"
+        else:
+            return None
+        if symbol == '÷' and right == 0:
+            return None
+
+        operation = (left, symbol, right, _apply(left, symbol, right))
+        counted = noun.strip() and noun.strip() not in UNIT_LOOKUP
+        if symbol == '÷' and counted and operation[3].denominator != 1:
+            return None  # 50 sweets among 6 children doesn't share into whole sweets
+        shown = [_money(value) if quantity_noun == 'rupees' else _show(value) for value, quantity_noun, _ in quantities]
+        steps = [
+            f"Find the numbers given in the question: {shown[0]} and {shown[1]}.",
+            f"{reason}: {amount(left)} {symbol} {amount(right)}.",
+            _operation_step(*operation),
+            _check_step(*operation)
+        ]
+        return MathSolution('word_problem', question, steps, f"{amount(operation[3])}{noun}", WORD_PROBLEM_EXPLANATIONS[symbol])
+
+    def _word_problem_quantities(self, text):
+        """
+        Read the quantities of a word problem
+
+        Returns:
+            list: (value, noun, position) for each number, the noun '' for the object of an
+                action ("gave 18 to his friend"); None if the question doesn't ask for an
+                amount or a number is not a quantity
+        """
+        if not WORD_PROBLEM_ASK_PATTERN.search(text):
+            return None
+        quantities = []
+        for match in NUMBER_PATTERN.finditer(text):
+            before = re.findall(r'[^\W\d_]+|[^\w\s]', text[:match.start()])
+            after = re.findall(r'[^\W\d_]+|[^\w\s]', text[match.end():])[:2]
+            if match.start() and text[match.start() - 1].isalpha():
+                return None  # "q3", "ex4"
+            previous = before[-1] if before else ''
+            if previous in REFERENCE_WORDS or previous in ('#', '.') and len(before) > 1 and before[-2] in REFERENCE_WORDS:
+                return None
+            if after and after[0] in ('or', '/'):
+                return None  # a choice between numbers
+            noun = after[1] if len(after) > 1 and after[0] in QUANTITY_MODIFIERS else (after[0] if after else '')
+            if noun.isalpha() and noun not in NON_NOUNS:
+                quantities.append((Fraction(match.group(0).replace(',', '')), noun, match.start()))
+            elif previous in ACTION_VERBS:
+                quantities.append((Fraction(match.group(0).replace(',', '')), '', match.start()))
+            else:
+                return None
+        return quantities
+
+    def _solve_rate(self, text, quantities):
+        """
+        Choose the operation for a problem with one group's amount in it
+
+        "A box has 12 pencils. How many pencils are in 5 boxes?" multiplies;
+        "... 6 eggs in each basket. How many baskets?" and "24 apples and 6
+        friends. How many apples will each friend get?" divide.
+
+        Returns:
+            tuple: (left, symbol, right, reason, asked noun), or None if no rate fits the question
+        """
+        sentences = [(m.start(), m.group(0)) for m in re.finditer(r'.+?(?:[.?!](?=\s|$)|$)', text) if m.group(0).strip()]
+        asked_sentences = [sentence for sentence in sentences if WORD_PROBLEM_ASK_PATTERN.search(sentence[1])]
+        if not asked_sentences:
+            return None
+        asked_start, asked_text = asked_sentences[-1]
+        asked_match = ASKED_NOUN_PATTERN.search(asked_text)
+        if asked_match and asked_match.group(1) not in NON_NOUNS and asked_match.group(1) != 'money':
+            asked = asked_match.group(1)
+        elif 'rupees' in text and re.search(r'\bhow much\b|\b(?:cost|price|pay|spend|money)\b', asked_text):
+            asked = 'rupees'
+        else:
+            return None
+
+        # "How many apples will each friend get?": a total shared among a number of groups
+        group_match = RATE_PATTERN.search(asked_text)
+        if group_match:
+            group = group_match.group(1)
+            totals = [q for q in quantities if _same_noun(q[1], asked)]
+            groups = [q for q in quantities if _same_noun(q[1], group)]
+            if len(totals) == 1 and len(groups) == 1 and totals[0] is not groups[0]:
+                return (totals[0][0], '÷', groups[0][0],
+                        f"The question asks how much one {group} gets out of {_show(totals[0][0])} {totals[0][1]}, so we divide", asked)
+            return None
+
+        for start, sentence in sentences:
+            if start == asked_start:
+                continue
+            markers = [(start + m.start(), m.group(1)) for m in RATE_PATTERN.finditer(sentence)]
+            markers += [(start + m.start(), m.group(1)) for m in OPENING_RATE_PATTERN.finditer(sentence)]
+            for position, unit in markers:
+                in_sentence = [q for q in quantities if start <= q[2] < start + len(sentence) and q[1] and not _same_noun(q[1], unit)]
+                if unit in NON_NOUNS or not in_sentence:
+                    continue
+                rate = min(in_sentence, key=lambda q: abs(q[2] - position))
+                others = [q for q in quantities if q is not rate]
+                if len(others) != 1:
+                    return None
+                other = others[0]
+                if _same_noun(other[1], unit) and _same_noun(asked, rate[1]):
+                    return (rate[0], '×', other[0],
+                            f"The question gives the amount for one {unit} and asks about {_show(other[0])} {other[1]}, so we multiply",
+                            asked)
+                if _same_noun(other[1], rate[1]) and _same_noun(asked, unit):
+                    return (other[0], '÷', rate[0],
+                            f"The question gives the amount for one {unit} and asks how many {asked} make {_show(other[0])} {other[1]}, "
+                            f"so we divide", asked)
+        return None
+
+    def _solve_profit_loss(self, question, text, values, amount):
+        cost = re.search(r'\b(cost price|bought|buys|purchased|costs|cost)\b\D*?(\d[\d,]*(?:\.\d+)?)', text)
+        sold = re.search(r'\b(selling price|sold|sells)\b\D*?(\d[\d,]*(?:\.\d+)?)', text)
+        if not (cost and sold):
+            return None
+        extra = re.search(r'\b(repair|repairs|transport|spent|expenses)\b\D*?(\d[\d,]*(?:\.\d+)?)', text)
+        if len(values) != (3 if extra else 2):
+            return None
+        cost_price = Fraction(cost.group(2).replace(',', ''))
+        selling_price = Fraction(sold.group(2).replace(',', ''))
+
+        steps = []
+        if extra:
+            overhead = Fraction(extra.group(2).replace(',', ''))
+            steps.append(f"Total cost price (CP) = buying price + extra expenses = {amount(cost_price)} + {amount(overhead)} "
+                         f"= {amount(cost_price + overhead)}.")
+            cost_price += overhead
+        else:
+            steps.append(f"Cost price (CP) = {amount(cost_price)}.")
+        steps.append(f"Selling price (SP) = {amount(selling_price)}.")
+        if selling_price > cost_price:
+            kind, difference = 'Profit', selling_price - cost_price
+            steps.append(f"SP is more than CP, so there is a profit. Profit = SP - CP = {amount(selling_price)} - {amount(cost_price)} "
+                         f"= {amount(difference)}.")
+        elif selling_price < cost_price:
+            kind, difference = 'Loss', cost_price - selling_price
+            steps.append(f"SP is less than CP, so there is a loss. Loss = CP - SP = {amount(cost_price)} - {amount(selling_price)} "
+                         f"= {amount(difference)}.")
+        else:
+            kind, difference = None, Fraction(0)
+            steps.append("SP is equal to CP, so there is neither profit nor loss.")
+        answer = f"{kind} of {amount(difference)}." if kind else "No profit and no loss."
+        explanation = ("If we sell something for more than it cost us, we make a profit; if we sell it for less, we make a loss. "
+                       "The difference between the selling price and the cost price is the amount of profit or loss.")
+
+        if re.search(r'%|\bper ?cent', text):
+            if cost_price == 0:
+                return None
+            rate = difference / cost_price * 100
+            if kind:
+                steps.append(f"{kind} % = {kind} ÷ CP × 100 = {_fmt(difference)} ÷ {_fmt(cost_price)} × 100 = {_show(rate)}%.")
+                answer = f"{kind} of {amount(difference)}, which is a {kind.lower()} of {_show(rate)}%."
+            else:
+                answer = "No profit and no loss, so the profit or loss percent is 0%."
+            explanation += f" The {(kind or 'profit').lower()} percent compares it with the cost price, as so many parts out of 100."
+        return MathSolution('profit_loss', question, steps, answer, explanation)
+
+
+class _ExpressionParser:
+    """Recursive-descent parser for + - * / and brackets over exact numbers"""
+
+    def __init__(self, expression):
+        self.tokens = re.findall(r'\d+/\d+|\d+(?:\.\d+)?|[-+*÷()]', expression)
+        self.valid = ''.join(self.tokens) == re.sub(r'\s+', '', expression)
+        self.position = 0
+
+    def parse(self):
+        """Return a tree of ('num', value) and (symbol, left, right) nodes, or None if malformed"""
+        if not self.valid or not self.tokens:
+            return None
+        try:
+            tree = self._sum()
+        except (IndexError, ValueError):
+            return None
+        return tree if self.position == len(self.tokens) else None
+
+    def _peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _take(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def _sum(self):
+        node = self._product()
+        while self._peek() in ('+', '-'):
+            node = (self._take(), node, self._product())
+        return node
+
+    def _product(self):
+        node = self._atom()
+        while self._peek() in ('*', '÷'):
+            symbol = '×' if self._take() == '*' else '÷'
+            node = (symbol, node, self._atom())
+        return node
+
+    def _atom(self):
+        token = self._take()
+        if token == '(':
+            node = self._sum()
+            if self._take() != ')':
+                raise ValueError("Unbalanced brackets")
+            return node
+        if token[0].isdigit():
+            return ('num', Fraction(token))  # "3/4" is one exact fraction; Fraction('3/0') raises ZeroDivisionError
+        raise ValueError(f"Unexpected token {token}")
+
+
+def _apply(left, symbol, right):
+    if symbol == '+':
+        return left + right
+    if symbol == '-':
+        return left - right
+    if symbol == '×':
+        return left * right
+    return left / right  # ZeroDivisionError is an ArithmeticError
+
+
+def _evaluate(node, operations):
+    """Evaluate a parsed expression, recording each operation in the order it is done"""
+    if node[0] == 'num':
+        return node[1]
+    symbol, left_node, right_node = node
+    left = _evaluate(left_node, operations)
+    right = _evaluate(right_node, operations)
+    result = _apply(left, symbol, right)
+    operations.append((left, symbol, right, result))
+    return result
+
+
+def _decimal_places(value):
+    text = _fmt(value) or ''
+    return len(text.split('.')[1]) if '.' in text else 0
+
+
+def _operation_step(left, symbol, right, result):
+    """Describe one operation, with the decimal-point working a 5th grader is taught"""
+    places = (_decimal_places(left), _decimal_places(right))
+    line = f"{_show(left)} {symbol} {_show(right)} = {_show(result)}"
+    if symbol in ('+', '-') and any(places):
+        width = max(places)
+        padded = [format(Decimal(_fmt(value)), f'.{width}f') for value in (left, right)]
+        return f"Line up the decimal points (write {padded[0]} and {padded[1]}) and {OPERATION_WORDS[symbol]} place by place: {line}."
+    if symbol == '×' and any(places):
+        whole_left, whole_right = left * 10 ** places[0], right * 10 ** places[1]
+        return (f"Multiply as whole numbers: {_fmt(whole_left)} × {_fmt(whole_right)} = {_fmt(whole_left * whole_right)}. "
+                f"The numbers have {places[0] + places[1]} decimal place(s) in all, so the answer has {places[0] + places[1]}: {line}.")
+    if symbol == '÷' and places[1]:
+        scale = 10 ** places[1]
+        return (f"Make the divisor a whole number by multiplying both numbers by {scale}: "
+                f"{_fmt(left * scale)} ÷ {_fmt(right * scale)} = {_show(result)}. So {line}.")
+    if symbol == '÷' and left.denominator == 1 and right.denominator == 1 and result.denominator != 1:
+        quotient, remainder = divmod(left.numerator, right.numerator)
+        return f"{_fmt(left)} ÷ {_fmt(right)} = {quotient} remainder {remainder}. As a decimal, {line}."
+    return f"{line}."
+
+
+def _exact_text(value):
+    """A whole number or a fraction in its simplest form: 5, 17/3"""
+    return str(value.numerator) if value.denominator == 1 else _fraction_text(value.numerator, value.denominator)
+
+
+def _fraction_step(left, symbol, right, result):
+    """Describe one operation on fractions, keeping every value exact"""
+    line = f"{_exact_text(left)} {symbol} {_exact_text(right)} = {_exact_text(result)}"
+    if symbol in ('+', '-'):
+        common = left.denominator * right.denominator // gcd(left.denominator, right.denominator)
+        if common == 1:
+            return f"{line}."
+        scaled = [f"{value.numerator * (common // value.denominator)}/{common}" for value in (left, right)]
+        working = f"{scaled[0]} {symbol} {scaled[1]} = {_fraction_text((result * common).numerator, common)}"
+        if result.denominator != common:
+            working += f" = {_exact_text(result)}"
+        return f"Write both with the common denominator {common}, then {OPERATION_WORDS[symbol]} the numerators: {working}."
+    if symbol == '×':
+        product = _fraction_text(left.numerator * right.numerator, left.denominator * right.denominator)
+        simplified = f" = {_exact_text(result)}" if product != _exact_text(result) else ''
+        return (f"Multiply the numerators and the denominators: ({left.numerator} × {right.numerator})/"
+                f"({left.denominator} × {right.denominator}) = {product}{simplified}.")
+    reciprocal = 1 / right
+    return (f"Dividing by {_exact_text(right)} is the same as multiplying by {_exact_text(reciprocal)}: "
+            f"{_exact_text(left)} × {_exact_text(reciprocal)} = {_exact_text(result)}.")
+
+
+def _check_step(left, symbol, right, result):
+    """Check an operation with its inverse"""
+    if symbol == '+':
+        return f"Check by subtracting: {_show(result)} - {_show(right)} = {_show(left)}. ✓"
+    if symbol == '-':
+        return f"Check by adding: {_show(result)} + {_show(right)} = {_show(left)}. ✓"
+    if symbol == '×':
+        if right == 0:
+            return "Any number multiplied by 0 is 0. ✓"
+        return f"Check by dividing: {_show(result)} ÷ {_show(right)} = {_show(left)}. ✓"
+    if _fmt(result) is None:
+        return f"Check by multiplying: {_show(right)} × {float(result):.2f} comes to about {_show(left)}. ✓"
+    return f"Check by multiplying: {_show(result)} × {_show(right)} = {_show(left)}. ✓"
+
+
+math_solver = MathSolver()
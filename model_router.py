@@ -0,0 +1,213 @@
+"""
+Model Router
+One policy table decides which Gemini model, output token limit and
+temperature each call site uses, with per-subject overrides. Quick
+encouragement and short hints go to a small fast model, Maths solutions to a
+stronger one. The table can be tuned without code changes by pointing
+MODEL_ROUTING_FILE at a JSON file:
+
+    {
+        "routes": {"hint": {"model": "gemini-2.5-flash", "max_output_tokens": 800}},
+        "subjects": {"Maths": {"ask_question": {"model": "gemini-2.5-pro"}}}
+    }
+
+Measured latency and cost per route are reported by
+gemini_client.get_route_stats().
+"""
+
+import os
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+FAST_MODEL = "gemini-2.5-flash-lite"
+DEFAULT_MODEL = "gemini-2.5-flash"
+STRONG_MODEL = "gemini-2.5-pro"
+
+# Call site -> model, max_output_tokens, temperature and thinking_budget.
+# thinking_budget 0 turns off 2.5 thinking where a direct answer is enough;
+# leaving it out uses the model's default.
+ROUTING_POLICIES = {
+    # Student-facing answers
+    'ask_question': {'model': DEFAULT_MODEL, 'max_output_tokens': 4000, 'temperature': 0, 'thinking_budget': 0},
+    'answer_doubt': {'model': DEFAULT_MODEL, 'max_output_tokens': 4000, 'temperature': 0},
+    'homework_fallback': {'model': DEFAULT_MODEL, 'max_output_tokens': 1000, 'temperature': 0.7, 'thinking_budget': 0},
+    'revision_summary': {'model': DEFAULT_MODEL, 'max_output_tokens': 800, 'temperature': 0.3, 'thinking_budget': 0},
+
+    # Short, low-stakes text
+    'hint': {'model': FAST_MODEL, 'max_output_tokens': 1000, 'temperature': 0.7},
+    'encouragement': {'model': FAST_MODEL, 'max_output_tokens': 300, 'temperature': 0.8},
+    'comprehension_question': {'model': FAST_MODEL, 'max_output_tokens': 200, 'temperature': 0.7},
+    'identify_key_topics': {'model': FAST_MODEL, 'max_output_tokens': 200, 'temperature': 0.3},
+    'simplify_content': {'model': FAST_MODEL, 'max_output_tokens': 800, 'temperature': 0.7},
+
+    # Structured generation and grading
+    'hint_ladder': {'model': DEFAULT_MODEL, 'max_output_tokens': 2500, 'temperature': 0.7, 'thinking_budget': 0},
+    'evaluate_response': {'model': DEFAULT_MODEL, 'max_output_tokens': 800, 'temperature': 0.6, 'thinking_budget': 0},
+    'evaluate_response_batch': {'model': DEFAULT_MODEL, 'max_output_tokens': 2000, 'temperature': 0, 'thinking_budget': 0},
+    'parse_document_questions': {'model': DEFAULT_MODEL, 'max_output_tokens': 2000, 'temperature': 0.3, 'thinking_budget': 0},
+    'quiz': {'model': DEFAULT_MODEL, 'max_output_tokens': 1500, 'temperature': 0.5, 'thinking_budget': 0},
+    'question_bank': {'model': DEFAULT_MODEL, 'max_output_tokens': 3000, 'temperature': 0.7, 'thinking_budget': 0},
+    'mock_exam': {'model': DEFAULT_MODEL, 'max_output_tokens': 1000, 'temperature': 0.4, 'thinking_budget': 0},
+    'priority_topics': {'model': DEFAULT_MODEL, 'max_output_tokens': 800, 'temperature': 0.3, 'thinking_budget': 0}
+}
+DEFAULT_POLICY = {'model': DEFAULT_MODEL, 'max_output_tokens': 1000, 'temperature': 0.7}
+
+# Models that cannot turn thinking off; a thinking_budget of 0 is dropped for them
+ALWAYS_THINKING_MODELS = {STRONG_MODEL}
+
+# Subject -> call site -> settings replacing the call site's defaults
+SUBJECT_OVERRIDES = {
+    'Maths': {
+        # Worked solutions need the stronger model; its thinking shares the output limit
+        'ask_question': {'model': STRONG_MODEL, 'max_output_tokens': 8000},
+        'answer_doubt': {'model': STRONG_MODEL, 'max_output_tokens': 8000},
+        'homework_fallback': {'model': STRONG_MODEL, 'max_output_tokens': 4000}
+    }
+}
+
+# USD per million tokens: (input, output). Cached input is billed at 25%.
+MODEL_PRICES = {
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-flash-8b": (0.0375, 0.15)
+}
+CACHED_INPUT_PRICE_RATIO = 0.25
+
+POLICY_KEYS = {'model', 'max_output_tokens', 'temperature', 'thinking_budget'}
+
+
+class ModelRoute:
+    """The model and generation settings chosen for one call"""
+
+    def __init__(self, call_site, model, max_output_tokens, temperature, thinking_budget=None):
+        self.call_site = call_site
+        self.model = model
+        self.max_output_tokens = max_output_tokens
+        self.temperature = temperature
+        self.thinking_budget = thinking_budget
+
+    def generation_kwargs(self, **overrides):
+        """Return GenerateContentConfig keyword arguments for this route"""
+        from google.genai import types
+
+        kwargs = {'temperature': self.temperature, 'max_output_tokens': self.max_output_tokens}
+        if self.thinking_budget is not None:
+            kwargs['thinking_config'] = types.ThinkingConfig(thinking_budget=self.thinking_budget)
+        kwargs.update(overrides)
+        return kwargs
+
+    def config(self, **overrides):
+        """
+        Build a GenerateContentConfig for this route
+
+        Args:
+            **overrides: Extra or replacement config fields, e.g. system_instruction
+
+        Returns:
+            types.GenerateContentConfig
+        """
+        from google.genai import types
+
+        return types.GenerateContentConfig(**self.generation_kwargs(**overrides))
+
+    def to_dict(self):
+        return {
+            'model': self.model,
+            'max_output_tokens': self.max_output_tokens,
+            'temperature': self.temperature,
+            'thinking_budget': self.thinking_budget
+        }
+
+
+class ModelRouter:
+    """Resolves call sites to routes from the policy table and its overrides"""
+
+    def __init__(self, policies, subject_overrides, config_path=None):
+        self.policies = {call_site: dict(policy) for call_site, policy in policies.items()}
+        self.subject_overrides = {
+            subject: {call_site: dict(policy) for call_site, policy in routes.items()}
+            for subject, routes in subject_overrides.items()
+        }
+        self.config_path = config_path
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def route(self, call_site, subject=None):
+        """
+        Choose the model and settings for a call
+
+        Args:
+            call_site (str): Name of the calling feature, e.g. 'hint'
+            subject (str): Optional subject for subject-specific overrides
+
+        Returns:
+            ModelRoute: The chosen route
+        """
+        self._load_config()
+        policy = dict(DEFAULT_POLICY)
+        policy.update(self.policies.get(call_site, {}))
+        if subject:
+            policy.update(self.subject_overrides.get(subject, {}).get(call_site, {}))
+        if policy.get('thinking_budget') == 0 and policy['model'] in ALWAYS_THINKING_MODELS:
+            del policy['thinking_budget']
+        return ModelRoute(call_site, **policy)
+
+    def describe(self):
+        """Return the effective policy table and subject overrides"""
+        self._load_config()
+        return {
+            'routes': {call_site: self.route(call_site).to_dict() for call_site in sorted(self.policies)},
+            'subjects': self.subject_overrides
+        }
+
+    def _load_config(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if self.config_path:
+                try:
+                    with open(self.config_path, 'r', encoding='utf-8') as f:
+                        config = json.load(f)
+                    for call_site, policy in config.get('routes', {}).items():
+                        self.policies.setdefault(call_site, {}).update(self._valid(policy, call_site))
+                    for subject, routes in config.get('subjects', {}).items():
+                        for call_site, policy in routes.items():
+                            self.subject_overrides.setdefault(subject, {}).setdefault(call_site, {}).update(
+                                self._valid(policy, f"{subject}/{call_site}")
+                            )
+                    logger.info(f"Loaded model routing overrides from {self.config_path}")
+                except (OSError, ValueError, AttributeError) as e:
+                    logger.error(f"Could not load model routing file {self.config_path}: {e}")
+            self._loaded = True
+
+    def _valid(self, policy, name):
+        unknown = set(policy) - POLICY_KEYS
+        if unknown:
+            logger.warning(f"Ignoring unknown model routing keys for {name}: {sorted(unknown)}")
+        return {key: value for key, value in policy.items() if key in POLICY_KEYS}
+
+
+def estimate_cost(model, prompt_tokens, response_tokens, cached_tokens=0):
+    """
+    Estimate the USD cost of a call from its token counts
+
+    Returns:
+        float: Estimated cost, or 0.0 for models without a known price
+    """
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (
+        uncached * input_price
+        + cached_tokens * input_price * CACHED_INPUT_PRICE_RATIO
+        + response_tokens * output_price
+    ) / 1_000_000
+
+
+model_router = ModelRouter(ROUTING_POLICIES, SUBJECT_OVERRIDES, os.environ.get("MODEL_ROUTING_FILE"))
@@ -14,6 +14,10 @@ class Document(db.Model):
     
     # Relationship with pages
     pages = db.relationship('DocumentPage', backref='document', lazy=True, cascade='all, delete-orphan')
+    generated_content = db.relationship('GeneratedContent', backref='document', lazy=True, cascade='all, delete-orphan')
+    bank_items = db.relationship('QuestionBankItem', backref='document', lazy=True, cascade='all, delete-orphan')
+    review_cards = db.relationship('ReviewCard', backref='document', lazy=True, cascade='all, delete-orphan')
+    reading_progress = db.relationship('ReadingProgress', backref='document', lazy=True, cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Document {self.original_filename}>'
@@ -31,13 +35,114 @@ class DocumentPage(db.Model):
         return f'<DocumentPage {self.document_id} - Page {self.page_number}>'
 
 
+class GeneratedContent(db.Model):
+    """Model to store validated AI-generated items (quiz questions, exam questions, priority topics)"""
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False, index=True)
+    content_type = db.Column(db.String(50), nullable=False)  # 'quiz', 'mock_exam', 'priority_topics'
+    language = db.Column(db.String(10), default='en')
+    items = db.Column(db.Text, nullable=False)  # JSON list of schema-validated items
+    model = db.Column(db.String(100))
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<GeneratedContent {self.content_type} for document {self.document_id}>'
+
+
+class QuestionBankItem(db.Model):
+    """Model to store pre-generated practice questions for a document"""
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False, index=True)
+    question_text = db.Column(db.Text, nullable=False)
+    question_hash = db.Column(db.String(64), nullable=False)  # Normalized text hash, for de-duplication
+    question_type = db.Column(db.String(50), nullable=False)  # 'multiple_choice', 'true_false', 'short_answer'
+    options = db.Column(db.Text)  # JSON list of multiple-choice options
+    answer = db.Column(db.Text, nullable=False)
+    difficulty_level = db.Column(db.String(20), default='basic')  # 'basic', 'intermediate', 'advanced'
+    topic = db.Column(db.String(255))
+    page_number = db.Column(db.Integer)
+    language = db.Column(db.String(10), default='en')
+    times_served = db.Column(db.Integer, default=0)
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    servings = db.relationship('ServedQuestion', backref='item', lazy=True, cascade='all, delete-orphan')
+    
+    __table_args__ = (db.UniqueConstraint('document_id', 'question_hash', name='uq_bank_document_question'),)
+    
+    def __repr__(self):
+        return f'<QuestionBankItem {self.id} for document {self.document_id}>'
+
+
+class ServedQuestion(db.Model):
+    """Model to record which bank questions a student has been shown recently"""
+    id = db.Column(db.Integer, primary_key=True)
+    student_key = db.Column(db.String(64), nullable=False)
+    item_id = db.Column(db.Integer, db.ForeignKey('question_bank_item.id'), nullable=False)
+    served_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.Index('ix_served_question_student_time', 'student_key', 'served_at'),)
+    
+    def __repr__(self):
+        return f'<ServedQuestion {self.student_key}-{self.item_id}>'
+
+
+class HintLadder(db.Model):
+    """Model to cache all five progressive hint levels generated for a question"""
+    id = db.Column(db.Integer, primary_key=True)
+    ladder_key = db.Column(db.String(64), unique=True, nullable=False)  # Hash of question, subject, context and attempts
+    question_text = db.Column(db.Text, nullable=False)
+    subject = db.Column(db.String(100), nullable=False)
+    hints = db.Column(db.Text, nullable=False)  # JSON list of hint texts, level 1 first
+    times_used = db.Column(db.Integer, default=0)
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<HintLadder {self.subject} {self.ladder_key[:8]}>'
+
+
+class Student(db.Model):
+    """Model to store a lightweight student profile (no authentication)"""
+    id = db.Column(db.Integer, primary_key=True)
+    student_key = db.Column(db.String(64), unique=True, nullable=False)  # Opaque key kept in the browser session
+    display_name = db.Column(db.String(100))
+    grade = db.Column(db.String(20))
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    last_seen = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Student {self.display_name or self.student_key}>'
+
+
+class ReadingProgress(db.Model):
+    """Model to store a student's position in the interactive reading of a document"""
+    id = db.Column(db.Integer, primary_key=True)
+    student_key = db.Column(db.String(64), nullable=False)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False)
+    current_page = db.Column(db.Integer, default=1)
+    current_chunk = db.Column(db.Integer, default=0)
+    questions_asked = db.Column(db.Integer, default=0)
+    correct_answers = db.Column(db.Integer, default=0)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('student_key', 'document_id', name='uq_reading_progress_student_document'),
+    )
+    
+    def __repr__(self):
+        return f'<ReadingProgress {self.student_key} document {self.document_id}>'
+
+
 class HomeworkSession(db.Model):
     """Model to store homework sessions and progress"""
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.String(100), unique=True, nullable=False)
+    student_key = db.Column(db.String(64), index=True)
     subject = db.Column(db.String(100), nullable=False)
-    session_type = db.Column(db.String(50), default='homework')  # 'homework', 'worksheet', 'exam_prep'
+    session_type = db.Column(db.String(50), default='homework')  # 'homework', 'worksheet', 'exam', 'mock_exam', 'standalone'
     task_description = db.Column(db.Text)
+    document_id = db.Column(db.Integer)  # Uploaded homework document, if any
+    difficulty_level = db.Column(db.String(20), default='basic')
     start_time = db.Column(db.DateTime, default=datetime.utcnow)
     end_time = db.Column(db.DateTime)
     status = db.Column(db.String(20), default='active')  # 'active', 'completed', 'submitted'
@@ -50,6 +155,10 @@ class HomeworkSession(db.Model):
     # Relationships
     questions = db.relationship('HomeworkQuestion', backref='session', lazy=True, cascade='all, delete-orphan')
     
+    __table_args__ = (
+        db.Index('ix_homework_session_student_start', 'student_key', 'start_time'),
+    )
+    
     def __repr__(self):
         return f'<HomeworkSession {self.session_id}>'
 
@@ -57,10 +166,16 @@ class HomeworkSession(db.Model):
 class HomeworkQuestion(db.Model):
     """Model to store individual homework questions and responses"""
     id = db.Column(db.Integer, primary_key=True)
-    session_id = db.Column(db.Integer, db.ForeignKey('homework_session.id'), nullable=False)
+    session_id = db.Column(db.Integer, db.ForeignKey('homework_session.id'), nullable=False, index=True)
     question_text = db.Column(db.Text, nullable=False)
     question_type = db.Column(db.String(50))  # 'multiple_choice', 'short_answer', 'essay', 'math_problem'
     difficulty_level = db.Column(db.String(20), default='basic')  # 'basic', 'intermediate', 'advanced'
+    position = db.Column(db.Integer, default=0)  # Order within the session, e.g. exam question number
+    options = db.Column(db.Text)  # JSON list of multiple-choice options
+    correct_answer = db.Column(db.Text)  # Answer key, if known when the question was created
+    subject = db.Column(db.String(100))
+    chapter = db.Column(db.String(255))
+    topic = db.Column(db.String(255))  # Concept tested, tagged when the question is stored
     start_time = db.Column(db.DateTime, default=datetime.utcnow)
     end_time = db.Column(db.DateTime)
     hints_used = db.Column(db.Integer, default=0)
@@ -73,6 +188,12 @@ class HomeworkQuestion(db.Model):
     # Relationships
     attempts = db.relationship('HomeworkAttempt', backref='question', lazy=True, cascade='all, delete-orphan')
     hints = db.relationship('HomeworkHint', backref='question', lazy=True, cascade='all, delete-orphan')
+    review_cards = db.relationship('ReviewCard', backref='homework_question', lazy=True, cascade='all, delete-orphan')
+    
+    # Covers the weak-topic aggregation (GROUP BY subject, chapter, topic)
+    __table_args__ = (
+        db.Index('ix_homework_question_topic_stats', 'subject', 'chapter', 'topic', 'is_correct', 'evaluation_score'),
+    )
     
     def __repr__(self):
         return f'<HomeworkQuestion {self.id}>'
@@ -81,7 +202,7 @@ class HomeworkQuestion(db.Model):
 class HomeworkAttempt(db.Model):
     """Model to store student attempts for each question"""
     id = db.Column(db.Integer, primary_key=True)
-    question_id = db.Column(db.Integer, db.ForeignKey('homework_question.id'), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('homework_question.id'), nullable=False, index=True)
     attempt_number = db.Column(db.Integer, nullable=False)
     student_response = db.Column(db.Text, nullable=False)
     evaluation_result = db.Column(db.Text)  # AI evaluation feedback
@@ -95,7 +216,7 @@ class HomeworkAttempt(db.Model):
 class HomeworkHint(db.Model):
     """Model to store hints provided for each question"""
     id = db.Column(db.Integer, primary_key=True)
-    question_id = db.Column(db.Integer, db.ForeignKey('homework_question.id'), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('homework_question.id'), nullable=False, index=True)
     hint_level = db.Column(db.Integer, nullable=False)  # 1-5 progressive levels
     hint_type = db.Column(db.String(50))  # 'gentle_nudge', 'conceptual_hint', etc.
     hint_text = db.Column(db.Text, nullable=False)
@@ -106,18 +227,53 @@ class HomeworkHint(db.Model):
 
 
 class StudentProgress(db.Model):
-    """Model to track overall student progress and performance"""
+    """Model to track a student's overall progress and performance in a subject"""
     id = db.Column(db.Integer, primary_key=True)
+    student_key = db.Column(db.String(64), nullable=False)
     subject = db.Column(db.String(100), nullable=False)
     total_sessions = db.Column(db.Integer, default=0)
     total_questions = db.Column(db.Integer, default=0)
     correct_answers = db.Column(db.Integer, default=0)
     partially_correct_answers = db.Column(db.Integer, default=0)
     total_hints_used = db.Column(db.Integer, default=0)
+    hint_distribution = db.Column(db.Text)  # JSON: hint level -> times used
     average_hints_per_question = db.Column(db.Float, default=0.0)
     success_rate = db.Column(db.Float, default=0.0)
     difficulty_level = db.Column(db.String(20), default='basic')
     last_updated = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.UniqueConstraint('student_key', 'subject', name='uq_student_progress_student_subject'),
+    )
+    
+    def __repr__(self):
+        return f'<StudentProgress {self.student_key} {self.subject}>'
+
+
+class ReviewCard(db.Model):
+    """Model to store spaced-repetition (SM-2) state for one concept card of a student"""
+    id = db.Column(db.Integer, primary_key=True)
+    student_key = db.Column(db.String(64), nullable=False)
+    card_key = db.Column(db.String(100), nullable=False)  # 'chapter:<document id>' or 'question:<homework question id>'
+    source = db.Column(db.String(20), nullable=False)  # 'chapter', 'missed_question'
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'))
+    homework_question_id = db.Column(db.Integer, db.ForeignKey('homework_question.id'))
+    subject = db.Column(db.String(100), nullable=False)
+    topic = db.Column(db.String(255), nullable=False)
+    prompt = db.Column(db.Text)  # The missed question, for question cards
+    answer = db.Column(db.Text)
+    ease_factor = db.Column(db.Float, default=2.5)
+    interval_days = db.Column(db.Integer, default=0)
+    repetitions = db.Column(db.Integer, default=0)
+    lapses = db.Column(db.Integer, default=0)
+    due_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_reviewed_at = db.Column(db.DateTime)
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('student_key', 'card_key', name='uq_review_card_student_card'),
+        db.Index('ix_review_card_student_due', 'student_key', 'due_at'),
+    )
+    
     def __repr__(self):
-        return f'<StudentProgress {self.subject}>'
\ No newline at end of file
+        return f'<ReviewCard {self.student_key} {self.card_key}>'
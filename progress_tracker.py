@@ -0,0 +1,114 @@
+"""
+Progress Tracker
+Keeps each student's per-subject StudentProgress aggregates current as
+events happen. Every answer evaluation, hint and session start updates the
+(student, subject) row in the same transaction, so reports, adaptive
+difficulty and recommendations read one row instead of scanning history.
+"""
+
+import json
+import logging
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, StudentProgress
+
+logger = logging.getLogger(__name__)
+
+# Success rate (percent) needed for each difficulty level
+DIFFICULTY_THRESHOLDS = [
+    (80, "advanced"),
+    (60, "intermediate")
+]
+
+
+class ProgressTracker:
+    """Incrementally maintains StudentProgress rows"""
+
+    def record_session(self, student_key, subject, commit=True):
+        """Count a newly started session for a subject"""
+        progress = self._locked_row(student_key, subject)
+        progress.total_sessions += 1
+        self._finish(progress, commit)
+
+    def record_attempts(self, student_key, subject, evaluation_levels, commit=True):
+        """
+        Count evaluated answers for a subject
+
+        Args:
+            student_key (str): Identifies the student
+            subject (str): Subject area
+            evaluation_levels (list): 'correct', 'partially_correct' or
+                'incorrect' for each answer
+            commit (bool): Commit now; pass False to join the caller's transaction
+        """
+        if not evaluation_levels:
+            return
+        progress = self._locked_row(student_key, subject)
+        progress.total_questions += len(evaluation_levels)
+        progress.correct_answers += sum(1 for level in evaluation_levels if level == "correct")
+        progress.partially_correct_answers += sum(1 for level in evaluation_levels if level == "partially_correct")
+        self._finish(progress, commit)
+
+    def record_hint(self, student_key, subject, hint_level, commit=True):
+        """Count a hint used at the given level (1-5)"""
+        progress = self._locked_row(student_key, subject)
+        progress.total_hints_used += 1
+        distribution = json.loads(progress.hint_distribution or "{}")
+        distribution[str(hint_level)] = distribution.get(str(hint_level), 0) + 1
+        progress.hint_distribution = json.dumps(distribution)
+        self._finish(progress, commit)
+
+    def get(self, student_key, subject):
+        """Return the student's StudentProgress row for a subject, or None"""
+        return StudentProgress.query.filter_by(student_key=student_key, subject=subject).first()
+
+    def all(self, student_key):
+        """Return the student's StudentProgress rows for every subject"""
+        return StudentProgress.query.filter_by(student_key=student_key).order_by(StudentProgress.subject).all()
+
+    def difficulty_for(self, student_key, subject):
+        """Return the stored difficulty level for a subject ('basic' if new)"""
+        progress = self.get(student_key, subject)
+        return progress.difficulty_level if progress else "basic"
+
+    def _locked_row(self, student_key, subject):
+        # Lock the row so concurrent events cannot overwrite each other's counts
+        query = StudentProgress.query.filter_by(student_key=student_key, subject=subject)
+        progress = query.with_for_update().first()
+        if progress:
+            return progress
+        try:
+            with db.session.begin_nested():
+                progress = StudentProgress(
+                    student_key=student_key, subject=subject, total_sessions=0, total_questions=0, correct_answers=0,
+                    partially_correct_answers=0, total_hints_used=0, average_hints_per_question=0.0,
+                    success_rate=0.0, difficulty_level="basic"
+                )
+                db.session.add(progress)
+        except IntegrityError:
+            # Another request created the row first
+            progress = query.with_for_update().one()
+        return progress
+
+    def _finish(self, progress, commit):
+        total = progress.total_questions
+        if total:
+            progress.success_rate = (progress.correct_answers + 0.5 * progress.partially_correct_answers) / total * 100
+            progress.average_hints_per_question = progress.total_hints_used / total
+        progress.difficulty_level = self._difficulty(progress.success_rate if total else None)
+        progress.last_updated = datetime.utcnow()
+        if commit:
+            db.session.commit()
+
+    def _difficulty(self, success_rate):
+        if success_rate is None:
+            return "basic"  # Start with basic for new subjects
+        for threshold, level in DIFFICULTY_THRESHOLDS:
+            if success_rate >= threshold:
+                return level
+        return "basic"
+
+
+progress_tracker = ProgressTracker()
@@ -0,0 +1,167 @@
+"""
+Prompt Builder
+Local token estimation and per-call-site context budgets for Gemini prompts.
+Context is trimmed on page, paragraph, sentence and word boundaries so words
+and Hindi/Telugu grapheme clusters are never cut in half.
+"""
+
+import re
+import logging
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# Approximate characters per token by script. Gemini's tokenizer packs
+# Latin text far more densely than Devanagari or Telugu.
+LATIN_CHARS_PER_TOKEN = 4.0
+INDIC_CHARS_PER_TOKEN = 2.0
+
+INDIC_PATTERN = re.compile(r'[ऀ-ॿఀ-౿]')
+ASCII_PATTERN = re.compile(r'[\x00-\x7f]')
+
+# Maximum tokens of lesson context each call site may embed in its prompt
+CONTEXT_BUDGETS = {
+    'ask_question': 20000,
+    'quiz': 12000,
+    'parse_document_questions': 12000,
+    'answer_doubt': 4000,
+    'hint': 1500,
+    'evaluate_response': 1500,
+    'revision_summary': 600,
+    'mock_exam': 500,
+    'priority_topics': 400
+}
+DEFAULT_CONTEXT_BUDGET = 4000
+
+JOINING_CHARACTERS = {'्', '్', '‌', '‍'}  # viramas, ZWNJ, ZWJ
+
+
+def estimate_tokens(text):
+    """
+    Estimate the Gemini token count of text without a network call
+
+    Args:
+        text (str): Text to measure
+
+    Returns:
+        int: Estimated token count
+    """
+    if not text:
+        return 0
+    indic = len(INDIC_PATTERN.findall(text))
+    ascii_chars = len(ASCII_PATTERN.findall(text))
+    other = len(text) - indic - ascii_chars  # emojis, symbols, other scripts
+    return int(ascii_chars / LATIN_CHARS_PER_TOKEN + indic / INDIC_CHARS_PER_TOKEN + other) + 1
+
+
+def context_budget(call_site):
+    """Return the context token budget for a call site"""
+    return CONTEXT_BUDGETS.get(call_site, DEFAULT_CONTEXT_BUDGET)
+
+
+def build_page_context(pages, max_tokens=None):
+    """
+    Build "--- Page N ---" context from pages within a token budget
+
+    Whole pages are kept while they fit; the first page that does not fit is
+    cut on a paragraph (then sentence, then word) boundary and the rest dropped.
+
+    Args:
+        pages (list): DocumentPage rows or (page_number, content) tuples
+        max_tokens (int): Token budget, or None for no limit
+
+    Returns:
+        str: Context text
+    """
+    context_parts = []
+    remaining = max_tokens
+
+    for page in pages:
+        page_number, content = page if isinstance(page, tuple) else (page.page_number, page.content)
+        part = f"--- Page {page_number} ---\n{content}\n"
+
+        if remaining is None:
+            context_parts.append(part)
+            continue
+
+        cost = estimate_tokens(part)
+        if cost <= remaining:
+            context_parts.append(part)
+            remaining -= cost
+            continue
+
+        header = f"--- Page {page_number} ---\n"
+        trimmed = truncate_text(content, remaining - estimate_tokens(header))
+        if trimmed:
+            context_parts.append(f"{header}{trimmed}\n")
+        logger.info(f"Context trimmed at page {page_number} to fit {max_tokens} tokens")
+        break
+
+    return "\n".join(context_parts)
+
+
+def truncate_text(text, max_tokens):
+    """
+    Trim text to a token budget on the largest boundary that still fits
+
+    Args:
+        text (str): Text to trim
+        max_tokens (int): Token budget
+
+    Returns:
+        str: Trimmed text (possibly empty)
+    """
+    if not text or max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    for splitter in (_split_paragraphs, _split_sentences, _split_words):
+        kept = _take_units(splitter(text), max_tokens)
+        if kept:
+            return kept.rstrip()
+
+    return _cut_graphemes(text, max_tokens)
+
+
+def _split_paragraphs(text):
+    return re.split(r'(?<=\n)', text)
+
+
+def _split_sentences(text):
+    return re.split(r'(?<=[.!?।॥])(?=\s)', text)
+
+
+def _split_words(text):
+    return re.split(r'(?<=\s)', text)
+
+
+def _take_units(units, max_tokens):
+    kept = []
+    used = 0
+    for unit in units:
+        cost = estimate_tokens(unit)
+        if used + cost > max_tokens:
+            break
+        kept.append(unit)
+        used += cost
+    return "".join(kept)
+
+
+def _cut_graphemes(text, max_tokens):
+    """Character cut for text without spaces that never splits a grapheme cluster"""
+    low, high = 0, min(len(text), int(max_tokens * LATIN_CHARS_PER_TOKEN))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    end = low
+    while 0 < end < len(text) and (
+        unicodedata.category(text[end]).startswith('M')
+        or text[end] in JOINING_CHARACTERS
+        or text[end - 1] in JOINING_CHARACTERS
+    ):
+        end -= 1
+    return text[:end]
@@ -0,0 +1,238 @@
+"""
+Question Bank
+Persistent per-document pool of pre-generated practice questions. The bank is
+filled in the background when a document is uploaded and topped up as
+students use it up, so quizzes and mock exams are served from the database
+without a Gemini call on the request path.
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Document, DocumentPage, QuestionBankItem, ServedQuestion
+from language_detector import normalize_language
+from single_flight import single_flight, make_key
+
+logger = logging.getLogger(__name__)
+
+
+class QuestionBank:
+    """Fills, tops up and samples the per-document question bank"""
+
+    def __init__(self, batch_size=15, max_items_per_document=150, recent_window=100,
+                 served_retention_days=30, max_workers=1):
+        self.batch_size = batch_size
+        self.max_items_per_document = max_items_per_document
+        self.recent_window = recent_window
+        self.served_retention = timedelta(days=served_retention_days)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="question-bank")
+        self._lock = threading.Lock()
+        self._scheduled = set()
+
+    def schedule_fill(self, document_id, batches=1):
+        """Queue a background fill for a document unless one is already queued"""
+        with self._lock:
+            if document_id in self._scheduled:
+                return
+            self._scheduled.add(document_id)
+        # The worker thread has no app context; hand it the app itself
+        app = current_app._get_current_object()
+        self._executor.submit(self._fill_in_background, app, document_id, batches)
+
+    def _fill_in_background(self, app, document_id, batches):
+        try:
+            with app.app_context():
+                # Only one worker fills a given document at a time
+                added = single_flight.do(
+                    make_key('bank-fill', document_id),
+                    lambda: self.fill(document_id, batches),
+                    timeout=300, shared=True
+                )
+                logger.info(f"Question bank for document {document_id}: added {added} questions")
+        except Exception as e:
+            logger.error(f"Error filling question bank for document {document_id}: {e}")
+        finally:
+            with self._lock:
+                self._scheduled.discard(document_id)
+
+    def fill(self, document_id, batches=1):
+        """
+        Generate questions for a document and add them to its bank
+
+        Args:
+            document_id (int): Document to generate questions for
+            batches (int): Number of generation calls to make
+
+        Returns:
+            int: Number of new questions added
+        """
+        from ai_tutor import AITutor
+
+        document = Document.query.get(document_id)
+        if not document:
+            return 0
+        pages = DocumentPage.query.filter_by(document_id=document_id).order_by(DocumentPage.page_number).all()
+        if not pages:
+            return 0
+
+        tutor = AITutor()
+        added = 0
+        for _ in range(batches):
+            if QuestionBankItem.query.filter_by(document_id=document_id).count() >= self.max_items_per_document:
+                break
+            recent_questions = [
+                item.question_text for item in QuestionBankItem.query.filter_by(document_id=document_id)
+                .order_by(QuestionBankItem.created_date.desc()).limit(30)
+            ]
+            questions = tutor.generate_bank_questions(document, pages, self.batch_size, avoid=recent_questions)
+            added += self.add_items(document, questions)
+        return added
+
+    def add_items(self, document, questions):
+        """
+        Add generated questions to a document's bank, skipping duplicates
+
+        Args:
+            document: Document row
+            questions (list): Dicts with question, type, options, answer and
+                optionally page, difficulty and topic
+
+        Returns:
+            int: Number of questions added
+        """
+        existing = {
+            question_hash for (question_hash,) in
+            db.session.query(QuestionBankItem.question_hash).filter_by(document_id=document.id)
+        }
+        language = normalize_language(document.subject)
+
+        added = 0
+        for question in questions:
+            question_hash = self._question_hash(question["question"])
+            if question_hash in existing:
+                continue
+            existing.add(question_hash)
+            db.session.add(QuestionBankItem(
+                document_id=document.id,
+                question_text=question["question"],
+                question_hash=question_hash,
+                question_type=question["type"],
+                options=json.dumps(question["options"], ensure_ascii=False) if question.get("options") else None,
+                answer=question["answer"],
+                difficulty_level=question.get("difficulty", "basic"),
+                topic=question.get("topic"),
+                page_number=question.get("page"),
+                language=language
+            ))
+            added += 1
+
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another worker added some of the same questions concurrently
+            db.session.rollback()
+            logger.warning(f"Duplicate questions skipped for document {document.id}")
+            return 0
+        return added
+
+    def sample(self, document_ids, student_key, count, question_types=None):
+        """
+        Pick questions for a student from the bank, avoiding recently seen ones
+
+        Questions the student has not seen recently are preferred; recently
+        seen ones are only reused when the bank runs short. Documents whose
+        unseen pool is running low are queued for a background top-up.
+
+        Args:
+            document_ids (list): Documents to draw from
+            student_key (str): Identifies the student
+            count (int): Number of questions wanted
+            question_types (list): Optional allowed question types
+
+        Returns:
+            list: Question dicts (possibly fewer than count, or empty)
+        """
+        base_query = QuestionBankItem.query.filter(QuestionBankItem.document_id.in_(document_ids))
+        if question_types:
+            base_query = base_query.filter(QuestionBankItem.question_type.in_(question_types))
+
+        recently_served = (
+            db.session.query(ServedQuestion.item_id)
+            .filter(ServedQuestion.student_key == student_key)
+            .order_by(ServedQuestion.served_at.desc())
+            .limit(self.recent_window)
+            .subquery()
+        )
+        unseen_query = base_query.filter(~QuestionBankItem.id.in_(db.session.query(recently_served.c.item_id)))
+
+        items = unseen_query.order_by(func.random()).limit(count).all()
+        if len(items) < count:
+            chosen_ids = [item.id for item in items]
+            items += (
+                base_query.filter(~QuestionBankItem.id.in_(chosen_ids))
+                .order_by(func.random()).limit(count - len(items)).all()
+            )
+
+        if items:
+            self._record_served(student_key, items)
+        self._top_up_if_low(document_ids, unseen_query, count)
+
+        return [self._to_dict(item) for item in items]
+
+    def _record_served(self, student_key, items):
+        now = datetime.utcnow()
+        for item in items:
+            item.times_served = (item.times_served or 0) + 1
+            db.session.add(ServedQuestion(student_key=student_key, item_id=item.id, served_at=now))
+        ServedQuestion.query.filter(
+            ServedQuestion.student_key == student_key,
+            ServedQuestion.served_at < now - self.served_retention
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+    def _top_up_if_low(self, document_ids, unseen_query, count):
+        # Keep at least two more requests' worth of unseen questions in the bank
+        if unseen_query.count() >= count * 2:
+            return
+        bank_sizes = dict(
+            db.session.query(QuestionBankItem.document_id, func.count(QuestionBankItem.id))
+            .filter(QuestionBankItem.document_id.in_(document_ids))
+            .group_by(QuestionBankItem.document_id)
+        )
+        for document_id in document_ids:
+            if bank_sizes.get(document_id, 0) < self.max_items_per_document:
+                self.schedule_fill(document_id)
+
+    def _question_hash(self, text):
+        normalized = re.sub(r'\W+', ' ', text.lower()).strip()
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def _to_dict(self, item):
+        return {
+            "id": item.id,
+            "document_id": item.document_id,
+            "question": item.question_text,
+            "type": item.question_type,
+            "options": json.loads(item.options) if item.options else [],
+            "answer": item.answer,
+            "difficulty": item.difficulty_level,
+            "topic": item.topic,
+            "page": item.page_number,
+            "language": item.language
+        }
+
+
+question_bank = QuestionBank(
+    batch_size=int(os.environ.get("QUESTION_BANK_BATCH_SIZE", "15")),
+    max_items_per_document=int(os.environ.get("QUESTION_BANK_MAX_ITEMS", "150"))
+)
@@ -0,0 +1,156 @@
+"""
+Render Cache
+Keeps the rendered library pages (home, subjects, subject chapters, ask page)
+in memory. They only change when a document is uploaded or deleted, so each
+cached page is keyed by a library version that those views bump; gunicorn
+workers on the same host share the version through a small file, so a bump
+in one worker invalidates every worker's copies. Entries also expire after
+RENDER_CACHE_TTL seconds to bound staleness from changes made elsewhere
+(another host, a manual database edit).
+
+Pages are served with an ETag of their HTML and `Cache-Control: no-cache`, so
+browsers revalidate each visit and usually get a 304. Requests with pending
+flash messages are rendered normally, since the messages are shown once.
+"""
+
+import os
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from functools import wraps
+from collections import OrderedDict
+
+from flask import request, session, make_response
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows - versions are then per process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class LibraryVersion:
+    """Counter bumped whenever documents change, shared by workers through a file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def current(self):
+        """Return the current version string ('0' before the first bump)"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return f.read().strip() or '0'
+        except OSError:
+            return '0'
+
+    def bump(self):
+        """
+        Advance the version so every worker's cached pages are re-rendered
+
+        Call after the change is committed, so no worker can cache the old
+        library under the new version.
+
+        Returns:
+            str: The new version
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock, open(self.path, 'a+', encoding='utf-8') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    version = str(int(f.read().strip() or '0') + 1)
+                except ValueError:
+                    version = '1'
+                f.seek(0)
+                f.truncate()
+                f.write(version)
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        logger.info(f"Library version is now {version}")
+        return version
+
+
+class RenderCache:
+    """LRU of rendered pages keyed by view, arguments and library version"""
+
+    def __init__(self, version, max_entries=256, ttl=300):
+        self.version = version
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (html bytes, etag, stored at)
+        self._stats = {"hits": 0, "misses": 0, "bypassed": 0}
+
+    def cached(self, view):
+        """Decorator serving a view's HTML from the cache while the library is unchanged"""
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if session.get('_flashes'):
+                self._count("bypassed")
+                return view(*args, **kwargs)
+
+            # Read the version before the view queries the database, so a page
+            # rendered during an upload is stored under the old version
+            key = (request.endpoint, tuple(sorted(kwargs.items())), self.version.current())
+            entry = self._get(key)
+            if entry:
+                self._count("hits")
+                html, etag = entry
+            else:
+                self._count("misses")
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+                html = response.get_data()
+                etag = hashlib.sha256(html).hexdigest()[:32]
+                self._put(key, html, etag)
+
+            response = make_response(html)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response.make_conditional(request)
+
+        return wrapper
+
+    def stats(self):
+        """Return hit, miss and bypass counts for this worker"""
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), library_version=self.version.current())
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            html, etag, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return html, etag
+
+    def _put(self, key, html, etag):
+        with self._lock:
+            self._entries[key] = (html, etag, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+
+library_version = LibraryVersion(os.environ.get(
+    "LIBRARY_VERSION_FILE", os.path.join(tempfile.gettempdir(), "tutionbuddy-library-version")
+))
+render_cache = RenderCache(library_version, ttl=float(os.environ.get("RENDER_CACHE_TTL", "300")))
@@ -0,0 +1,181 @@
+"""
+Response Compression
+Compresses text responses (HTML pages, JSON answers) with Brotli or gzip,
+whichever the browser accepts, once they are large enough to be worth it.
+Multilingual AI answers shrink several times over, which matters on slow
+school networks. Brotli needs the optional `brotli` package; without it
+gzip is used.
+
+Static CSS/JS is compressed ahead of time by `flask --app main
+compress-static`, which writes .br/.gz files next to the originals; the
+static route serves those instead of compressing on every request. Files
+sent from disk otherwise (audio) are already compressed and are left alone.
+"""
+
+import os
+import gzip
+import logging
+import mimetypes
+import threading
+from functools import lru_cache
+
+from flask import current_app, request, send_from_directory
+from werkzeug.security import safe_join
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/plain', 'text/css', 'text/javascript', 'application/javascript',
+    'application/json', 'image/svg+xml'
+}
+
+# Static files worth precompressing
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.html', '.json', '.txt')
+
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+@lru_cache(maxsize=None)
+def _brotli():
+    """Return the brotli module, or None when it isn't installed"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def accepted_encodings(accept_encodings):
+    """
+    Return the encodings the client accepts that we can produce, best first
+
+    Args:
+        accept_encodings (werkzeug.datastructures.Accept): request.accept_encodings
+
+    Returns:
+        list: Subset of ['br', 'gzip']
+    """
+    encodings = []
+    if accept_encodings.quality('br') > 0 and _brotli():
+        encodings.append('br')
+    if accept_encodings.quality('gzip') > 0:
+        encodings.append('gzip')
+    return encodings
+
+
+class ResponseCompressor:
+    """after_request compression of dynamic responses and precompressed static files"""
+
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=5):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._lock = threading.Lock()
+        self._stats = {"responses": 0, "original_bytes": 0, "compressed_bytes": 0}
+
+    def init_app(self, app):
+        """Compress the app's responses and serve its precompressed static files"""
+        app.after_request(self.compress_response)
+        if 'static' in app.view_functions:
+            app.view_functions['static'] = self.send_static
+
+    def compress(self, data, encoding):
+        """Compress bytes with 'br' or 'gzip'"""
+        if encoding == 'br':
+            return _brotli().compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def compress_response(self, response):
+        """Compress a response in place when the client accepts it and it pays off"""
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encodings = accepted_encodings(request.accept_encodings)
+        data = response.get_data()
+        if not encodings or len(data) < self.min_size:
+            return response
+
+        compressed = self.compress(data, encodings[0])
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encodings[0]
+        # The bytes differ from the identity response, so the validator becomes
+        # weak; If-None-Match still matches it with weak comparison
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+
+        with self._lock:
+            self._stats["responses"] += 1
+            self._stats["original_bytes"] += len(data)
+            self._stats["compressed_bytes"] += len(compressed)
+        return response
+
+    def send_static(self, filename):
+        """Static view that prefers a fresh .br/.gz sibling of the requested file"""
+        app = current_app
+        path = safe_join(app.static_folder, filename)
+        if path and os.path.isfile(path):
+            for encoding in accepted_encodings(request.accept_encodings):
+                compressed_path = path + ENCODING_SUFFIXES[encoding]
+                if os.path.isfile(compressed_path) and os.path.getmtime(compressed_path) >= os.path.getmtime(path):
+                    response = send_from_directory(
+                        app.static_folder, filename + ENCODING_SUFFIXES[encoding],
+                        mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                        max_age=app.get_send_file_max_age(filename)
+                    )
+                    response.headers['Content-Encoding'] = encoding
+                    response.vary.add('Accept-Encoding')
+                    return response
+
+        response = app.send_static_file(filename)
+        if filename.endswith(PRECOMPRESS_EXTENSIONS):
+            response.vary.add('Accept-Encoding')
+        return response
+
+    def precompress_static(self, static_folder):
+        """
+        Write .br and .gz versions of static text files that are missing or stale
+
+        Args:
+            static_folder (str): Static directory to walk
+
+        Returns:
+            int: Number of compressed files written
+        """
+        encodings = ['gzip'] + (['br'] if _brotli() else [])
+        written = 0
+        for root, _, files in os.walk(static_folder):
+            for name in files:
+                if not name.endswith(PRECOMPRESS_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                with open(path, 'rb') as f:
+                    data = f.read()
+                for encoding in encodings:
+                    target = path + ENCODING_SUFFIXES[encoding]
+                    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                        continue
+                    # Static files are compressed once, so use the best settings
+                    if encoding == 'br':
+                        compressed = _brotli().compress(data, quality=11)
+                    else:
+                        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                    with open(target, 'wb') as f:
+                        f.write(compressed)
+                    written += 1
+                    logger.info(f"Precompressed {path} ({encoding}): {len(data)} -> {len(compressed)} bytes")
+        return written
+
+    def stats(self):
+        """Return bytes before and after dynamic compression in this worker"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["ratio"] = round(stats["original_bytes"] / stats["compressed_bytes"], 2) if stats["compressed_bytes"] else None
+        return stats
+
+
+compressor = ResponseCompressor(min_size=int(os.environ.get('COMPRESS_MIN_SIZE', '1024')))
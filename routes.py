@@ -1,57 +1,122 @@
 import os
 import uuid
 from datetime import datetime
-from flask import render_template, request, redirect, url_for, flash, jsonify, make_response
-from werkzeug.utils import secure_filename
-from app import app, db
-from models import Document, DocumentPage, HomeworkSession, HomeworkQuestion, HomeworkAttempt, HomeworkHint, StudentProgress
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash, jsonify, make_response, session, g, abort
+from werkzeug.utils import secure_filename, send_file as werkzeug_send_file
+from app import db
+from models import Document, DocumentPage, HomeworkSession, HomeworkQuestion, HomeworkAttempt, HomeworkHint, Student
 from document_processor import DocumentProcessor
 from ai_tutor import AITutor
-from simple_voice_tutor import SimpleVoiceTutor
+from simple_voice_tutor import SimpleVoiceTutor, audio_url
+from audio_transcoder import transcoder, AUDIO_DIR, AUDIO_FILENAME_PATTERN, AUDIO_MIMETYPES
+from speech_synthesizer import speech_synthesizer
+from response_compression import compressor
+from field_selection import trim_payload
+from render_cache import render_cache, library_version
 from homework_assistant import HomeworkAssistant
-from google.genai import types
 from number_formatter import format_indian_numbers
+from prompt_builder import context_budget
+from gemini_client import generate_content, get_client, get_route_stats, set_request_deadline, clear_request_deadline
+from model_router import model_router
+from sqlalchemy import func, case
+from question_bank import question_bank
+from spaced_repetition import scheduler, describe_last_review, REVIEW_QUALITIES
+from progress_tracker import progress_tracker
+from math_solver import math_solver
 import logging
 
 logger = logging.getLogger(__name__)
 
+bp = Blueprint('main', __name__)
+
+# Longest any request may spend waiting on Gemini, retries included
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", "60"))
+
+@bp.before_request
+def start_request_deadline():
+    """Share one deadline across the Gemini calls made for this request"""
+    seconds = REQUEST_DEADLINE_SECONDS
+    try:
+        # A proxy or client may ask for less time than the default
+        seconds = min(seconds, float(request.headers.get('X-Request-Timeout', seconds)))
+    except ValueError:
+        pass
+    set_request_deadline(seconds)
+
+@bp.teardown_request
+def end_request_deadline(error=None):
+    clear_request_deadline()
+
+@bp.after_request
+def apply_field_selection(response):
+    """Trim JSON responses to the fields named in ?fields= (runs before compression)"""
+    spec = request.args.get('fields')
+    if spec and response.mimetype == 'application/json' and not response.direct_passthrough:
+        payload = response.get_json(silent=True)
+        if payload is not None:
+            response.set_data(current_app.json.dumps(trim_payload(payload, spec)))
+    return response
+
+def get_current_student():
+    """Return the current browser's student profile, creating an anonymous one on first visit"""
+    if 'student' not in g:
+        student_key = session.get('student_key')
+        student = Student.query.filter_by(student_key=student_key).first() if student_key else None
+        if not student:
+            student = Student(student_key=uuid.uuid4().hex)
+            db.session.add(student)
+            db.session.commit()
+            session['student_key'] = student.student_key
+            session.permanent = True
+        g.student = student
+    return g.student
+
+def get_student_key():
+    """Identify the current browser's student for per-student state"""
+    return get_current_student().student_key
+
+def student_profile(student):
+    """Serialize a student profile for the API"""
+    return {
+        "student_key": student.student_key,
+        "display_name": student.display_name,
+        "grade": student.grade
+    }
+
 def allowed_file(filename):
     """Check if the uploaded file is allowed"""
     ALLOWED_EXTENSIONS = {'docx'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-@app.route('/')
+@bp.route('/')
+@render_cache.cached
 def index():
     """Home page with upload form and document list"""
     documents = Document.query.order_by(Document.upload_date.desc()).all()
-    response = make_response(render_template('index.html', documents=documents))
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    return response
+    return render_template('index.html', documents=documents)
 
-@app.route('/upload', methods=['POST'])
+@bp.route('/upload', methods=['POST'])
 def upload_file():
     """Handle file upload and processing"""
     if 'file' not in request.files:
         flash('No file selected', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     file = request.files['file']
     if file.filename == '':
         flash('No file selected', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     if not file.filename or not allowed_file(file.filename):
         flash('Only .docx files are allowed', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     file_path = None
     try:
         # Generate unique filename
         original_filename = secure_filename(file.filename or "")
         unique_filename = str(uuid.uuid4()) + '_' + original_filename
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
         
         # Save uploaded file
         file.save(file_path)
@@ -65,7 +130,7 @@ def upload_file():
         if not pages:
             flash('No content could be extracted from the document', 'error')
             os.remove(file_path)  # Clean up
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         
         # Create document record
         document = Document()
@@ -89,10 +154,14 @@ def upload_file():
             db.session.add(page)
         
         db.session.commit()
+        library_version.bump()
         logger.info(f"Document processed successfully: {original_filename}")
         
+        # Pre-generate practice questions so quizzes don't wait on the AI
+        question_bank.schedule_fill(document.id, batches=2)
+        
         flash(f'Document "{original_filename}" uploaded and processed successfully! Extracted {len(pages)} pages.', 'success')
-        return redirect(url_for('view_document', doc_id=document.id))
+        return redirect(url_for('main.view_document', doc_id=document.id))
         
     except Exception as e:
         db.session.rollback()
@@ -103,9 +172,9 @@ def upload_file():
         if file_path is not None and os.path.exists(file_path):
             os.remove(file_path)
         
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
-@app.route('/document/<int:doc_id>')
+@bp.route('/document/<int:doc_id>')
 def view_document(doc_id):
     """View a specific document with all its pages"""
     document = Document.query.get_or_404(doc_id)
@@ -113,7 +182,7 @@ def view_document(doc_id):
     
     return render_template('view_document.html', document=document, pages=pages)
 
-@app.route('/document/<int:doc_id>/page/<int:page_num>')
+@bp.route('/document/<int:doc_id>/page/<int:page_num>')
 def view_page(doc_id, page_num):
     """View a specific page of a document"""
     document = Document.query.get_or_404(doc_id)
@@ -136,7 +205,7 @@ def view_page(doc_id, page_num):
                          next_page=next_page,
                          single_page_view=True)
 
-@app.route('/api/document/<int:doc_id>/pages')
+@bp.route('/api/document/<int:doc_id>/pages')
 def api_get_pages(doc_id):
     """API endpoint to get pages for a document"""
     document = Document.query.get_or_404(doc_id)
@@ -156,7 +225,7 @@ def api_get_pages(doc_id):
         } for page in pages]
     })
 
-@app.route('/delete/<int:doc_id>', methods=['POST'])
+@bp.route('/delete/<int:doc_id>', methods=['POST'])
 def delete_document(doc_id):
     """Delete a document and its associated file"""
     logger.info(f"Attempting to delete document ID: {doc_id}")
@@ -168,7 +237,7 @@ def delete_document(doc_id):
         filename = document.original_filename
         
         # Delete the physical file
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], document.filename)
+        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], document.filename)
         if os.path.exists(file_path):
             os.remove(file_path)
             logger.info(f"Deleted file: {file_path}")
@@ -178,8 +247,12 @@ def delete_document(doc_id):
         # Delete from database (pages will be deleted automatically due to cascade)
         db.session.delete(document)
         db.session.commit()
+        library_version.bump()
         logger.info(f"Successfully deleted document from database")
         
+        # Drop cached prompt prefixes built from this document's content
+        AITutor().forget_document(doc_id)
+        
         # Check if this is an AJAX request
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return jsonify({'success': True, 'message': f'Document "{filename}" deleted successfully.'})
@@ -195,9 +268,9 @@ def delete_document(doc_id):
         
         flash(f'Error deleting document: {str(e)}', 'error')
     
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-@app.route('/ask', methods=['GET', 'POST'])
+@bp.route('/ask', methods=['GET', 'POST'])
 def ask_question():
     """Handle AI tutoring questions"""
     documents = Document.query.order_by(Document.upload_date.desc()).all()
@@ -231,45 +304,48 @@ def ask_question():
     
     return render_template('ask_question.html', documents=documents)
 
-@app.route('/subjects')
+@bp.route('/subjects')
+@render_cache.cached
 def subjects():
     """Show subjects page"""
     documents = Document.query.order_by(Document.upload_date.desc()).all()
     return render_template('subjects.html', documents=documents)
 
-@app.route('/subjects/<subject>')
+@bp.route('/subjects/<subject>')
+@render_cache.cached
 def upload_subject(subject):
     """Show upload page for a specific subject"""
     # Get existing chapters for this subject
     existing_chapters = Document.query.filter_by(subject=subject).order_by(Document.upload_date.desc()).all()
     return render_template('upload_subject.html', subject=subject, existing_chapters=existing_chapters)
 
-@app.route('/subjects/<subject>/view')
+@bp.route('/subjects/<subject>/view')
+@render_cache.cached
 def view_subject(subject):
     """View all chapters for a specific subject"""
     documents = Document.query.filter_by(subject=subject).order_by(Document.upload_date.desc()).all()
     return render_template('subject_chapters.html', subject=subject, documents=documents)
 
-@app.route('/subjects/<subject>/upload', methods=['POST'])
+@bp.route('/subjects/<subject>/upload', methods=['POST'])
 def upload_subject_file(subject):
     """Handle file upload for a specific subject"""
     logger.info(f"Starting upload for subject: {subject}")
     
     if 'file' not in request.files:
         flash('No file selected', 'error')
-        return redirect(url_for('upload_subject', subject=subject))
+        return redirect(url_for('main.upload_subject', subject=subject))
 
     file = request.files['file']
     
     if file.filename == '':
         flash('No file selected', 'error')
-        return redirect(url_for('upload_subject', subject=subject))
+        return redirect(url_for('main.upload_subject', subject=subject))
 
     if file and allowed_file(file.filename):
         try:
             # Generate secure filename
             filename = str(uuid.uuid4()) + '.docx'
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
             file.save(file_path)
             
             # Get form data
@@ -285,7 +361,7 @@ def upload_subject_file(subject):
                 logger.error("No pages extracted from document")
                 flash('Could not extract content from the document. Please check the file format.', 'error')
                 os.remove(file_path)
-                return redirect(url_for('upload_subject', subject=subject))
+                return redirect(url_for('main.upload_subject', subject=subject))
             
             logger.info(f"Successfully extracted {len(pages)} pages")
             
@@ -324,6 +400,7 @@ def upload_subject_file(subject):
             db.session.add_all(page_records)
             
             db.session.commit()
+            library_version.bump()
             # Force immediate session flush to ensure document is available
             db.session.flush()
             
@@ -331,7 +408,7 @@ def upload_subject_file(subject):
             flash(f'Successfully uploaded "{lesson_title}" to {subject}! Extracted {len(pages)} pages.', 'success')
             
             # Add cache-busting to ensure fresh page load
-            response = make_response(redirect(url_for('view_document', doc_id=document.id)))
+            response = make_response(redirect(url_for('main.view_document', doc_id=document.id)))
             response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
             response.headers['Pragma'] = 'no-cache'
             response.headers['Expires'] = '0'
@@ -347,18 +424,19 @@ def upload_subject_file(subject):
                 pass
             logger.error(f"Error processing file: {str(e)}")
             flash(f'Error processing file: {str(e)}', 'error')
-            return redirect(url_for('upload_subject', subject=subject))
+            return redirect(url_for('main.upload_subject', subject=subject))
     else:
         flash('Invalid file type. Please upload a .docx file.', 'error')
-        return redirect(url_for('upload_subject', subject=subject))
+        return redirect(url_for('main.upload_subject', subject=subject))
 
-@app.route('/ask-page')
+@bp.route('/ask-page')
+@render_cache.cached
 def ask_page():
     """Show the ask question page with AJAX"""
     documents = Document.query.order_by(Document.upload_date.desc()).all()
     return render_template('simple_ask.html', documents=documents)
 
-@app.route('/api/documents')
+@bp.route('/api/documents')
 def api_documents():
     """API endpoint to get all documents for dropdown refresh"""
     try:
@@ -406,39 +484,53 @@ def api_documents():
             'error': str(e)
         })
 
-@app.route('/quiz/<int:doc_id>')
+@bp.route('/quiz/<int:doc_id>')
 def generate_quiz(doc_id):
     """Generate quiz questions for a document"""
     try:
-        tutor = AITutor()
-        result = tutor.generate_quiz_questions(doc_id)
+        document = Document.query.get_or_404(doc_id)
         
-        if 'error' in result:
-            flash(result['error'], 'error')
-            return redirect(url_for('view_document', doc_id=doc_id))
+        # Serve from the pre-generated question bank when it has questions
+        questions = question_bank.sample([doc_id], get_student_key(), 5)
+        if questions:
+            result = {
+                "questions": questions,
+                "document_title": document.lesson_title,
+                "subject": document.subject
+            }
+        else:
+            tutor = AITutor()
+            result = tutor.generate_quiz_questions(doc_id)
+            
+            if 'error' in result:
+                flash(result['error'], 'error')
+                return redirect(url_for('main.view_document', doc_id=doc_id))
+            
+            # Seed the bank with these questions and fill it for next time
+            question_bank.add_items(document, result['questions'])
+            question_bank.schedule_fill(doc_id)
         
-        document = Document.query.get_or_404(doc_id)
         return render_template('quiz.html', document=document, quiz_result=result)
         
     except Exception as e:
         logger.error(f"Error generating quiz: {str(e)}")
         flash(f'Error generating quiz: {str(e)}', 'error')
-        return redirect(url_for('view_document', doc_id=doc_id))
+        return redirect(url_for('main.view_document', doc_id=doc_id))
 
-@app.route('/test')
+@bp.route('/test')
 def test_page():
     """Test page for AI functionality"""
     from flask import send_file
     return send_file('test_ai.html')
 
 # Voice Tutoring Routes
-@app.route('/interactive_reading')
+@bp.route('/interactive_reading')
 def interactive_reading():
     """Show the interactive reading page"""
     documents = Document.query.order_by(Document.upload_date.desc()).all()
     return render_template('interactive_reading.html', documents=documents)
 
-@app.route('/api/voice/start-reading', methods=['POST'])
+@bp.route('/api/voice/start-reading', methods=['POST'])
 def api_start_reading():
     """Start interactive reading session"""
     try:
@@ -450,7 +542,7 @@ def api_start_reading():
         
         # Initialize voice tutor
         voice_tutor = SimpleVoiceTutor()
-        result = voice_tutor.start_interactive_reading(document_id)
+        result = voice_tutor.start_interactive_reading(document_id, student_key=get_student_key())
         
         return jsonify(result)
         
@@ -458,7 +550,7 @@ def api_start_reading():
         logging.error(f"Error starting reading session: {e}")
         return jsonify({"success": False, "message": "Failed to start reading session"})
 
-@app.route('/api/voice/continue-reading', methods=['POST'])
+@bp.route('/api/voice/continue-reading', methods=['POST'])
 def api_continue_reading():
     """Continue or control reading session"""
     try:
@@ -470,7 +562,7 @@ def api_continue_reading():
         
         # Get existing voice tutor instance (in production, use session management)
         voice_tutor = SimpleVoiceTutor()
-        result = voice_tutor.continue_reading(document_id)
+        result = voice_tutor.continue_reading(document_id, data.get('page'), student_key=get_student_key())
         
         return jsonify(result)
         
@@ -478,7 +570,26 @@ def api_continue_reading():
         logging.error(f"Error controlling reading session: {e}")
         return jsonify({"success": False, "message": "Failed to control reading"})
 
-@app.route('/api/voice/speak', methods=['POST'])
+@bp.route('/api/voice/stop-reading', methods=['POST'])
+def api_stop_reading():
+    """Stop reading session and cancel lookahead audio"""
+    try:
+        data = request.get_json()
+        document_id = data.get('document_id')
+        
+        if not document_id:
+            return jsonify({"success": False, "message": "Document ID required"})
+        
+        voice_tutor = SimpleVoiceTutor()
+        result = voice_tutor.stop_reading(document_id, student_key=get_student_key())
+        
+        return jsonify(result)
+        
+    except Exception as e:
+        logging.error(f"Error stopping reading session: {e}")
+        return jsonify({"success": False, "message": "Failed to stop reading"})
+
+@bp.route('/api/voice/speak', methods=['POST'])
 def api_speak_text():
     """Convert text to speech and return audio file"""
     try:
@@ -508,9 +619,84 @@ def api_speak_text():
         logging.error(f"Error generating speech: {e}")
         return jsonify({"success": False, "message": "Failed to generate speech"})
 
-@app.route('/api/generate-audio', methods=['POST'])
+# Generated audio is named by a hash of its speech, so a file never changes
+AUDIO_MAX_AGE = 365 * 24 * 3600
+
+@bp.route('/audio/<filename>')
+def serve_audio(filename):
+    """
+    Serve generated speech
+
+    The hash in the filename is the ETag, and files are cached as immutable for
+    a year, so replaying never reaches the server. Range requests are answered
+    with 206 for seeking. AUDIO_OFFLOAD='x-sendfile' or 'x-accel-redirect'
+    hands the bytes to the front proxy instead of this worker.
+    """
+    match = AUDIO_FILENAME_PATTERN.match(filename)
+    if not match:
+        abort(404)
+    path = os.path.join(AUDIO_DIR, filename)
+    if not os.path.isfile(path):
+        # The original may have been replaced by its compact version
+        served = transcoder.served_filename(filename)
+        if not served or served == filename:
+            abort(404)
+        return redirect(audio_url(served), code=301)
+    # The hash, plus the profile for compact versions
+    etag = filename[len('tts_'):filename.rindex('.')]
+    mimetype = AUDIO_MIMETYPES[match.group(3)]
+    
+    if current_app.config.get('AUDIO_OFFLOAD') == 'x-accel-redirect':
+        # nginx sends the file (and handles Range) from an internal location
+        response = current_app.response_class(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = current_app.config['AUDIO_ACCEL_PREFIX'] + filename
+        response.set_etag(etag)
+        response = response.make_conditional(request)
+    else:
+        response = werkzeug_send_file(
+            os.path.abspath(path), request.environ,
+            mimetype=mimetype,
+            etag=etag,
+            conditional=True,
+            max_age=AUDIO_MAX_AGE,
+            use_x_sendfile=current_app.config.get('AUDIO_OFFLOAD') == 'x-sendfile',
+            response_class=current_app.response_class
+        )
+    
+    response.cache_control.public = True
+    response.cache_control.max_age = AUDIO_MAX_AGE
+    response.cache_control.immutable = True
+    if response.status_code in (200, 206):
+        transcoder.record_served(filename, response.content_length or os.path.getsize(path))
+    return response
+
+@bp.route('/api/audio/savings', methods=['GET'])
+def api_audio_savings():
+    """Report storage and bandwidth saved by the compact audio profile"""
+    try:
+        return jsonify({"success": True, "savings": transcoder.report()})
+    except Exception as e:
+        logging.error(f"Error reporting audio savings: {e}")
+        return jsonify({"success": False, "message": "Failed to report audio savings"})
+
+@bp.route('/api/tts/backends', methods=['GET'])
+def api_tts_backends():
+    """Show each TTS backend's availability, health and latency, and the order per language"""
+    return jsonify({"success": True, "tts": speech_synthesizer.describe()})
+
+@bp.route('/api/compression/stats', methods=['GET'])
+def api_compression_stats():
+    """Report how much dynamic response compression has saved in this worker"""
+    return jsonify({"success": True, "compression": compressor.stats()})
+
+@bp.route('/api/render-cache/stats', methods=['GET'])
+def api_render_cache_stats():
+    """Report how often library pages were served from the render cache in this worker"""
+    return jsonify({"success": True, "render_cache": render_cache.stats()})
+
+@bp.route('/api/generate-audio', methods=['POST'])
 def api_generate_audio():
-    """Generate audio for text with Indian number formatting"""
+    """Generate audio for text, routing each sentence to the voice of its language"""
     try:
         data = request.get_json()
         text = data.get('text')
@@ -519,24 +705,17 @@ def api_generate_audio():
         if not text:
             return jsonify({"success": False, "message": "Text required"})
         
-        # Apply Indian number formatting before generating audio
-        formatted_text = format_indian_numbers(text)
-        
-        # Debug logging
-        logging.info(f"Original text: {text[:100]}...")
-        logging.info(f"Formatted text: {formatted_text[:100]}...")
+        logging.info(f"Generating audio ({language}) for: {text[:100]}...")
         
         voice_tutor = SimpleVoiceTutor()
         
-        # Use the voice tutor's generate_audio_file method for better error handling
-        audio_url = voice_tutor.generate_audio_file(formatted_text, 'English')
+        # Speech cleaning (including Indian number formatting) happens once inside
+        audio_url = voice_tutor.generate_multilingual_audio_file(text, language)
         
         if audio_url:
             return jsonify({
                 "success": True,
                 "audio_url": audio_url,
-                "original_text": text,  # Original text for display
-                "formatted_text": formatted_text,  # Formatted text for TTS
                 "message": "Audio generated successfully"
             })
         else:
@@ -547,7 +726,7 @@ def api_generate_audio():
         logging.error(f"Error generating audio: {e}")
         return jsonify({"success": False, "message": "Failed to generate audio"})
 
-@app.route('/api/voice/process-response', methods=['POST'])
+@bp.route('/api/voice/process-response', methods=['POST'])
 def api_process_response():
     """Process user's voice response"""
     try:
@@ -561,7 +740,9 @@ def api_process_response():
             return jsonify({"success": False, "message": "Missing required data"})
         
         voice_tutor = SimpleVoiceTutor()
-        result = voice_tutor.process_user_response(document_id, user_response, question, context)
+        result = voice_tutor.process_user_response(
+            document_id, user_response, question, context, student_key=get_student_key()
+        )
         
         return jsonify(result)
         
@@ -569,7 +750,7 @@ def api_process_response():
         logging.error(f"Error processing user response: {e}")
         return jsonify({"success": False, "message": "Failed to process response"})
 
-@app.route('/api/voice/ask-doubt', methods=['POST'])
+@bp.route('/api/voice/ask-doubt', methods=['POST'])
 def api_ask_doubt():
     """Handle student doubts during voice reading"""
     try:
@@ -586,7 +767,7 @@ def api_ask_doubt():
             return jsonify({"success": False, "message": "Document not found"})
         
         voice_tutor = SimpleVoiceTutor()
-        result = voice_tutor.answer_doubt(document_id, question, document.subject)
+        result = voice_tutor.answer_doubt(document_id, question, document.subject, student_key=get_student_key())
         
         return jsonify(result)
         
@@ -594,7 +775,7 @@ def api_ask_doubt():
         logging.error(f"Error handling doubt: {e}")
         return jsonify({"success": False, "message": "Failed to process doubt"})
 
-@app.route('/api/voice/get-answer', methods=['POST'])
+@bp.route('/api/voice/get-answer', methods=['POST'])
 def api_get_answer():
     """Get the answer to a comprehension question"""
     try:
@@ -623,8 +804,7 @@ def api_get_answer():
         clean_answer = voice_tutor.clean_text_for_speech(result['answer'])
         
         try:
-            audio_file = voice_tutor.generate_audio_file(clean_answer, document.subject)
-            audio_url = f"/static/audio/{os.path.basename(audio_file)}"
+            audio_url = voice_tutor.generate_audio_file(clean_answer, document.subject)
         except Exception as e:
             logging.error(f"Error generating audio: {e}")
             audio_url = None
@@ -640,7 +820,7 @@ def api_get_answer():
         logging.error(f"Error getting answer: {e}")
         return jsonify({"success": False, "message": "Failed to get answer"})
 
-@app.route('/test-ai-direct')
+@bp.route('/test-ai-direct')
 def test_ai_direct():
     """Direct test of AI functionality"""
     try:
@@ -653,19 +833,19 @@ def test_ai_direct():
 
 # ========== HOMEWORK & WORKSHEET ASSISTANT ROUTES ==========
 
-@app.route('/homework')
+@bp.route('/homework')
 def homework():
     """Show the enhanced homework assistant page"""
     return render_template('homework_enhanced.html')
 
-@app.route('/exam-preparation')
+@bp.route('/exam-preparation')
 def exam_preparation():
     """Show the exam preparation page"""
     return render_template('exam_preparation.html')
 
 # ========== EXAM PREPARATION ROUTES ==========
 
-@app.route('/api/exam/revision-summaries', methods=['POST'])
+@bp.route('/api/exam/revision-summaries', methods=['POST'])
 def api_exam_revision_summaries():
     """Generate revision summaries for a subject"""
     try:
@@ -702,7 +882,7 @@ def api_exam_revision_summaries():
                     continue
                 
                 # Create summary prompt
-                context = tutor._prepare_context(doc, pages)
+                context = tutor._prepare_context(doc, pages, context_budget('revision_summary'))
                 
                 # Get language for the subject
                 language_instruction = ""
@@ -718,7 +898,7 @@ def api_exam_revision_summaries():
                 {language_instruction}
                 
                 Lesson: {doc.lesson_title}
-                Content: {context[:2000]}  # Limit content for faster processing
+                Content: {context}
                 
                 Provide:
                 1. A concise summary (3-4 sentences)
@@ -728,13 +908,12 @@ def api_exam_revision_summaries():
                 Format as a clear, study-friendly summary for a 5th grade student.
                 """
                 
-                response = tutor.client.models.generate_content(
-                    model=tutor.model,
+                route = model_router.route('revision_summary', subject)
+                response = generate_content(
+                    tutor.client, 'revision_summary',
+                    model=route.model,
                     contents=summary_prompt,
-                    config=types.GenerateContentConfig(
-                        temperature=0.3,
-                        max_output_tokens=800
-                    )
+                    config=route.config()
                 )
                 
                 if response.text:
@@ -772,7 +951,7 @@ def api_exam_revision_summaries():
         logger.error(f"Error generating revision summaries: {e}")
         return jsonify({"success": False, "message": "Failed to generate revision summaries"})
 
-@app.route('/api/exam/revision-recommendations', methods=['POST'])
+@bp.route('/api/exam/revision-recommendations', methods=['POST'])
 def api_exam_revision_recommendations():
     """Generate personalized revision recommendations"""
     try:
@@ -783,7 +962,7 @@ def api_exam_revision_recommendations():
             return jsonify({"success": False, "message": "Subject is required"})
         
         # Get student progress for the subject
-        progress = StudentProgress.query.filter_by(subject=subject).first()
+        progress = progress_tracker.get(get_student_key(), subject)
         
         # Generate recommendations based on progress
         recommendations = []
@@ -830,119 +1009,85 @@ def api_exam_revision_recommendations():
         logger.error(f"Error generating revision recommendations: {e}")
         return jsonify({"success": False, "message": "Failed to generate recommendations"})
 
-@app.route('/api/exam/weak-topics', methods=['GET'])
+@bp.route('/api/exam/weak-topics', methods=['GET'])
 def api_exam_weak_topics():
     """Analyze and return weak topics based on quiz performance"""
     try:
-        # Get homework questions with low success rates
-        weak_topics = []
-        
-        # Query homework sessions with poor performance
-        poor_sessions = HomeworkSession.query.filter(
-            HomeworkSession.performance_score < 0.6
-        ).limit(10).all()
-        
-        for session in poor_sessions:
-            questions = HomeworkQuestion.query.filter_by(
-                session_id=session.id,
-                is_correct=False
-            ).all()
-            
-            for question in questions:
-                weak_topics.append({
-                    "id": str(question.id),
-                    "subject": session.subject,
-                    "chapter": f"Session {session.id}",
-                    "topic": question.question_text[:50] + "..." if len(question.question_text) > 50 else question.question_text,
-                    "success_rate": int(question.evaluation_score * 100) if question.evaluation_score else 0
-                })
+        subject = request.args.get('subject')
         
-        # Add some sample weak topics if no data available
-        if not weak_topics:
-            weak_topics = [
-                {
-                    "id": "sample1",
-                    "subject": "Mathematics",
-                    "chapter": "Chapter 5",
-                    "topic": "Fraction operations and decimal conversion",
-                    "success_rate": 45
-                },
-                {
-                    "id": "sample2",
-                    "subject": "Science",
-                    "chapter": "Chapter 8",
-                    "topic": "Light and sound wave properties",
-                    "success_rate": 60
-                },
-                {
-                    "id": "sample3",
-                    "subject": "English",
-                    "chapter": "Grammar",
-                    "topic": "Tenses and sentence formation",
-                    "success_rate": 55
-                }
-            ]
+        # One aggregate over the student's answered questions, grouped by topic
+        correct = func.sum(case((HomeworkQuestion.is_correct.is_(True), 1), else_=0))
+        average_score = func.avg(HomeworkQuestion.evaluation_score)
+        query = (
+            db.session.query(
+                HomeworkQuestion.subject,
+                HomeworkQuestion.chapter,
+                HomeworkQuestion.topic,
+                func.count(HomeworkQuestion.id).label('total'),
+                correct.label('correct'),
+                average_score.label('average_score')
+            )
+            .join(HomeworkSession, HomeworkQuestion.session_id == HomeworkSession.id)
+            .filter(
+                HomeworkSession.student_key == get_student_key(),
+                HomeworkQuestion.attempts_count > 0,
+                HomeworkQuestion.topic.isnot(None)
+            )
+        )
+        if subject:
+            query = query.filter(HomeworkQuestion.subject == subject)
+        rows = (
+            query.group_by(HomeworkQuestion.subject, HomeworkQuestion.chapter, HomeworkQuestion.topic)
+            .having(average_score < 0.6)
+            .order_by(average_score, func.count(HomeworkQuestion.id).desc())
+            .limit(6)
+            .all()
+        )
+        
+        weak_topics = [{
+            "id": f"{row.subject}|{row.chapter}|{row.topic}",
+            "subject": row.subject,
+            "chapter": row.chapter or "General",
+            "topic": row.topic,
+            "total_questions": row.total,
+            "correct_answers": int(row.correct or 0),
+            "success_rate": int(round((row.average_score or 0) * 100))
+        } for row in rows]
         
         return jsonify({
             "success": True,
-            "topics": weak_topics[:6]  # Limit to 6 topics
+            "topics": weak_topics
         })
         
     except Exception as e:
         logger.error(f"Error analyzing weak topics: {e}")
         return jsonify({"success": False, "message": "Failed to analyze weak topics"})
 
-@app.route('/api/exam/spaced-repetition', methods=['POST'])
+@bp.route('/api/exam/spaced-repetition', methods=['POST'])
 def api_exam_spaced_repetition():
-    """Generate spaced repetition session"""
+    """Return the concept cards due for review in a spaced repetition session"""
     try:
-        from datetime import datetime, timedelta
+        data = request.get_json(silent=True) or {}
+        subject = data.get('subject')
         
-        # Generate concepts for spaced repetition
-        concepts = [
-            {
-                "id": "concept1",
-                "topic": "Multiplication Tables",
-                "subject": "Mathematics",
-                "last_reviewed": "2 days ago"
-            },
-            {
-                "id": "concept2",
-                "topic": "Parts of Speech",
-                "subject": "English",
-                "last_reviewed": "5 days ago"
-            },
-            {
-                "id": "concept3",
-                "topic": "Solar System",
-                "subject": "Science",
-                "last_reviewed": "1 week ago"
-            },
-            {
-                "id": "concept4",
-                "topic": "Indian States",
-                "subject": "Social Studies",
-                "last_reviewed": "3 days ago"
-            },
-            {
-                "id": "concept5",
-                "topic": "Number System",
-                "subject": "Mathematics",
-                "last_reviewed": "1 day ago"
-            },
-            {
-                "id": "concept6",
-                "topic": "Computer Hardware",
-                "subject": "IT-Computers",
-                "last_reviewed": "1 week ago"
-            }
-        ]
+        cards, total_due = scheduler.due_cards(get_student_key(), limit=20, subject=subject)
+        
+        concepts = [{
+            "id": card.id,
+            "topic": card.topic,
+            "subject": card.subject,
+            "source": card.source,
+            "prompt": card.prompt,
+            "answer": card.answer,
+            "last_reviewed": describe_last_review(card)
+        } for card in cards]
         
         return jsonify({
             "success": True,
             "session": {
                 "concepts": concepts,
                 "total_concepts": len(concepts),
+                "total_due": total_due,
                 "session_type": "spaced_repetition"
             }
         })
@@ -951,7 +1096,35 @@ def api_exam_spaced_repetition():
         logger.error(f"Error generating spaced repetition session: {e}")
         return jsonify({"success": False, "message": "Failed to generate spaced repetition session"})
 
-@app.route('/api/exam/mock-exam', methods=['POST'])
+@bp.route('/api/exam/spaced-repetition/review', methods=['POST'])
+def api_exam_spaced_repetition_review():
+    """Record a spaced repetition review and reschedule the card"""
+    try:
+        data = request.get_json()
+        card_id = data.get('card_id')
+        result = data.get('result')
+        quality = data.get('quality', REVIEW_QUALITIES.get(result))
+        
+        if not card_id or quality is None:
+            return jsonify({"success": False, "message": "Card ID and review result are required"})
+        
+        card = scheduler.review(get_student_key(), card_id, quality)
+        if not card:
+            return jsonify({"success": False, "message": "Card not found"})
+        
+        return jsonify({
+            "success": True,
+            "card_id": card.id,
+            "interval_days": card.interval_days,
+            "next_review": card.due_at.isoformat()
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error recording spaced repetition review: {e}")
+        return jsonify({"success": False, "message": "Failed to record review"})
+
+@bp.route('/api/exam/mock-exam', methods=['POST'])
 def api_exam_mock_exam():
     """Generate mock exam questions for a subject"""
     try:
@@ -974,95 +1147,36 @@ def api_exam_mock_exam():
         if not documents:
             return jsonify({"success": False, "message": f"No documents found for {subject}. Please upload some lessons first."})
         
-        # Generate mock exam using AI
+        # Draw mock exam questions from the question bank, generating only for documents without one
         tutor = AITutor()
         questions = []
+        student_key = get_student_key()
         
         for doc in documents[:3]:  # Limit to first 3 documents for reasonable exam length
             try:
+                chapter = doc.lesson_title or f"Chapter {doc.chapter_number}"
+                bank_questions = question_bank.sample(
+                    [doc.id], student_key, 3, question_types=['multiple_choice', 'short_answer']
+                )
+                if bank_questions:
+                    questions.extend({
+                        "question": item["question"],
+                        "type": item["type"],
+                        "options": item["options"],
+                        "correct_answer": item["answer"],
+                        "chapter": chapter,
+                        "topic": item["topic"]
+                    } for item in bank_questions)
+                    continue
+                
                 # Get document pages
                 pages = DocumentPage.query.filter_by(document_id=doc.id).order_by(DocumentPage.page_number).all()
                 if not pages:
                     continue
                 
-                # Create exam question prompt
-                context = tutor._prepare_context(doc, pages)
-                
-                # Get language for the subject
-                language_instruction = ""
-                if subject == "Hindi":
-                    language_instruction = "Please provide the questions in Hindi language."
-                elif subject == "Telugu":
-                    language_instruction = "Please provide the questions in Telugu language."
-                else:
-                    language_instruction = "Please provide the questions in English language."
+                questions.extend(tutor.generate_exam_questions(doc, pages))
+                question_bank.schedule_fill(doc.id)
                 
-                exam_prompt = f"""
-                Create 2-3 exam questions based on this {subject} lesson content for a 5th grade student.
-                {language_instruction}
-                
-                Lesson: {doc.lesson_title}
-                Content: {context[:1500]}  # Limit content for faster processing
-                
-                Create a mix of:
-                1. Multiple choice questions (4 options each)
-                2. Short answer questions
-                
-                Format each question as:
-                Question: [question text]
-                Type: multiple_choice OR short_answer
-                Options: A) option1, B) option2, C) option3, D) option4 (only for multiple choice)
-                Correct_Answer: [correct answer]
-                
-                Make questions appropriate for 5th grade level and test understanding of key concepts.
-                """
-                
-                response = tutor.client.models.generate_content(
-                    model=tutor.model,
-                    contents=exam_prompt,
-                    config=types.GenerateContentConfig(
-                        temperature=0.4,
-                        max_output_tokens=1000
-                    )
-                )
-                
-                if response.text:
-                    # Parse the response to extract questions
-                    question_blocks = response.text.split('Question:')
-                    
-                    for block in question_blocks[1:]:  # Skip first empty block
-                        lines = block.strip().split('\n')
-                        if len(lines) >= 3:
-                            question_text = lines[0].strip()
-                            question_type = "multiple_choice"
-                            options = []
-                            correct_answer = ""
-                            
-                            # Parse question details
-                            for line in lines[1:]:
-                                line = line.strip()
-                                if line.startswith('Type:'):
-                                    question_type = line.replace('Type:', '').strip()
-                                elif line.startswith('Options:'):
-                                    options_text = line.replace('Options:', '').strip()
-                                    if options_text:
-                                        options = [opt.strip() for opt in options_text.split(',')]
-                                elif line.startswith('Correct_Answer:'):
-                                    correct_answer = line.replace('Correct_Answer:', '').strip()
-                            
-                            # Create question object
-                            question = {
-                                "question": question_text,
-                                "type": question_type,
-                                "correct_answer": correct_answer,
-                                "chapter": doc.lesson_title or f"Chapter {doc.chapter_number}"
-                            }
-                            
-                            if question_type == "multiple_choice" and options:
-                                question["options"] = options
-                            
-                            questions.append(question)
-                    
             except Exception as e:
                 logger.error(f"Error generating questions for document {doc.id}: {e}")
                 continue
@@ -1096,12 +1210,22 @@ def api_exam_mock_exam():
                     }
                 ]
         
+        questions = questions[:10]  # Limit to 10 questions
+        duration = 45  # 45 minutes
+        
+        # Keep the answer keys server-side so submissions can be scored
+        exam_id = HomeworkAssistant().create_mock_exam(subject, questions, duration, student_key=student_key)
+        
         # Create exam object
         exam = {
+            "exam_id": exam_id,
             "subject": subject,
-            "questions": questions[:10],  # Limit to 10 questions
-            "duration": 45,  # 45 minutes
-            "total_marks": len(questions[:10]) * 2  # 2 marks per question
+            "questions": [
+                {key: value for key, value in question.items() if key != "correct_answer"}
+                for question in questions
+            ],
+            "duration": duration,
+            "total_marks": len(questions) * 2  # 2 marks per question
         }
         
         return jsonify({
@@ -1110,54 +1234,33 @@ def api_exam_mock_exam():
         })
         
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Error generating mock exam: {e}")
         return jsonify({"success": False, "message": "Failed to generate mock exam"})
 
-@app.route('/api/exam/submit-mock-exam', methods=['POST'])
+@bp.route('/api/exam/submit-mock-exam', methods=['POST'])
 def api_exam_submit_mock_exam():
     """Submit and evaluate mock exam answers"""
     try:
         data = request.get_json()
-        subject = data.get('subject')
+        exam_id = data.get('exam_id')
         answers = data.get('answers', [])
         
-        if not subject or not answers:
-            return jsonify({"success": False, "message": "Subject and answers are required"})
-        
-        # For now, provide sample evaluation
-        # In a real implementation, you would compare with correct answers
-        total_questions = len(answers)
-        correct_answers = max(1, int(total_questions * 0.7))  # Assume 70% correct
-        incorrect_answers = total_questions - correct_answers
-        score = int((correct_answers / total_questions) * 100)
-        
-        # Generate feedback based on performance
-        if score >= 80:
-            feedback = "Excellent work! You have a strong understanding of the subject."
-        elif score >= 60:
-            feedback = "Good effort! Review the topics you missed and practice more."
-        else:
-            feedback = "Keep practicing! Focus on understanding the basic concepts better."
-        
-        results = {
-            "score": score,
-            "total_questions": total_questions,
-            "correct_answers": correct_answers,
-            "incorrect_answers": incorrect_answers,
-            "time_taken": "35 minutes",
-            "feedback": feedback
-        }
+        if not exam_id or not isinstance(answers, list):
+            return jsonify({"success": False, "message": "Exam ID and answers are required"})
         
-        return jsonify({
-            "success": True,
-            "results": results
-        })
+        result = HomeworkAssistant().score_mock_exam(exam_id, answers, student_key=get_student_key())
+        if result.get("success"):
+            # Turn missed questions into review cards right away
+            scheduler.sync_cards(get_student_key(), force=True)
+        return jsonify(result)
         
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Error evaluating mock exam: {e}")
         return jsonify({"success": False, "message": "Failed to evaluate mock exam"})
 
-@app.route('/api/exam/priority-topics', methods=['POST'])
+@bp.route('/api/exam/priority-topics', methods=['POST'])
 def api_exam_priority_topics():
     """Analyze and return priority topics for a subject based on curriculum importance"""
     try:
@@ -1191,89 +1294,8 @@ def api_exam_priority_topics():
                 if not pages:
                     continue
                 
-                # Create priority analysis prompt
-                context = tutor._prepare_context(doc, pages)
-                
-                # Get language for the subject
-                language_instruction = ""
-                if subject == "Hindi":
-                    language_instruction = "Please provide the analysis in Hindi language."
-                elif subject == "Telugu":
-                    language_instruction = "Please provide the analysis in Telugu language."
-                else:
-                    language_instruction = "Please provide the analysis in English language."
-                
-                priority_prompt = f"""
-                Analyze this {subject} lesson content and identify 3-4 priority topics for 5th grade students preparing for exams.
-                {language_instruction}
-                
-                Lesson: {doc.lesson_title}
-                Content: {context[:1200]}
-                
-                For each priority topic, provide:
-                - Topic name
-                - Priority level (high, medium, low)
-                - Description of why it's important
-                - Estimated study time needed
-                
-                Consider:
-                - Curriculum importance for 5th grade
-                - Typical exam weightage
-                - Fundamental concepts that build to advanced topics
-                - Common areas where students struggle
-                
-                Format each topic as:
-                Topic: [topic name]
-                Priority: [high/medium/low]
-                Description: [explanation of importance]
-                Study_Time: [estimated time like "2 hours", "30 minutes"]
-                
-                Focus on core concepts that are most likely to appear in exams.
-                """
-                
-                response = tutor.client.models.generate_content(
-                    model=tutor.model,
-                    contents=priority_prompt,
-                    config=types.GenerateContentConfig(
-                        temperature=0.3,
-                        max_output_tokens=800
-                    )
-                )
+                priority_topics.extend(tutor.get_priority_topics(doc, pages))
                 
-                if response.text:
-                    # Parse the response to extract topics
-                    topic_blocks = response.text.split('Topic:')
-                    
-                    for block in topic_blocks[1:]:  # Skip first empty block
-                        lines = block.strip().split('\n')
-                        if len(lines) >= 3:
-                            topic_name = lines[0].strip()
-                            priority = "medium"
-                            description = ""
-                            study_time = "1 hour"
-                            
-                            # Parse topic details
-                            for line in lines[1:]:
-                                line = line.strip()
-                                if line.startswith('Priority:'):
-                                    priority = line.replace('Priority:', '').strip().lower()
-                                elif line.startswith('Description:'):
-                                    description = line.replace('Description:', '').strip()
-                                elif line.startswith('Study_Time:'):
-                                    study_time = line.replace('Study_Time:', '').strip()
-                            
-                            # Create topic object
-                            topic = {
-                                "topic": topic_name,
-                                "priority": priority,
-                                "description": description,
-                                "study_time": study_time,
-                                "chapter": doc.lesson_title or f"Chapter {doc.chapter_number}",
-                                "subject": subject
-                            }
-                            
-                            priority_topics.append(topic)
-                    
             except Exception as e:
                 logger.error(f"Error analyzing priority topics for document {doc.id}: {e}")
                 continue
@@ -1351,7 +1373,7 @@ def api_exam_priority_topics():
         logger.error(f"Error analyzing priority topics: {e}")
         return jsonify({"success": False, "message": "Failed to analyze priority topics"})
 
-@app.route('/api/homework/start-session', methods=['POST'])
+@bp.route('/api/homework/start-session', methods=['POST'])
 def api_start_homework_session():
     """Start a new homework session"""
     try:
@@ -1363,7 +1385,7 @@ def api_start_homework_session():
             return jsonify({"success": False, "message": "Subject and task description are required"})
         
         homework_assistant = HomeworkAssistant()
-        result = homework_assistant.start_homework_session(subject, task_description)
+        result = homework_assistant.start_homework_session(subject, task_description, student_key=get_student_key())
         
         return jsonify(result)
         
@@ -1371,7 +1393,7 @@ def api_start_homework_session():
         logging.error(f"Error starting homework session: {e}")
         return jsonify({"success": False, "message": "Failed to start homework session"})
 
-@app.route('/api/homework/upload-document', methods=['POST'])
+@bp.route('/api/homework/upload-document', methods=['POST'])
 def api_upload_homework_document():
     """Upload and process homework document"""
     try:
@@ -1398,7 +1420,7 @@ def api_upload_homework_document():
         # Generate unique filename
         original_filename = secure_filename(file.filename)
         unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
         
         # Save file
         file.save(file_path)
@@ -1442,6 +1464,7 @@ def api_upload_homework_document():
         
         document.total_pages = len(pages)
         db.session.commit()
+        library_version.bump()
         
         # Initialize homework assistant to parse questions
         homework_assistant = HomeworkAssistant()
@@ -1460,7 +1483,7 @@ def api_upload_homework_document():
         logging.error(f"Error uploading homework document: {e}")
         return jsonify({"success": False, "message": "Failed to upload document"})
 
-@app.route('/api/homework/start-worksheet', methods=['POST'])
+@bp.route('/api/homework/start-worksheet', methods=['POST'])
 def api_start_worksheet_session():
     """Start a new worksheet session"""
     try:
@@ -1471,7 +1494,7 @@ def api_start_worksheet_session():
             return jsonify({"success": False, "message": "Subject is required"})
         
         homework_assistant = HomeworkAssistant()
-        result = homework_assistant.start_worksheet_session(subject)
+        result = homework_assistant.start_worksheet_session(subject, student_key=get_student_key())
         
         return jsonify(result)
         
@@ -1479,7 +1502,7 @@ def api_start_worksheet_session():
         logging.error(f"Error starting worksheet session: {e}")
         return jsonify({"success": False, "message": "Failed to start worksheet session"})
 
-@app.route('/api/homework/start-enhanced-session', methods=['POST'])
+@bp.route('/api/homework/start-enhanced-session', methods=['POST'])
 def api_start_enhanced_session():
     """Start an enhanced homework/worksheet/exam session"""
     try:
@@ -1492,7 +1515,9 @@ def api_start_enhanced_session():
             return jsonify({"success": False, "message": "Subject is required"})
         
         homework_assistant = HomeworkAssistant()
-        result = homework_assistant.start_enhanced_session(subject, session_type, document_id)
+        result = homework_assistant.start_enhanced_session(
+            subject, session_type, document_id, student_key=get_student_key()
+        )
         
         return jsonify(result)
         
@@ -1500,7 +1525,7 @@ def api_start_enhanced_session():
         logging.error(f"Error starting enhanced session: {e}")
         return jsonify({"success": False, "message": "Failed to start enhanced session"})
 
-@app.route('/api/homework/process-question', methods=['POST'])
+@bp.route('/api/homework/process-question', methods=['POST'])
 def api_process_homework_question():
     """Process a homework question with hint system"""
     try:
@@ -1523,6 +1548,7 @@ def api_process_homework_question():
                 result = homework_assistant.generate_progressive_hint(
                     question, subject, hint_level, "", []
                 )
+                progress_tracker.record_hint(get_student_key(), subject, result.get('hint_level', hint_level))
                 return jsonify({
                     "success": True,
                     "hint_text": result.get('hint_text', 'Try breaking this problem down step by step.'),
@@ -1541,7 +1567,12 @@ def api_process_homework_question():
                 })
         
         result = homework_assistant.process_homework_question(
-            session_id, question, student_response, request_hint, hint_level
+            session_id, question, student_response, request_hint, hint_level,
+            expected_answer=data.get('expected_answer'),
+            question_type=data.get('question_type'),
+            options=data.get('options'),
+            student_key=get_student_key(),
+            subject=subject
         )
         
         return jsonify(result)
@@ -1550,7 +1581,32 @@ def api_process_homework_question():
         logging.error(f"Error processing homework question: {e}")
         return jsonify({"success": False, "message": "Failed to process question"})
 
-@app.route('/api/homework/listen-hint', methods=['POST'])
+@bp.route('/api/homework/evaluate-batch', methods=['POST'])
+def api_evaluate_homework_batch():
+    """Evaluate all answers of a worksheet in one request"""
+    try:
+        data = request.get_json()
+        subject = data.get('subject', 'English')
+        items = data.get('items', [])
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({"success": False, "message": "Items are required"})
+        if any(not isinstance(item, dict) or not item.get('question') for item in items):
+            return jsonify({"success": False, "message": "Each item needs a question"})
+        
+        homework_assistant = HomeworkAssistant()
+        evaluations = homework_assistant.evaluate_student_responses(items, subject)
+        progress_tracker.record_attempts(
+            get_student_key(), subject, [evaluation["evaluation_level"] for evaluation in evaluations]
+        )
+        
+        return jsonify({"success": True, "evaluations": evaluations})
+        
+    except Exception as e:
+        logging.error(f"Error evaluating homework batch: {e}")
+        return jsonify({"success": False, "message": "Failed to evaluate answers"})
+
+@bp.route('/api/homework/listen-hint', methods=['POST'])
 def api_listen_hint():
     """Generate audio for hint text"""
     try:
@@ -1566,8 +1622,7 @@ def api_listen_hint():
         clean_hint = voice_tutor.clean_text_for_speech(hint_text)
         
         try:
-            audio_file = voice_tutor.generate_audio_file(clean_hint, subject)
-            audio_url = f"/static/audio/{os.path.basename(audio_file)}"
+            audio_url = voice_tutor.generate_audio_file(clean_hint, subject)
             
             return jsonify({
                 "success": True,
@@ -1582,7 +1637,7 @@ def api_listen_hint():
         logging.error(f"Error in listen hint: {e}")
         return jsonify({"success": False, "message": "Failed to process hint"})
 
-@app.route('/api/homework/speak-answer', methods=['POST'])
+@bp.route('/api/homework/speak-answer', methods=['POST'])
 def api_speak_answer():
     """Convert speech to text for answer input"""
     try:
@@ -1600,7 +1655,7 @@ def api_speak_answer():
         logging.error(f"Error in speak answer: {e}")
         return jsonify({"success": False, "message": "Failed to initialize speech recognition"})
 
-@app.route('/api/homework/complete-session', methods=['POST'])
+@bp.route('/api/homework/complete-session', methods=['POST'])
 def api_complete_homework_session():
     """Complete a homework session and generate summary"""
     try:
@@ -1611,7 +1666,7 @@ def api_complete_homework_session():
             return jsonify({"success": False, "message": "Session ID is required"})
         
         homework_assistant = HomeworkAssistant()
-        result = homework_assistant.generate_homework_summary(session_id)
+        result = homework_assistant.generate_homework_summary(session_id, student_key=get_student_key())
         
         return jsonify(result)
         
@@ -1619,12 +1674,74 @@ def api_complete_homework_session():
         logging.error(f"Error completing homework session: {e}")
         return jsonify({"success": False, "message": "Failed to complete session"})
 
-@app.route('/api/homework/progress-report', methods=['GET'])
+@bp.route('/api/students/me', methods=['GET'])
+def api_current_student():
+    """Return the current student's profile"""
+    return jsonify({"success": True, "student": student_profile(get_current_student())})
+
+@bp.route('/api/students/profile', methods=['POST'])
+def api_update_student_profile():
+    """Set the current student's display name and grade"""
+    try:
+        data = request.get_json() or {}
+        student = get_current_student()
+        
+        if 'display_name' in data:
+            student.display_name = (data.get('display_name') or '').strip()[:100] or None
+        if 'grade' in data:
+            student.grade = (str(data.get('grade') or '')).strip()[:20] or None
+        student.last_seen = datetime.utcnow()
+        db.session.commit()
+        
+        return jsonify({"success": True, "student": student_profile(student)})
+        
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error updating student profile: {e}")
+        return jsonify({"success": False, "message": "Failed to update profile"})
+
+@bp.route('/api/students/switch', methods=['POST'])
+def api_switch_student():
+    """Switch this browser to another student's profile, e.g. on a shared tablet"""
+    try:
+        data = request.get_json() or {}
+        student_key = (data.get('student_key') or '').strip()
+        
+        if not student_key:
+            return jsonify({"success": False, "message": "Student key is required"})
+        
+        student = Student.query.filter_by(student_key=student_key).first()
+        if not student:
+            return jsonify({"success": False, "message": "Student not found"})
+        
+        student.last_seen = datetime.utcnow()
+        db.session.commit()
+        session['student_key'] = student.student_key
+        session.permanent = True
+        g.student = student
+        
+        return jsonify({"success": True, "student": student_profile(student)})
+        
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error switching student: {e}")
+        return jsonify({"success": False, "message": "Failed to switch student"})
+
+@bp.route('/api/ai/routes', methods=['GET'])
+def api_ai_routes():
+    """Show the model routing policy with measured latency and cost per route"""
+    return jsonify({
+        "success": True,
+        "policy": model_router.describe(),
+        "measured": get_route_stats()
+    })
+
+@bp.route('/api/homework/progress-report', methods=['GET'])
 def api_get_progress_report():
     """Get student progress report for parents/teachers"""
     try:
         homework_assistant = HomeworkAssistant()
-        result = homework_assistant.get_student_progress_report()
+        result = homework_assistant.get_student_progress_report(student_key=get_student_key())
         
         return jsonify({
             "success": True,
@@ -1635,7 +1752,7 @@ def api_get_progress_report():
         logging.error(f"Error generating progress report: {e}")
         return jsonify({"success": False, "message": "Failed to generate progress report"})
 
-@app.route('/api/homework/ask-question', methods=['POST'])
+@bp.route('/api/homework/ask-question', methods=['POST'])
 def api_ask_homework_question():
     """Handle standalone homework questions"""
     try:
@@ -1673,13 +1790,9 @@ def api_ask_homework_question():
         return generate_fallback_answer(question, subject)
 
 def generate_fallback_answer(question, subject):
-    """Generate fallback answer when AI service is unavailable"""
+    """Answer without document context, degrading to a local template when AI is unavailable"""
     try:
-        # Try AI first
-        from google import genai
-        from google.genai import types
-        
-        client = genai.Client(api_key=os.environ.get("GOOGLE_API_KEY"))
+        client = get_client()
         
         # Get appropriate language for the subject
         language_map = {
@@ -1720,19 +1833,19 @@ def generate_fallback_answer(question, subject):
         Always be encouraging and supportive.
         """
         
-        response = client.models.generate_content(
-            model="gemini-1.5-flash",
+        # Answers from a local template when Gemini is unavailable
+        route = model_router.route('homework_fallback', subject)
+        response = generate_content(
+            client, 'homework_fallback',
+            model=route.model,
             contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.7,
-                max_output_tokens=1000
-            )
+            config=route.config(),
+            fallback=lambda: generate_smart_fallback(question, subject)
         )
         
         answer = response.text if response.text else "I'm here to help! Could you please rephrase your question?"
         
         # Apply Indian number formatting as post-processing
-        from number_formatter import format_indian_numbers
         formatted_answer = format_indian_numbers(answer)
         
         return jsonify({
@@ -1756,6 +1869,9 @@ def generate_smart_fallback(question, subject):
     question_lower = question.lower()
     
     if subject == 'Maths':
+        solution = math_solver.solve(question)
+        if solution:
+            return solution.text
         if 'profit' in question_lower or 'loss' in question_lower:
             return """
             **Profit and Loss Problem:**
@@ -1856,7 +1972,7 @@ def get_fallback_hints(question, subject, hint_level):
     # Return the appropriate hint level (1-5)
     return hints[min(hint_level - 1, len(hints) - 1)]
 
-@app.route('/progress-report')
+@bp.route('/progress-report')
 def progress_report():
     """Show the progress report page"""
     return render_template('progress_report.html')
@@ -0,0 +1,192 @@
+"""
+Schema Migrations
+db.create_all() creates missing tables but never alters existing ones, so a
+database created before a model gained columns (per-student keys, exam answer
+keys, topic tags) would fail on the first query that uses them. upgrade_schema()
+brings such a database up to date after create_all():
+
+1. Adds each model column the live table is missing (ALTER TABLE ... ADD COLUMN)
+2. Backfills the new columns: scalar defaults, each question's subject from
+   its session, and the student of rows written before student profiles
+3. Merges StudentProgress rows that would break the (student, subject) key
+4. Creates missing indexes and unique constraints (as unique indexes, which
+   SQLite can add to an existing table)
+
+Every step checks the live schema first, so running it again changes nothing.
+
+Rows that predate student profiles belong to no student. They are given to a
+profile with the key LEGACY_STUDENT_KEY (default "legacy"), which a browser
+can switch to through /api/students/switch.
+"""
+
+import os
+import logging
+from datetime import datetime
+
+from sqlalchemy import inspect, text, UniqueConstraint
+
+logger = logging.getLogger(__name__)
+
+LEGACY_STUDENT_KEY = os.environ.get("LEGACY_STUDENT_KEY", "legacy")
+
+# Tables whose rows belong to a student
+STUDENT_KEYED_TABLES = ('homework_session', 'student_progress')
+
+# StudentProgress counters added together when duplicate rows are merged
+PROGRESS_COUNTERS = ('total_sessions', 'total_questions', 'correct_answers', 'partially_correct_answers', 'total_hints_used')
+
+
+def upgrade_schema(db):
+    """
+    Bring existing tables in line with the models
+
+    Args:
+        db (SQLAlchemy): The extension; call inside an app context after create_all()
+
+    Returns:
+        list: Descriptions of the changes made (empty if already up to date)
+    """
+    changes = []
+    with db.engine.begin() as connection:
+        inspector = inspect(connection)
+        existing_tables = [table for table in db.metadata.sorted_tables if inspector.has_table(table.name)]
+
+        added = {}
+        for table in existing_tables:
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    _add_column(connection, table, column)
+                    added.setdefault(table.name, []).append(column)
+                    changes.append(f"added column {table.name}.{column.name}")
+
+        changes += _backfill(connection, db.metadata, added)
+        progress_keys = {index['name'] for index in inspector.get_indexes('student_progress')}
+        progress_keys |= {constraint['name'] for constraint in inspector.get_unique_constraints('student_progress')}
+        if 'uq_student_progress_student_subject' not in progress_keys:
+            changes += _merge_duplicate_progress(connection, db.metadata)
+
+        for table in existing_tables:
+            changes += _create_missing_indexes(connection, inspector, table)
+
+        if connection.dialect.name != 'sqlite':
+            # SQLite can't tighten a column; elsewhere restore NOT NULL once backfilled
+            for table_name, columns in added.items():
+                for column in columns:
+                    if not column.nullable and not column.primary_key:
+                        connection.execute(text(
+                            f"ALTER TABLE {_quote(connection, table_name)} "
+                            f"ALTER COLUMN {_quote(connection, column.name)} SET NOT NULL"
+                        ))
+
+    for change in changes:
+        logger.info(f"Schema upgrade: {change}")
+    return changes
+
+
+def _add_column(connection, table, column):
+    # Added as nullable: existing rows have no value until they are backfilled
+    column_type = column.type.compile(dialect=connection.dialect)
+    connection.execute(text(
+        f"ALTER TABLE {_quote(connection, table.name)} ADD COLUMN {_quote(connection, column.name)} {column_type}"
+    ))
+
+
+def _backfill(connection, metadata, added):
+    changes = []
+    for table_name, columns in added.items():
+        table = metadata.tables[table_name]
+        for column in columns:
+            if column.default is not None and column.default.is_scalar:
+                result = connection.execute(
+                    table.update().where(column.is_(None)).values({column.name: column.default.arg})
+                )
+                if result.rowcount:
+                    changes.append(f"set {table_name}.{column.name} to {column.default.arg!r} on {result.rowcount} row(s)")
+
+    if any(column.name == 'subject' for column in added.get('homework_question', [])):
+        result = connection.execute(text(
+            "UPDATE homework_question SET subject = "
+            "(SELECT subject FROM homework_session WHERE homework_session.id = homework_question.session_id) "
+            "WHERE subject IS NULL"
+        ))
+        if result.rowcount:
+            changes.append(f"copied the session subject to {result.rowcount} homework question(s)")
+
+    legacy_rows = 0
+    for table_name in STUDENT_KEYED_TABLES:
+        table = metadata.tables[table_name]
+        if 'student_key' in table.c and inspect(connection).has_table(table_name):
+            result = connection.execute(
+                table.update().where(table.c.student_key.is_(None)).values(student_key=LEGACY_STUDENT_KEY)
+            )
+            legacy_rows += result.rowcount
+    if legacy_rows:
+        students = metadata.tables['student']
+        known = connection.execute(
+            students.select().where(students.c.student_key == LEGACY_STUDENT_KEY)
+        ).first()
+        if not known:
+            now = datetime.utcnow()
+            connection.execute(students.insert().values(
+                student_key=LEGACY_STUDENT_KEY, display_name="Earlier learner", created_date=now, last_seen=now
+            ))
+        changes.append(f"assigned {legacy_rows} row(s) without a student to '{LEGACY_STUDENT_KEY}'")
+    return changes
+
+
+def _merge_duplicate_progress(connection, metadata):
+    """Fold StudentProgress rows sharing a (student, subject) into the oldest one"""
+    progress = metadata.tables['student_progress']
+    rows = connection.execute(progress.select().order_by(progress.c.id)).mappings().all()
+    kept = {}
+    merged = 0
+    for row in rows:
+        key = (row['student_key'], row['subject'])
+        if key not in kept:
+            kept[key] = dict(row)
+            continue
+        target = kept[key]
+        for counter in PROGRESS_COUNTERS:
+            target[counter] = (target[counter] or 0) + (row[counter] or 0)
+        connection.execute(progress.delete().where(progress.c.id == row['id']))
+        merged += 1
+        total = target['total_questions']
+        values = {counter: target[counter] for counter in PROGRESS_COUNTERS}
+        if total:
+            values['success_rate'] = (target['correct_answers'] + 0.5 * target['partially_correct_answers']) / total * 100
+            values['average_hints_per_question'] = target['total_hints_used'] / total
+        connection.execute(progress.update().where(progress.c.id == target['id']).values(values))
+    return [f"merged {merged} duplicate student progress row(s)"] if merged else []
+
+
+def _create_missing_indexes(connection, inspector, table):
+    indexes = inspector.get_indexes(table.name)
+    unique_constraints = inspector.get_unique_constraints(table.name)
+    existing = {index['name'] for index in indexes} | {constraint['name'] for constraint in unique_constraints}
+    unique_columns = {tuple(index['column_names']) for index in indexes if index.get('unique')}
+    unique_columns |= {tuple(constraint['column_names']) for constraint in unique_constraints}
+
+    changes = []
+    for index in table.indexes:
+        if index.name not in existing:
+            index.create(connection)
+            changes.append(f"created index {index.name} on {table.name}")
+
+    for constraint in table.constraints:
+        if not isinstance(constraint, UniqueConstraint):
+            continue
+        columns = [column.name for column in constraint.columns]
+        name = constraint.name or f"uq_{table.name}_{'_'.join(columns)}"
+        if name in existing or tuple(columns) in unique_columns:
+            continue
+        connection.execute(text(
+            f"CREATE UNIQUE INDEX {_quote(connection, name)} ON {_quote(connection, table.name)} "
+            f"({', '.join(_quote(connection, column) for column in columns)})"
+        ))
+        changes.append(f"created unique index {name} on {table.name}")
+    return changes
+
+
+def _quote(connection, name):
+    return connection.dialect.identifier_preparer.quote(name)
@@ -2,13 +2,26 @@ import os
 import uuid
 import tempfile
 import logging
-import json
-from gtts import gTTS
+import hashlib
 import re
-from models import Document, DocumentPage
+from models import Document, DocumentPage, ReadingProgress
 from app import db
 from ai_tutor import AITutor
 from number_formatter import format_indian_numbers
+from audio_prefetch import prefetcher
+from single_flight import single_flight, make_key
+from language_detector import normalize_language, split_by_language
+from prompt_builder import context_budget, truncate_text
+from gemini_client import generate_content
+from model_router import model_router
+from audio_transcoder import transcoder, AUDIO_DIR
+from speech_synthesizer import speech_synthesizer
+from math_solver import math_solver
+
+
+def audio_url(filename):
+    """Return the URL a generated audio file is served from"""
+    return f"/audio/{filename}"
 
 class SimpleVoiceTutor:
     """Simplified voice-based AI tutor that generates audio files for browser playback"""
@@ -29,33 +42,27 @@ class SimpleVoiceTutor:
             'Telugu': {'lang': 'te', 'tld': 'co.in'}
         }
         
-        # Reading state file for persistence
-        self.progress_file = 'voice_reading_progress.json'
+        # Number of upcoming chunks to synthesize ahead of the student
+        self.prefetch_depth = int(os.environ.get('READING_PREFETCH_DEPTH', '2'))
         
         logging.info("Simple Voice Tutor initialized successfully")
     
-    def _load_progress(self):
-        """Load reading progress from file"""
-        try:
-            if os.path.exists(self.progress_file):
-                with open(self.progress_file, 'r') as f:
-                    return json.load(f)
-        except Exception as e:
-            logging.error(f"Error loading progress: {e}")
-        return {}
+    def _get_progress(self, student_key, document_id):
+        """Return the student's reading progress row for a document, or None"""
+        return ReadingProgress.query.filter_by(student_key=student_key, document_id=int(document_id)).first()
     
-    def _save_progress(self, progress):
-        """Save reading progress to file"""
-        try:
-            with open(self.progress_file, 'w') as f:
-                json.dump(progress, f)
-        except Exception as e:
-            logging.error(f"Error saving progress: {e}")
+    def _reading_key(self, student_key, document_id):
+        """Key for the student's lookahead audio of a document"""
+        return f"{student_key}:{document_id}"
     
     def get_voice_config(self, subject):
         """Get TTS configuration based on subject"""
         return self.voice_settings.get(subject, self.voice_settings['English'])
     
+    def get_voice_config_for_language(self, language):
+        """Get TTS configuration for a language code ('en', 'hi', 'te')"""
+        return {'lang': normalize_language(language), 'tld': 'co.in'}
+    
     def clean_text_for_speech(self, text):
         """Clean text by removing markdown symbols and formatting for speech"""
         if not text:
@@ -128,6 +135,14 @@ class SimpleVoiceTutor:
         
         return interactive_content
 
+    def _audio_filename(self, segments):
+        """Content-addressed filename so identical speech is synthesized only once"""
+        key = "\n".join(
+            f"{voice_config['lang']}|{voice_config['tld']}|{clean_text}" for clean_text, voice_config in segments
+        )
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return f"tts_{digest[:32]}.mp3"
+    
     def generate_audio_file(self, text, subject):
         """Generate audio file and return the file path"""
         try:
@@ -142,64 +157,138 @@ class SimpleVoiceTutor:
             voice_config = self.get_voice_config(subject)
             logging.info(f"Using voice config: {voice_config}")
             
-            # Create TTS object with timeout and retry logic
-            import time
-            max_retries = 3
-            retry_delay = 2
-            
-            for attempt in range(max_retries):
-                try:
-                    tts = gTTS(
-                        text=clean_text,
-                        lang=voice_config['lang'],
-                        tld=voice_config['tld'],
-                        slow=False,
-                        timeout=10  # 10 second timeout
-                    )
-                    break
-                except Exception as retry_error:
-                    if attempt < max_retries - 1:
-                        logging.warning(f"TTS attempt {attempt + 1} failed, retrying in {retry_delay}s: {retry_error}")
-                        time.sleep(retry_delay)
-                    else:
-                        raise retry_error
+            return self._generate_audio([(clean_text, voice_config)])
             
-            # Generate unique filename
-            filename = f"tts_{uuid.uuid4().hex}.mp3"
-            filepath = os.path.join('static', 'audio', filename)
+        except Exception as e:
+            logging.error(f"TTS Error: {e}")
+            import traceback
+            logging.error(f"TTS Traceback: {traceback.format_exc()}")
+            return None
+    
+    def generate_multilingual_audio_file(self, text, language=None):
+        """
+        Generate audio for text that may mix English, Hindi and Telugu
+        
+        Each sentence is routed to the voice of its script; the requested
+        language only decides text without letters, such as numbers.
+        
+        Args:
+            text (str): Text to speak
+            language (str): Language code or name used as the default voice
             
-            # Ensure audio directory exists
-            audio_dir = os.path.dirname(filepath)
-            os.makedirs(audio_dir, exist_ok=True)
-            logging.info(f"Audio directory created: {audio_dir}")
+        Returns:
+            str: URL of the generated audio file, or None on failure
+        """
+        try:
+            clean_text = self.clean_text_for_speech(text)
+            if not clean_text:
+                logging.error("Empty text after cleaning")
+                return None
             
-            # Save audio file with retry on failure
-            for save_attempt in range(3):
-                try:
-                    tts.save(filepath)
-                    break
-                except Exception as save_error:
-                    if save_attempt < 2:
-                        logging.warning(f"Save attempt {save_attempt + 1} failed, retrying: {save_error}")
-                        time.sleep(1)
-                    else:
-                        raise save_error
+            default_language = normalize_language(language)
+            segments = [
+                (segment, self.get_voice_config_for_language(segment_language))
+                for segment_language, segment in split_by_language(clean_text, default_language)
+            ]
+            logging.info(f"Multilingual TTS with voices: {[config['lang'] for _, config in segments]}")
             
-            # Verify file was created
-            if os.path.exists(filepath):
-                file_size = os.path.getsize(filepath)
-                logging.info(f"Audio file created successfully: {filepath} (size: {file_size} bytes)")
-                return f"/static/audio/{filename}"
-            else:
-                logging.error(f"Audio file was not created: {filepath}")
-                return None
+            return self._generate_audio(segments)
             
         except Exception as e:
-            logging.error(f"TTS Error: {e}")
-            import traceback
-            logging.error(f"TTS Traceback: {traceback.format_exc()}")
+            logging.error(f"Multilingual TTS Error: {e}")
+            return None
+    
+    def _generate_audio(self, segments):
+        """Return cached audio for the segments, synthesizing it if needed"""
+        filename = self._audio_filename(segments)
+        filepath = os.path.join(AUDIO_DIR, filename)
+        
+        # Reuse audio that was already generated, preferring its compact version
+        served = transcoder.served_filename(filename)
+        if served:
+            logging.info(f"Audio cache hit: {served}")
+            transcoder.schedule(filename)  # Files from before the profile was set
+            return audio_url(served)
+        
+        return self._synthesize_once(segments, filepath)
+    
+    def _synthesize_once(self, segments, filepath):
+        """Synthesize audio, sharing the work with identical in-flight requests and prefetches"""
+        def synthesize():
+            served = transcoder.served_filename(os.path.basename(filepath))
+            if served:
+                return audio_url(served)
+            return self._synthesize_to_file(segments, filepath)
+        
+        return single_flight.do(
+            make_key('tts', os.path.basename(filepath)),
+            synthesize,
+            timeout=60,
+            shared=True,
+            share_result=lambda url: url is not None
+        )
+    
+    def _synthesize_segment(self, clean_text, voice_config):
+        """Synthesize one segment with the language's TTS backend and return the MP3 bytes"""
+        return speech_synthesizer.synthesize(clean_text, voice_config)
+    
+    def _synthesize_to_file(self, segments, filepath):
+        """Synthesize (clean_text, voice_config) segments into a single MP3 at filepath"""
+        # Ensure audio directory exists
+        audio_dir = os.path.dirname(filepath)
+        os.makedirs(audio_dir, exist_ok=True)
+        
+        # Write to a temporary name first so a half-written file is never served;
+        # MP3 frames from consecutive segments can simply be concatenated
+        temp_path = f"{filepath}.{uuid.uuid4().hex}.part"
+        try:
+            with open(temp_path, 'wb') as audio_file:
+                for clean_text, voice_config in segments:
+                    audio_file.write(self._synthesize_segment(clean_text, voice_config))
+            os.replace(temp_path, filepath)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        
+        # Verify file was created
+        if os.path.exists(filepath):
+            file_size = os.path.getsize(filepath)
+            logging.info(f"Audio file created successfully: {filepath} (size: {file_size} bytes)")
+            # Serve this response the original; later ones get the compact version
+            transcoder.schedule(os.path.basename(filepath))
+            return audio_url(os.path.basename(filepath))
+        else:
+            logging.error(f"Audio file was not created: {filepath}")
             return None
     
+    def prefetch_audio(self, session_key, texts, subject):
+        """
+        Synthesize upcoming speech in the background
+        
+        Args:
+            session_key (str): Reading session the lookahead belongs to
+            texts (list): Texts in the order they will be spoken
+            subject (str): Subject used to pick the voice
+        """
+        voice_config = self.get_voice_config(subject)
+        jobs = []
+        for text in texts:
+            clean_text = self.clean_text_for_speech(text)
+            if not clean_text:
+                continue
+            segments = [(clean_text, voice_config)]
+            filename = self._audio_filename(segments)
+            filepath = os.path.join(AUDIO_DIR, filename)
+            if transcoder.served_filename(filename):
+                continue
+            
+            def synthesize(segments=segments, filepath=filepath):
+                return self._synthesize_once(segments, filepath)
+            
+            jobs.append((filename, synthesize))
+        
+        prefetcher.schedule(session_key, jobs)
+    
     def break_into_readable_chunks(self, content):
         """Break content into readable chunks for interactive reading"""
         chunks = []
@@ -234,7 +323,7 @@ class SimpleVoiceTutor:
         
         return chunks
     
-    def answer_doubt(self, document_id, question, subject):
+    def answer_doubt(self, document_id, question, subject, student_key=None):
         """Answer a student's doubt about the current lesson"""
         try:
             # Get document context
@@ -242,10 +331,17 @@ class SimpleVoiceTutor:
             if not document:
                 return {"success": False, "message": "Document not found"}
             
+            # Arithmetic the local solver recognises is worked out exactly,
+            # without a Gemini call
+            if subject.lower() == 'maths':
+                solution = math_solver.solve(question)
+                if solution:
+                    logging.info(f"Solved {solution.kind} question locally")
+                    return self._doubt_response(solution.text, subject)
+            
             # Get current progress to understand context
-            progress = self._load_progress()
-            doc_progress = progress.get(str(document_id), {})
-            current_page = doc_progress.get('current_page', 1)
+            progress = self._get_progress(student_key, document_id)
+            current_page = progress.current_page if progress else 1
             
             # Get current page content for context
             page = DocumentPage.query.filter_by(
@@ -253,7 +349,7 @@ class SimpleVoiceTutor:
                 page_number=current_page
             ).first()
             
-            context = page.content if page else ""
+            context = truncate_text(page.content, context_budget('answer_doubt')) if page else ""
             
             # Use AI tutor to answer the question
             voice_config = self.get_voice_config(subject)
@@ -314,7 +410,7 @@ Now provide your structured response starting with "**Question:**"
                     Answer the student's question in simple and clear language appropriate for their age.
                     """
             
-            from google.genai import types
+            route = model_router.route('answer_doubt', subject)
             
             # For Math questions, use system instruction for better control
             if subject.lower() == 'maths':
@@ -335,23 +431,18 @@ NEVER use paragraph format. ALWAYS use this structure."""
                 
                 user_content = f"Context: {context}\nQuestion: {question}\n\nProvide structured response:"
                 
-                response = self.ai_tutor.client.models.generate_content(
-                    model="gemini-2.5-flash",
+                response = generate_content(
+                    self.ai_tutor.client, 'answer_doubt',
+                    model=route.model,
                     contents=user_content,
-                    config=types.GenerateContentConfig(
-                        system_instruction=system_instruction,
-                        temperature=0,
-                        max_output_tokens=4000
-                    )
+                    config=route.config(system_instruction=system_instruction)
                 )
             else:
-                response = self.ai_tutor.client.models.generate_content(
-                    model="gemini-2.5-flash",
+                response = generate_content(
+                    self.ai_tutor.client, 'answer_doubt',
+                    model=route.model,
                     contents=prompt,
-                    config=types.GenerateContentConfig(
-                        temperature=0,
-                        max_output_tokens=4000
-                    )
+                    config=route.config()
                 )
             
             if response.text:
@@ -369,20 +460,7 @@ NEVER use paragraph format. ALWAYS use this structure."""
                         answer_text = self._force_math_structure(answer_text, question)
                     logging.info(f"Final structured response: {answer_text[:100]}...")
                 
-                # For display, preserve formatting but clean for speech
-                display_answer = self._format_for_display(answer_text)
-                speech_answer = self.clean_text_for_speech(answer_text)
-                
-                # Pre-generate audio file for the answer
-                audio_url = self.generate_audio_file(speech_answer, subject)
-                
-                return {
-                    "success": True, 
-                    "answer": display_answer, 
-                    "speech_text": speech_answer, 
-                    "subject": subject,
-                    "audio_url": audio_url
-                }
+                return self._doubt_response(answer_text, subject)
             else:
                 return {"success": False, "message": "Could not generate answer"}
                 
@@ -390,6 +468,23 @@ NEVER use paragraph format. ALWAYS use this structure."""
             logging.error(f"Doubt answering error: {e}")
             return {"success": False, "message": f"Error: {str(e)}"}
     
+    def _doubt_response(self, answer_text, subject):
+        """Build the doubt answer payload with display text, speech text and audio"""
+        # For display, preserve formatting but clean for speech
+        display_answer = self._format_for_display(answer_text)
+        speech_answer = self.clean_text_for_speech(answer_text)
+        
+        # Pre-generate audio file for the answer
+        audio_url = self.generate_audio_file(speech_answer, subject)
+        
+        return {
+            "success": True, 
+            "answer": display_answer, 
+            "speech_text": speech_answer, 
+            "subject": subject,
+            "audio_url": audio_url
+        }
+    
     def _format_for_display(self, text):
         """Format text for display while preserving structure"""
         if not text:
@@ -446,62 +541,20 @@ NEVER use paragraph format. ALWAYS use this structure."""
             # Build comprehensive structured response
             structured = f"**Question:** {question}\n\n**Solution:**\n"
             
-            # Check if this is an HCF question and provide detailed steps
-            if 'hcf' in question.lower() or 'highest common factor' in question.lower():
-                structured += "**Step 1:** Find the prime factorization of each number.\n"
-                structured += "Prime factorization means breaking down each number into its smallest prime factors (numbers that can only be divided by 1 and themselves).\n\n"
-                structured += "**For 18:**\n"
-                structured += "- Start with 18 ÷ 2 = 9 (2 is the smallest prime factor)\n"
-                structured += "- Then 9 ÷ 3 = 3 (3 is the next prime factor)\n"
-                structured += "- Finally 3 ÷ 3 = 1 (we're done when we reach 1)\n"
-                structured += "- So 18 = 2 × 3 × 3\n\n"
-                
-                structured += "**For 24:**\n"
-                structured += "- Start with 24 ÷ 2 = 12\n"
-                structured += "- Then 12 ÷ 2 = 6\n"
-                structured += "- Then 6 ÷ 2 = 3\n"
-                structured += "- Finally 3 ÷ 3 = 1\n"
-                structured += "- So 24 = 2 × 2 × 2 × 3\n\n"
-                
-                structured += "**For 60:**\n"
-                structured += "- Start with 60 ÷ 2 = 30\n"
-                structured += "- Then 30 ÷ 2 = 15\n"
-                structured += "- Then 15 ÷ 3 = 5\n"
-                structured += "- Finally 5 ÷ 5 = 1\n"
-                structured += "- So 60 = 2 × 2 × 3 × 5\n\n"
-                
-                structured += "**Step 2:** Identify the common prime factors that appear in ALL numbers.\n"
-                structured += "Now we compare the prime factorizations to find which prime factors appear in every number:\n\n"
-                structured += "- **Prime factor 2:** Appears in 18 (once), 24 (three times), and 60 (twice)\n"
-                structured += "- **Prime factor 3:** Appears in 18 (twice), 24 (once), and 60 (once)\n"
-                structured += "- **Prime factor 5:** Appears only in 60, so it's NOT common to all numbers\n\n"
-                structured += "**Important:** For HCF, we take the LOWEST power of each common prime factor.\n\n"
-                
-                structured += "**Step 3:** Multiply the common prime factors together to find the HCF.\n"
-                structured += "We multiply the common prime factors using their lowest powers:\n\n"
-                structured += "- Prime factor 2 appears at least once in all numbers, so we use 2¹ = 2\n"
-                structured += "- Prime factor 3 appears at least once in all numbers, so we use 3¹ = 3\n"
-                structured += "- Therefore: HCF = 2 × 3 = 6\n\n"
-                
-                structured += "**Answer:** The HCF of 18, 24 and 60 is 6.\n\n"
-                
-                structured += "**Explanation:** The prime factorization method works because the HCF (Highest Common Factor) is the largest number that can divide all the given numbers without leaving a remainder. By finding the prime factors that are common to all numbers and multiplying them together using their lowest powers, we get the largest such number. This method is very reliable and works for any set of numbers. You can verify: 18÷6=3, 24÷6=4, 60÷6=10, all with no remainder!"
+            # Extract steps from the original response
+            structured += "**Step 1:** " + (useful_content[0] if useful_content else "Analyze the given information.") + "\n\n"
+            structured += "**Step 2:** " + (useful_content[1] if len(useful_content) > 1 else "Apply the appropriate mathematical method.") + "\n\n"
+            structured += "**Step 3:** " + (useful_content[2] if len(useful_content) > 2 else "Calculate the final result.") + "\n\n"
             
-            else:
-                # For other math questions, try to extract steps from original response
-                structured += "**Step 1:** " + (useful_content[0] if useful_content else "Analyze the given information.") + "\n\n"
-                structured += "**Step 2:** " + (useful_content[1] if len(useful_content) > 1 else "Apply the appropriate mathematical method.") + "\n\n"
-                structured += "**Step 3:** " + (useful_content[2] if len(useful_content) > 2 else "Calculate the final result.") + "\n\n"
-                
-                # Try to extract answer from original response
-                answer_found = ""
-                for line in useful_content:
-                    if any(word in line.lower() for word in ['answer', 'result', 'solution', '=']):
-                        answer_found = line
-                        break
-                
-                structured += "**Answer:** " + (answer_found if answer_found else "Please refer to the calculation above.") + "\n\n"
-                structured += "**Explanation:** This method provides a systematic approach to solve the mathematical problem step by step."
+            # Try to extract answer from original response
+            answer_found = ""
+            for line in useful_content:
+                if any(word in line.lower() for word in ['answer', 'result', 'solution', '=']):
+                    answer_found = line
+                    break
+            
+            structured += "**Answer:** " + (answer_found if answer_found else "Please refer to the calculation above.") + "\n\n"
+            structured += "**Explanation:** This method provides a systematic approach to solve the mathematical problem step by step."
             
             logging.info("Math structure conversion completed successfully")
             return structured
@@ -522,7 +575,7 @@ NEVER use paragraph format. ALWAYS use this structure."""
     
 
     
-    def start_interactive_reading(self, document_id):
+    def start_interactive_reading(self, document_id, student_key=None):
         """Start interactive reading session for a document"""
         try:
             # Get document and pages
@@ -535,19 +588,28 @@ NEVER use paragraph format. ALWAYS use this structure."""
                 return {"success": False, "message": "No pages found in document"}
             
             # Initialize progress tracking
-            progress = self._load_progress()
-            progress[str(document_id)] = {
-                'current_page': 1,
-                'current_chunk': 0,
-                'questions_asked': 0,
-                'correct_answers': 0
-            }
-            self._save_progress(progress)
+            progress = self._get_progress(student_key, document_id)
+            if not progress:
+                progress = ReadingProgress(student_key=student_key, document_id=document.id)
+                db.session.add(progress)
+            progress.current_page = 1
+            progress.current_chunk = 0
+            progress.questions_asked = 0
+            progress.correct_answers = 0
+            db.session.commit()
+            
+            # A restarted session makes any earlier lookahead obsolete
+            reading_key = self._reading_key(student_key, document_id)
+            prefetcher.cancel(reading_key)
             
             # Welcome message
             subject = document.subject
             welcome_msg = self._get_welcome_message(document.lesson_title, subject)
             
+            # Synthesize the welcome and opening chunks while the student listens
+            upcoming = self._upcoming_chunks(document, pages[0].page_number, 0, self.prefetch_depth, pages[0])
+            self.prefetch_audio(reading_key, [welcome_msg] + upcoming, subject)
+            
             return {
                 "success": True,
                 "message": "Interactive reading session started",
@@ -561,6 +623,7 @@ NEVER use paragraph format. ALWAYS use this structure."""
             }
             
         except Exception as e:
+            db.session.rollback()
             logging.error(f"Error starting reading session: {e}")
             return {"success": False, "message": "Failed to start reading session"}
     
@@ -575,13 +638,19 @@ NEVER use paragraph format. ALWAYS use this structure."""
         else:
             return f"Hello! Today we will read the lesson {lesson_title}. Are you ready to learn? Let's begin our learning journey together!"
     
-    def continue_reading(self, document_id):
-        """Continue the reading session"""
+    def continue_reading(self, document_id, page_number=None, student_key=None):
+        """Continue the reading session, optionally jumping to another page"""
         try:
-            all_progress = self._load_progress()
-            progress = all_progress.get(str(document_id))
+            progress = self._get_progress(student_key, document_id)
             if not progress:
                 return {"success": False, "message": "No reading progress found"}
+            reading_key = self._reading_key(student_key, document_id)
+            
+            if page_number and int(page_number) != progress.current_page:
+                # Student jumped pages - the lookahead no longer matches
+                prefetcher.cancel(reading_key)
+                progress.current_page = int(page_number)
+                progress.current_chunk = 0
             
             # Get document
             document = Document.query.get(document_id)
@@ -591,7 +660,7 @@ NEVER use paragraph format. ALWAYS use this structure."""
             # Get current page
             page = DocumentPage.query.filter_by(
                 document_id=document_id,
-                page_number=progress['current_page']
+                page_number=progress.current_page
             ).first()
             
             if not page:
@@ -600,43 +669,83 @@ NEVER use paragraph format. ALWAYS use this structure."""
             # Break content into chunks
             chunks = self.break_into_readable_chunks(page.content)
             
-            if progress['current_chunk'] >= len(chunks):
+            if progress.current_chunk >= len(chunks):
                 # Move to next page
-                progress['current_page'] += 1
-                progress['current_chunk'] = 0
+                progress.current_page += 1
+                progress.current_chunk = 0
                 
-                if progress['current_page'] > document.total_pages:
+                if progress.current_page > document.total_pages:
+                    db.session.commit()
                     return {"success": True, "message": "Lesson completed", "action": "completed"}
                 
-                return self.continue_reading(document_id)
+                # Persist the page turn before re-reading progress
+                db.session.commit()
+                return self.continue_reading(document_id, student_key=student_key)
             
             # Get current chunk and make it interactive
-            raw_chunk = chunks[progress['current_chunk']]
-            current_chunk = self.make_content_interactive(raw_chunk, progress['current_chunk'], document.subject)
+            raw_chunk = chunks[progress.current_chunk]
+            current_chunk = self.make_content_interactive(raw_chunk, progress.current_chunk, document.subject)
             
             # Move to next chunk
-            progress['current_chunk'] += 1
+            progress.current_chunk += 1
             
             # Save updated progress
-            all_progress[str(document_id)] = progress
-            self._save_progress(all_progress)
+            db.session.commit()
+            
+            # Start synthesizing the next chunks while this one is being spoken
+            upcoming = self._upcoming_chunks(
+                document, progress.current_page, progress.current_chunk, self.prefetch_depth, page, chunks
+            )
+            self.prefetch_audio(reading_key, upcoming, document.subject)
             
             return {
                 "success": True,
                 "content": current_chunk,  # Return original content for reading
                 "progress": {
-                    "page": progress['current_page'],
+                    "page": progress.current_page,
                     "total_pages": document.total_pages,
-                    "chunk": progress['current_chunk'],
+                    "chunk": progress.current_chunk,
                     "total_chunks_on_page": len(chunks)
                 },
                 "action": "read_chunk"
             }
             
         except Exception as e:
+            db.session.rollback()
             logging.error(f"Error reading next chunk: {e}")
             return {"success": False, "message": "Error reading content"}
     
+    def _upcoming_chunks(self, document, page_number, chunk_index, count, page=None, chunks=None):
+        """Return the interactive text of the next `count` chunks from a reading position"""
+        upcoming = []
+        while len(upcoming) < count and page_number <= document.total_pages:
+            if page is None:
+                page = DocumentPage.query.filter_by(
+                    document_id=document.id,
+                    page_number=page_number
+                ).first()
+                if not page:
+                    break
+            if chunks is None:
+                chunks = self.break_into_readable_chunks(page.content)
+            
+            for index in range(chunk_index, len(chunks)):
+                if len(upcoming) >= count:
+                    break
+                upcoming.append(self.make_content_interactive(chunks[index], index, document.subject))
+            
+            page_number += 1
+            chunk_index = 0
+            page = None
+            chunks = None
+        
+        return upcoming
+    
+    def stop_reading(self, document_id, student_key=None):
+        """Stop the reading session and drop any pending lookahead audio"""
+        prefetcher.cancel(self._reading_key(student_key, document_id))
+        return {"success": True, "message": "Reading stopped", "action": "stopped"}
+    
     def provide_encouragement_or_hint(self, question, user_response, context, subject):
         """Provide encouragement or hints based on user's response"""
         try:
@@ -670,9 +779,12 @@ NEVER use paragraph format. ALWAYS use this structure."""
                 Encourage the child while providing gentle guidance.
                 """
             
-            response = self.ai_tutor.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt
+            route = model_router.route('encouragement', subject)
+            response = generate_content(
+                self.ai_tutor.client, 'encouragement',
+                model=route.model,
+                contents=prompt,
+                config=route.config()
             )
             
             if response.text:
@@ -683,7 +795,7 @@ NEVER use paragraph format. ALWAYS use this structure."""
         
         return "Great try! Let's continue learning together."
     
-    def process_user_response(self, document_id, user_response, question, context):
+    def process_user_response(self, document_id, user_response, question, context, student_key=None):
         """Process user's response to a question"""
         try:
             if not user_response or not question:
@@ -700,16 +812,15 @@ NEVER use paragraph format. ALWAYS use this structure."""
             )
             
             # Update progress
-            all_progress = self._load_progress()
-            progress = all_progress.get(str(document_id))
+            progress = self._get_progress(student_key, document_id)
             if progress:
+                progress.questions_asked = (progress.questions_asked or 0) + 1
                 # Simple scoring - assume positive if response contains relevant keywords
                 if len(user_response.split()) > 2:  # Basic effort check
-                    progress['correct_answers'] += 1
+                    progress.correct_answers = (progress.correct_answers or 0) + 1
                 
                 # Save updated progress
-                all_progress[str(document_id)] = progress
-                self._save_progress(all_progress)
+                db.session.commit()
             
             return {
                 "success": True,
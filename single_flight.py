@@ -0,0 +1,247 @@
+"""
+Single-flight Request Coalescing
+Lets concurrent identical requests share one execution: the first caller for
+a key does the work and everyone else waiting on that key gets its result.
+Works across threads in a worker and, with shared=True, across gunicorn
+workers on the same host.
+
+Shared calls use a lock file and a result file per key in SINGLE_FLIGHT_DIR.
+The leader deletes the lock file before releasing it, and expired results are
+swept periodically, so the directory only holds keys that are in flight or
+recently answered.
+"""
+
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows - fall back to in-process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlightTimeout(Exception):
+    """Raised when waiting for another caller's result takes too long"""
+
+
+class _Call:
+    """An in-flight execution that followers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def make_key(namespace, *parts):
+    """
+    Build a collision-safe key for a call
+
+    Parts are serialized as JSON and hashed, so ("a", "b-c") and ("a-b", "c")
+    never map to the same key, and keys from different namespaces never mix.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:40]
+    return f"{namespace}-{digest}"
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key"""
+
+    def __init__(self, state_dir=None, result_ttl=120, poll_interval=0.05):
+        self.state_dir = state_dir or os.environ.get(
+            "SINGLE_FLIGHT_DIR", os.path.join(tempfile.gettempdir(), "tutionbuddy-singleflight")
+        )
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._last_sweep = 0.0
+
+    def do(self, key, fn, timeout=60, shared=False, share_result=None):
+        """
+        Run fn once for all concurrent callers with the same key
+
+        Args:
+            key (str): Call key, normally built with make_key()
+            fn (callable): Work to perform; called with no arguments
+            timeout (float): Seconds a follower waits before giving up
+            shared (bool): Also coalesce with other worker processes. The
+                result must then be JSON serializable.
+            share_result (callable): Predicate deciding whether a result may be
+                handed to other workers (e.g. to keep error payloads local)
+
+        Returns:
+            The result of fn, computed by this caller or another one
+
+        Raises:
+            SingleFlightTimeout: If the leader did not finish in time
+            Exception: Whatever fn raised in the leader
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            logger.debug(f"Waiting on in-flight call {key}")
+            if not call.done.wait(timeout):
+                raise SingleFlightTimeout(f"Timed out after {timeout}s waiting for {key}")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if shared and fcntl is not None:
+                call.result = self._do_shared(key, fn, timeout, share_result)
+            else:
+                call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def _do_shared(self, key, fn, timeout, share_result):
+        """Coalesce with other processes through a lock file and a result file"""
+        os.makedirs(self.state_dir, exist_ok=True)
+        lock_path = os.path.join(self.state_dir, f"{key}.lock")
+        result_path = os.path.join(self.state_dir, f"{key}.json")
+
+        found, result = self._read_result(result_path)
+        if found:
+            return result
+
+        lock_file = self._acquire_lock(lock_path, key, timeout)
+        try:
+            # Another worker may have finished while we were waiting for the lock.
+            # If it failed it leaves no result and we simply run fn ourselves.
+            found, result = self._read_result(result_path)
+            if found:
+                return result
+
+            result = fn()
+            if share_result is None or share_result(result):
+                self._write_result(result_path, result)
+                self._sweep()
+            return result
+        finally:
+            self._release_lock(lock_path, lock_file)
+
+    def _acquire_lock(self, lock_path, key, timeout):
+        """
+        Open and exclusively lock a key's lock file
+
+        The holder deletes the file before unlocking, so after getting the
+        lock we check that the path still names the file we locked; if not,
+        a waiter locked a deleted file and opens the current one instead.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            lock_file = open(lock_path, 'a')
+            try:
+                while True:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        if time.monotonic() >= deadline:
+                            raise SingleFlightTimeout(f"Timed out after {timeout}s waiting for {key} in another worker")
+                        time.sleep(self.poll_interval)
+                if _same_file(lock_file, lock_path):
+                    return lock_file
+            except BaseException:
+                lock_file.close()
+                raise
+            lock_file.close()
+
+    def _release_lock(self, lock_path, lock_file):
+        """Delete a held lock file, then unlock it"""
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            lock_file.close()
+
+    def _sweep(self):
+        """Remove expired results and abandoned lock files, at most once per result_ttl"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_sweep < self.result_ttl:
+                return
+            self._last_sweep = now
+
+        try:
+            entries = list(os.scandir(self.state_dir))
+        except OSError:
+            return
+        removed = 0
+        for entry in entries:
+            try:
+                if now - entry.stat().st_mtime <= self.result_ttl:
+                    continue
+                if entry.name.endswith(('.json', '.part')):
+                    os.remove(entry.path)
+                    removed += 1
+                elif entry.name.endswith('.lock') and fcntl is not None:
+                    # Only delete a lock file nobody holds
+                    with open(entry.path, 'a') as lock_file:
+                        try:
+                            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        except BlockingIOError:
+                            continue
+                        if _same_file(lock_file, entry.path):
+                            os.remove(entry.path)
+                            removed += 1
+            except OSError:
+                continue
+        if removed:
+            logger.info(f"Swept {removed} expired single-flight files from {self.state_dir}")
+
+    def _read_result(self, result_path):
+        try:
+            if time.time() - os.path.getmtime(result_path) > self.result_ttl:
+                os.remove(result_path)
+                return False, None
+            with open(result_path, 'r', encoding='utf-8') as f:
+                return True, json.load(f)
+        except (OSError, ValueError):
+            return False, None
+
+    def _write_result(self, result_path, result):
+        temp_path = f"{result_path}.{uuid.uuid4().hex}.part"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(temp_path, result_path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not share single-flight result {result_path}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def _same_file(open_file, path):
+    """True if path still names the open file (it was not deleted or replaced)"""
+    try:
+        return os.fstat(open_file.fileno()).st_ino == os.stat(path).st_ino
+    except FileNotFoundError:
+        return False
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,190 @@
+"""
+Spaced Repetition Scheduler
+SM-2 scheduling over per-student review cards. Cards are derived from
+uploaded chapters and from questions the student got wrong; "what's due" is a
+single range scan over the (student_key, due_at) index.
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Document, HomeworkSession, HomeworkQuestion, ReviewCard
+
+logger = logging.getLogger(__name__)
+
+MIN_EASE_FACTOR = 1.3
+
+# Quality grades (0-5) for the review buttons
+REVIEW_QUALITIES = {
+    "got_it": 4,
+    "need_practice": 2
+}
+
+
+def schedule_review(card, quality, now=None):
+    """
+    Apply one SM-2 review to a card
+
+    Args:
+        card: ReviewCard to update in place
+        quality (int): Recall quality from 0 (forgot) to 5 (perfect)
+        now (datetime): Review time, defaults to utcnow
+    """
+    now = now or datetime.utcnow()
+    quality = max(0, min(5, int(quality)))
+
+    if quality < 3:
+        # Lapse: start the card over, but keep its (reduced) ease
+        card.repetitions = 0
+        card.interval_days = 1
+        card.lapses = (card.lapses or 0) + 1
+    else:
+        if not card.repetitions:
+            card.interval_days = 1
+        elif card.repetitions == 1:
+            card.interval_days = 6
+        else:
+            card.interval_days = max(1, round(card.interval_days * card.ease_factor))
+        card.repetitions = (card.repetitions or 0) + 1
+
+    card.ease_factor = max(
+        MIN_EASE_FACTOR,
+        (card.ease_factor or 2.5) + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    )
+    card.last_reviewed_at = now
+    card.due_at = now + timedelta(days=card.interval_days)
+
+
+class SpacedRepetitionScheduler:
+    """Creates review cards for a student and serves the due queue"""
+
+    def __init__(self, sync_interval=60):
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._last_sync = {}  # student key -> monotonic time of last card sync
+
+    def due_cards(self, student_key, limit=20, subject=None, now=None):
+        """
+        Return the student's cards that are due, most overdue first
+
+        Returns:
+            tuple: (list of ReviewCard, total number of due cards)
+        """
+        self.sync_cards(student_key)
+        now = now or datetime.utcnow()
+
+        query = ReviewCard.query.filter(ReviewCard.student_key == student_key, ReviewCard.due_at <= now)
+        if subject:
+            query = query.filter(ReviewCard.subject == subject)
+        return query.order_by(ReviewCard.due_at).limit(limit).all(), query.count()
+
+    def review(self, student_key, card_id, quality):
+        """
+        Record a review result and reschedule the card
+
+        Returns:
+            ReviewCard or None if the card does not belong to the student
+        """
+        card = ReviewCard.query.filter_by(id=card_id, student_key=student_key).first()
+        if not card:
+            return None
+        schedule_review(card, quality)
+        db.session.commit()
+        return card
+
+    def sync_cards(self, student_key, force=False):
+        """
+        Create cards for chapters and missed questions the student has no card for yet
+
+        Only rows without a card are fetched (anti-joins on the card's unique
+        key), so the cost depends on what is new, not on the size of history.
+        Runs at most once per sync_interval per student unless forced.
+        """
+        now_monotonic = time.monotonic()
+        with self._lock:
+            if not force and now_monotonic - self._last_sync.get(student_key, 0) < self.sync_interval:
+                return 0
+            self._last_sync[student_key] = now_monotonic
+
+        chapter_card = and_(
+            ReviewCard.student_key == student_key,
+            ReviewCard.source == 'chapter',
+            ReviewCard.document_id == Document.id
+        )
+        new_chapters = Document.query.outerjoin(ReviewCard, chapter_card).filter(ReviewCard.id.is_(None)).all()
+
+        question_card = and_(
+            ReviewCard.student_key == student_key,
+            ReviewCard.source == 'missed_question',
+            ReviewCard.homework_question_id == HomeworkQuestion.id
+        )
+        new_missed = (
+            db.session.query(HomeworkQuestion, HomeworkSession.subject)
+            .join(HomeworkSession, HomeworkQuestion.session_id == HomeworkSession.id)
+            .outerjoin(ReviewCard, question_card)
+            .filter(
+                HomeworkSession.student_key == student_key,
+                HomeworkQuestion.is_correct.is_(False),
+                HomeworkQuestion.attempts_count > 0,
+                ReviewCard.id.is_(None)
+            )
+            .all()
+        )
+
+        now = datetime.utcnow()
+        for document in new_chapters:
+            db.session.add(ReviewCard(
+                student_key=student_key,
+                card_key=f"chapter:{document.id}",
+                source='chapter',
+                document_id=document.id,
+                subject=document.subject,
+                topic=document.lesson_title or f"Chapter {document.chapter_number}",
+                due_at=now
+            ))
+        for question, subject in new_missed:
+            db.session.add(ReviewCard(
+                student_key=student_key,
+                card_key=f"question:{question.id}",
+                source='missed_question',
+                homework_question_id=question.id,
+                subject=subject,
+                topic=question.chapter or question.question_text[:255],
+                prompt=question.question_text,
+                answer=question.correct_answer,
+                due_at=now
+            ))
+
+        created = len(new_chapters) + len(new_missed)
+        if created:
+            try:
+                db.session.commit()
+                logger.info(f"Created {created} review cards for student {student_key}")
+            except IntegrityError:
+                # A concurrent request created the same cards
+                db.session.rollback()
+                return 0
+        return created
+
+
+def describe_last_review(card, now=None):
+    """Human-readable time since the card was last reviewed"""
+    if not card.last_reviewed_at:
+        return "Never"
+    days = ((now or datetime.utcnow()) - card.last_reviewed_at).days
+    if days <= 0:
+        return "Today"
+    if days == 1:
+        return "1 day ago"
+    if days < 7:
+        return f"{days} days ago"
+    weeks = days // 7
+    return "1 week ago" if weeks == 1 else f"{weeks} weeks ago"
+
+
+scheduler = SpacedRepetitionScheduler()
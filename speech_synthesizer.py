@@ -0,0 +1,312 @@
+"""
+Speech Synthesizer
+One interface over the text-to-speech engines the tutor can use:
+- gtts: Google Translate voices; best quality, but every call is a network
+  round trip
+- piper: local neural voices, a few hundred ms per sentence on a CPU; needs
+  a voice model per language (PIPER_VOICES)
+- espeak: espeak-ng, local and near-instant for en/hi/te, robotic but always
+  there when installed
+
+Each language has an ordered list of backends (TTS_BACKENDS, or
+TTS_BACKENDS_<LANG> for one language, e.g. TTS_BACKENDS_TE=gtts,espeak).
+The first backend that is installed and healthy is used; a failure falls
+through to the next one, and a circuit breaker per backend stops a failing
+engine (gTTS while offline) from costing a timeout on every request. gTTS
+only retries when no other backend is left to fail over to.
+
+Every backend returns MP3 at gTTS's format (24 kHz mono), so segments from
+different engines can be concatenated into one file. Local engines write WAV,
+which ffmpeg encodes.
+"""
+
+import os
+import io
+import time
+import shutil
+import logging
+import tempfile
+import threading
+import subprocess
+from collections import deque
+
+from audio_transcoder import find_ffmpeg
+from gemini_client import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND_ORDER = ['piper', 'gtts', 'espeak']
+
+# espeak-ng voice per language code; override with ESPEAK_VOICES=en=en-gb,hi=hi
+ESPEAK_VOICES = {'en': 'en-gb', 'hi': 'hi', 'te': 'te'}
+
+# Local engines are encoded to match gTTS output
+MP3_ENCODE_ARGS = ['-ac', '1', '-ar', '24000', '-codec:a', 'libmp3lame', '-b:a', '64k']
+
+
+class SynthesisError(Exception):
+    """No backend could synthesize the text"""
+
+
+def _parse_mapping(value):
+    """Parse 'en=a,hi=b' into {'en': 'a', 'hi': 'b'}"""
+    mapping = {}
+    for item in (value or '').split(','):
+        key, _, target = item.partition('=')
+        if key.strip() and target.strip():
+            mapping[key.strip()] = target.strip()
+    return mapping
+
+
+class Synthesizer:
+    """A text-to-speech backend producing MP3 bytes"""
+
+    name = None
+
+    def is_available(self):
+        """Return True if the engine is installed and usable"""
+        return True
+
+    def supports(self, lang):
+        """Return True if the engine has a voice for the language code"""
+        return True
+
+    def synthesize(self, text, voice_config, slow=False, retry=False):
+        """
+        Synthesize text to MP3
+
+        Args:
+            text (str): Text to speak
+            voice_config (dict): {'lang': ..., 'tld': ...}
+            slow (bool): Speak slowly
+            retry (bool): Retry transient failures; set when no backend follows
+
+        Returns:
+            bytes: MP3 audio
+        """
+        raise NotImplementedError
+
+
+class GTTSSynthesizer(Synthesizer):
+    """Google Translate TTS over the network"""
+
+    name = 'gtts'
+
+    def __init__(self, max_retries=3, retry_delay=2, timeout=10):
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+
+    def supports(self, lang):
+        return lang in ('en', 'hi', 'te')
+
+    def synthesize(self, text, voice_config, slow=False, retry=False):
+        from gtts import gTTS  # Imported on first use; it is slow to import
+        attempts = self.max_retries if retry else 1
+
+        for attempt in range(attempts):
+            try:
+                tts = gTTS(
+                    text=text,
+                    lang=voice_config['lang'],
+                    tld=voice_config.get('tld', 'co.in'),
+                    slow=slow,
+                    timeout=self.timeout
+                )
+                buffer = io.BytesIO()
+                tts.write_to_fp(buffer)
+                return buffer.getvalue()
+            except Exception as retry_error:
+                if attempt < attempts - 1:
+                    logger.warning(f"gTTS attempt {attempt + 1} failed, retrying in {self.retry_delay}s: {retry_error}")
+                    time.sleep(self.retry_delay)
+                else:
+                    raise
+
+
+class LocalEngineSynthesizer(Synthesizer):
+    """A local engine that writes WAV, encoded to MP3 with ffmpeg"""
+
+    binary_env = None
+    default_binary = None
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+        self._binary = None
+
+    def binary(self):
+        if self._binary is None:
+            self._binary = shutil.which(os.environ.get(self.binary_env, self.default_binary)) or ''
+        return self._binary
+
+    def is_available(self):
+        return bool(self.binary() and find_ffmpeg())
+
+    def synthesize(self, text, voice_config, slow=False, retry=False):
+        with tempfile.TemporaryDirectory(prefix=f"tts-{self.name}-") as workdir:
+            wav_path = os.path.join(workdir, 'speech.wav')
+            # Text goes in on stdin so it can't be mistaken for options
+            subprocess.run(
+                self.command(voice_config['lang'], wav_path, slow),
+                input=text.encode('utf-8'), check=True, capture_output=True, timeout=self.timeout
+            )
+            result = subprocess.run(
+                [find_ffmpeg(), '-nostdin', '-loglevel', 'error', '-i', wav_path, *MP3_ENCODE_ARGS, '-f', 'mp3', 'pipe:1'],
+                check=True, capture_output=True, timeout=self.timeout
+            )
+        return result.stdout
+
+    def command(self, lang, wav_path, slow):
+        """Return the engine command that reads text on stdin and writes wav_path"""
+        raise NotImplementedError
+
+
+class EspeakSynthesizer(LocalEngineSynthesizer):
+    """espeak-ng formant synthesis"""
+
+    name = 'espeak'
+    binary_env = 'ESPEAK_BINARY'
+    default_binary = 'espeak-ng'
+
+    def __init__(self, voices=None, words_per_minute=150, timeout=30):
+        super().__init__(timeout=timeout)
+        self.voices = dict(ESPEAK_VOICES, **(voices or {}))
+        self.words_per_minute = words_per_minute
+
+    def supports(self, lang):
+        return lang in self.voices
+
+    def command(self, lang, wav_path, slow):
+        speed = self.words_per_minute * 2 // 3 if slow else self.words_per_minute
+        return [self.binary(), '-v', self.voices[lang], '-s', str(speed), '-w', wav_path, '--stdin']
+
+
+class PiperSynthesizer(LocalEngineSynthesizer):
+    """Piper neural voices (one .onnx model per language)"""
+
+    name = 'piper'
+    binary_env = 'PIPER_BINARY'
+    default_binary = 'piper'
+
+    def __init__(self, voices=None, timeout=30):
+        super().__init__(timeout=timeout)
+        self.voices = voices or {}
+
+    def supports(self, lang):
+        return os.path.exists(self.voices.get(lang, ''))
+
+    def command(self, lang, wav_path, slow):
+        command = [self.binary(), '--model', self.voices[lang], '--output_file', wav_path]
+        if slow:
+            command += ['--length_scale', '1.5']
+        return command
+
+
+class SpeechSynthesizer:
+    """Picks a backend per language and fails over between them"""
+
+    def __init__(self, backends, default_order, language_orders=None):
+        self.backends = {backend.name: backend for backend in backends}
+        self.default_order = default_order
+        self.language_orders = language_orders or {}
+        self._breakers = {
+            name: CircuitBreaker(failure_threshold=3, reset_after=60.0, name=f"TTS {name}")
+            for name in self.backends
+        }
+        self._stats_lock = threading.Lock()
+        self._stats = {name: {"calls": 0, "failures": 0, "latencies": deque(maxlen=200)} for name in self.backends}
+
+    def backend_order(self, lang):
+        """Return the configured backend names for a language code"""
+        order = self.language_orders.get(lang, self.default_order)
+        return [name for name in order if name in self.backends]
+
+    def synthesize(self, text, voice_config, slow=False):
+        """
+        Synthesize text with the first healthy backend for its language
+
+        Args:
+            text (str): Text to speak
+            voice_config (dict): {'lang': ..., 'tld': ...}
+            slow (bool): Speak slowly
+
+        Returns:
+            bytes: MP3 audio
+
+        Raises:
+            SynthesisError: If every backend is missing, open or failed
+        """
+        lang = voice_config['lang']
+        candidates = [
+            self.backends[name] for name in self.backend_order(lang)
+            if self.backends[name].is_available() and self.backends[name].supports(lang)
+        ]
+        errors = []
+        for index, backend in enumerate(candidates):
+            breaker = self._breakers[backend.name]
+            if not breaker.allow():
+                errors.append(f"{backend.name}: circuit open")
+                continue
+            start = time.monotonic()
+            try:
+                audio = backend.synthesize(text, voice_config, slow=slow, retry=index == len(candidates) - 1)
+            except Exception as e:
+                breaker.record_failure()
+                self._record(backend.name, None)
+                logger.warning(f"TTS backend {backend.name} failed for '{lang}': {e}")
+                errors.append(f"{backend.name}: {e}")
+                continue
+            breaker.record_success()
+            self._record(backend.name, time.monotonic() - start)
+            if index > 0:
+                logger.info(f"Synthesized '{lang}' speech with fallback backend {backend.name}")
+            return audio
+
+        raise SynthesisError(f"No TTS backend could speak '{lang}': {'; '.join(errors) or 'none available'}")
+
+    def describe(self):
+        """Return each backend's availability, health and latency, and the order per language"""
+        with self._stats_lock:
+            stats = {name: dict(values, latencies=sorted(values["latencies"])) for name, values in self._stats.items()}
+        backends = {}
+        for name, backend in self.backends.items():
+            latencies = stats[name]["latencies"]
+            backends[name] = {
+                "available": backend.is_available(),
+                "circuit": self._breakers[name].state(),
+                "calls": stats[name]["calls"],
+                "failures": stats[name]["failures"],
+                "p50_ms": round(latencies[len(latencies) // 2] * 1000) if latencies else None,
+                "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000) if latencies else None
+            }
+        return {
+            "backends": backends,
+            "languages": {lang: self.backend_order(lang) for lang in ('en', 'hi', 'te')}
+        }
+
+    def _record(self, name, seconds):
+        with self._stats_lock:
+            stats = self._stats[name]
+            stats["calls"] += 1
+            if seconds is None:
+                stats["failures"] += 1
+            else:
+                stats["latencies"].append(seconds)
+
+
+def _backend_list(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+speech_synthesizer = SpeechSynthesizer(
+    [
+        PiperSynthesizer(voices=_parse_mapping(os.environ.get('PIPER_VOICES'))),
+        GTTSSynthesizer(max_retries=int(os.environ.get('GTTS_MAX_RETRIES', '3'))),
+        EspeakSynthesizer(voices=_parse_mapping(os.environ.get('ESPEAK_VOICES')))
+    ],
+    default_order=_backend_list(os.environ.get('TTS_BACKENDS', ','.join(DEFAULT_BACKEND_ORDER))),
+    language_orders={
+        lang: _backend_list(os.environ[f'TTS_BACKENDS_{lang.upper()}'])
+        for lang in ('en', 'hi', 'te') if os.environ.get(f'TTS_BACKENDS_{lang.upper()}')
+    }
+)
@@ -0,0 +1,73 @@
+"""
+Startup Benchmark
+Measures how long a fresh process takes to import the app and build it with
+create_app(), and checks that the heavy libraries (pydantic, google-genai types,
+gTTS, python-docx) are left for first use. Each run is a new interpreter so nothing
+is cached between runs.
+
+Usage:
+    python startup_benchmark.py               # median of 5 runs
+    python startup_benchmark.py --runs 10
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+HEAVY_MODULES = ["pydantic", "google.genai.types", "gtts", "docx"]
+
+# Runs in the child interpreter; prints timings as JSON
+PROBE = """
+import sys, json, time
+start = time.perf_counter()
+import main
+app_seconds = time.perf_counter() - start
+deferred = {}
+for name in %(modules)r:
+    loaded = name in sys.modules
+    start = time.perf_counter()
+    __import__(name)
+    deferred[name] = {"loaded_at_startup": loaded, "import_seconds": time.perf_counter() - start}
+print(json.dumps({"app_seconds": app_seconds, "deferred": deferred}))
+"""
+
+
+def measure_once(workdir):
+    """Import the app in a fresh interpreter and return its timings"""
+    env = dict(
+        os.environ,
+        DATABASE_URL=os.environ.get("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'startup.db')}"),
+        GOOGLE_API_KEY=os.environ.get("GOOGLE_API_KEY", "startup-benchmark"),
+        LOG_LEVEL="WARNING"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE % {"modules": HEAVY_MODULES}],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="startup-benchmark-")
+    runs = [measure_once(workdir) for _ in range(args.runs)]
+
+    app_seconds = statistics.median(run["app_seconds"] for run in runs)
+    print(f"import main + create_app(): {app_seconds * 1000:.0f} ms (median of {args.runs})\n")
+    print(f"{'deferred module':<22} {'loaded at startup':<19} first-use import")
+    for name in HEAVY_MODULES:
+        loaded = any(run["deferred"][name]["loaded_at_startup"] for run in runs)
+        seconds = statistics.median(run["deferred"][name]["import_seconds"] for run in runs)
+        print(f"{name:<22} {'yes' if loaded else 'no':<19} {seconds * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+from fractions import Fraction
+
+import pytest
+
+from answer_grader import grade_answer, grade_multiple_choice, numbers_match, parse_quantity
+
+
+def verdict(question, student_answer, expected_answer=None, question_type=None, options=None):
+    result = grade_answer(question, student_answer, expected_answer, question_type, options)
+    return None if result is None else result["is_correct"]
+
+
+@pytest.mark.parametrize("student, expected, decimals, allow_rounding, matched", [
+    (Fraction("2.75"), Fraction("2.75"), 2, False, True),
+    (Fraction("2.8"), Fraction("2.75"), 1, False, False),
+    (Fraction("0.4"), Fraction("0.35"), 1, False, False),
+    (Fraction("2.8"), Fraction("2.75"), 1, True, True),
+    (Fraction("0.3"), Fraction("0.25"), 1, True, True),
+    (Fraction("0.33"), Fraction(1, 3), 2, False, True),
+    (Fraction("0.67"), Fraction(2, 3), 2, False, True),
+    (Fraction("0.66"), Fraction(2, 3), 2, False, False),
+    (Fraction(3), Fraction(1, 3), None, False, False),
+])
+def test_numbers_match_only_rounds_when_allowed(student, expected, decimals, allow_rounding, matched):
+    assert numbers_match(student, expected, decimals, allow_rounding) is matched
+
+
+def test_rounded_answer_accepted_when_question_asks_for_rounding():
+    assert verdict("Round 2.75 to one decimal place", "2.8", "2.75") is True
+    assert verdict("Write 11/4 as a decimal", "2.8", "2.75") is False
+
+
+@pytest.mark.parametrize("student, expected, options, matched", [
+    ("B", "B", ["A) Mumbai", "B) Delhi"], True),
+    ("A", "B", ["A) Mumbai", "B) Delhi"], False),
+    ("B", "Delhi", ["A) Mumbai", "B) Delhi"], True),
+    ("B", "Delhi", ["Mumbai", "Delhi", "Chennai"], True),
+    ("A", "Delhi", ["Mumbai", "Delhi", "Chennai"], False),
+    ("Delhi", "B", ["Mumbai", "Delhi"], True),
+    ("delhi", "Delhi", ["Mumbai", "Delhi"], True),
+    ("(b)", "b", None, True),
+    ("Option C", "B", None, False),
+])
+def test_grade_multiple_choice(student, expected, options, matched):
+    assert grade_multiple_choice(student, expected, options) is matched
+
+
+def test_multiple_choice_free_text_outside_options_is_left_to_the_llm():
+    assert grade_multiple_choice("New Delhi", "Delhi", ["Mumbai", "Delhi"]) is None
+    assert verdict("Is the Sun a star?", "yes", "True", options=["True", "False"]) is True
+
+
+def test_parse_quantity_keeps_unit_but_not_currency():
+    assert parse_quantity("3000 cm") == (Fraction(3000), "cm")
+    assert parse_quantity("₹1,50,000") == (Fraction(150000), None)
+    assert parse_quantity("20 rupees") == (Fraction(20), None)
+    assert parse_quantity("75%") == (Fraction(3, 4), None)
+    assert parse_quantity("₹40 only") == (Fraction(40), None)
+
+
+def test_trailing_sentence_is_not_a_quantity():
+    assert parse_quantity("4 is not the answer") == (None, None)
+    assert verdict("How many sides does a square have?", "4 is not the answer", "4") is None
+    assert verdict("What is 2 + 2?", "4 is it") is None
+
+
+@pytest.mark.parametrize("student, expected, matched", [
+    ("3000 cm", "3000 m", False),
+    ("300 cm", "3 m", True),
+    ("3 metres", "3 m", True),
+    ("5 apple", "5 apples", True),
+    ("12", "12 cm", True),
+    ("₹20", "20 rupees", True),
+    ("5 mangoes", "5 apples", None),
+    ("4 marks", "4", None),
+    ("4 cm", "4", True),
+])
+def test_units_are_compared(student, expected, matched):
+    assert verdict("How much?", student, expected) is matched
+
+
+def test_arithmetic_question_without_key():
+    assert verdict("What is 3/4 + 1/8?", "7/8") is True
+    assert verdict("What is 3/4 + 1/8?", "0.875") is True
+    assert verdict("What is 3/4 + 1/8?", "0.9") is False
+    assert verdict("Why do leaves fall?", "Because of autumn") is None
@@ -0,0 +1,44 @@
+import threading
+
+from audio_prefetch import AudioPrefetcher
+
+
+def test_finished_sessions_are_forgotten():
+    prefetcher = AudioPrefetcher(max_workers=2)
+    calls = []
+    for session in ("s1", "s2", "s3"):
+        prefetcher.schedule(session, [(f"{session}-a", lambda: calls.append(1)), (f"{session}-b", lambda: calls.append(2))])
+    prefetcher._executor.shutdown(wait=True)
+
+    assert len(calls) == 6
+    assert prefetcher._pending == {} and prefetcher._generations == {} and prefetcher._inflight == {}
+
+
+def test_cancel_skips_queued_jobs_and_forgets_the_session():
+    prefetcher = AudioPrefetcher(max_workers=1)
+    release = threading.Event()
+    calls = []
+    prefetcher.schedule("blocker", [("blocker-1", lambda: release.wait(5))])
+    prefetcher.schedule("reading", [("reading-2", lambda: calls.append(2)), ("reading-3", lambda: calls.append(3))])
+
+    prefetcher.cancel("reading")
+    release.set()
+    prefetcher._executor.shutdown(wait=True)
+
+    assert calls == []
+    assert prefetcher._pending == {} and prefetcher._generations == {} and prefetcher._inflight == {}
+
+
+def test_rescheduling_supersedes_the_earlier_lookahead():
+    prefetcher = AudioPrefetcher(max_workers=1)
+    release = threading.Event()
+    calls = []
+    prefetcher.schedule("blocker", [("blocker-1", lambda: release.wait(5))])
+    prefetcher.schedule("reading", [("page-2", lambda: calls.append(2))])
+    prefetcher.schedule("reading", [("page-5", lambda: calls.append(5))])
+
+    release.set()
+    prefetcher._executor.shutdown(wait=True)
+
+    assert calls == [5]
+    assert prefetcher._pending == {} and prefetcher._generations == {}
@@ -0,0 +1,47 @@
+from app import create_app, db
+from field_selection import parse_fields, trim_payload
+
+PAYLOAD = {
+    "success": True,
+    "message": "ok",
+    "document": {"id": 3, "title": "Plants", "pages": 2},
+    "pages": [
+        {"page_number": 1, "content": "Leaves", "image": "p1.png"},
+        {"page_number": 2, "content": "Roots", "image": "p2.png"},
+    ],
+}
+
+
+def test_parse_fields_builds_a_tree():
+    assert parse_fields("document.title, pages.content,pages.page_number") == {
+        "document": {"title": {}}, "pages": {"content": {}, "page_number": {}}
+    }
+    assert parse_fields(" , ") == {}
+
+
+def test_trim_payload_applies_paths_to_every_list_item():
+    assert trim_payload(PAYLOAD, "document.title,pages.page_number") == {
+        "success": True,
+        "message": "ok",
+        "document": {"title": "Plants"},
+        "pages": [{"page_number": 1}, {"page_number": 2}],
+    }
+
+
+def test_trim_payload_keeps_success_message_and_skips_unknown_fields():
+    assert trim_payload(PAYLOAD, "missing,document.missing") == {"success": True, "message": "ok", "document": {}}
+
+
+def test_empty_spec_or_non_dict_payload_is_unchanged():
+    assert trim_payload(PAYLOAD, "") == PAYLOAD
+    assert trim_payload([{"a": 1, "b": 2}], "a") == [{"a": 1}]
+
+
+def test_fields_parameter_trims_api_responses(tmp_path):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'tutor.db'}"})
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+
+    assert client.get("/api/exam/weak-topics").get_json() == {"success": True, "topics": []}
+    assert client.get("/api/exam/weak-topics?fields=success").get_json() == {"success": True}
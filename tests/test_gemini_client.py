@@ -0,0 +1,71 @@
+import pytest
+
+import gemini_client
+from gemini_client import CircuitBreaker, RetryBudget
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(gemini_client.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_after=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state() == "closed" and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state() == "open"
+    assert not breaker.allow()
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state() == "closed"
+
+
+def test_breaker_lets_one_probe_through_after_reset(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=30)
+    breaker.record_failure()
+    clock[0] += 29
+    assert not breaker.allow()
+
+    clock[0] += 1
+    assert breaker.allow()
+    assert breaker.state() == "half_open"
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state() == "closed" and breaker.allow()
+
+
+def test_failed_probe_reopens_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=5, reset_after=30)
+    for _ in range(5):
+        breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state() == "open"
+    clock[0] += 10
+    assert not breaker.allow()
+    clock[0] += 20
+    assert breaker.allow()
+
+
+def test_retry_budget_refills_with_calls():
+    budget = RetryBudget(ratio=0.5, initial=1, cap=2)
+    assert budget.try_spend()
+    assert not budget.try_spend()
+
+    budget.record_call()
+    budget.record_call()
+    assert budget.try_spend()
+    assert not budget.try_spend()
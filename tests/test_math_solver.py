@@ -0,0 +1,73 @@
+import pytest
+
+from math_solver import math_solver
+
+
+@pytest.mark.parametrize("question, kind, answer", [
+    ("Find the HCF of 18, 24 and 60", "hcf_lcm", "The HCF of 18, 24 and 60 is 6."),
+    ("Find the LCM of 12 and 18", "hcf_lcm", "The LCM of 12 and 18 is 36."),
+    ("What is 3/4 + 1/6?", "fractions", "3/4 + 1/6 = 11/12"),
+    ("Simplify 18/24", "fractions", "18/24 = 3/4 in its simplest form."),
+    ("What is 3 times 4?", "arithmetic", "3 × 4 = 12"),
+    ("17 ÷ 5 = ?", "arithmetic", "17 ÷ 5 = 3.4"),
+    ("(25 + 15) × 4 - 60 ÷ 3", "arithmetic", "(25 + 15) × 4 - 60 ÷ 3 = 140"),
+    ("Convert 3.5 km to m", "unit_conversion", "3.5 km = 3500 m."),
+    ("What is 25% of 480?", "percentage", "25% of 480 is 120."),
+    ("Ravi had 50 marbles. He gave 18 to his friend. How many marbles are left?", "word_problem", "32 marbles"),
+    ("A shop sold 245 pens on Monday and 178 pens on Tuesday. How many pens were sold in all?", "word_problem", "423 pens"),
+    ("48 sweets are shared equally among 6 children. How many sweets does each child get?", "word_problem", "8 sweets"),
+    ("There are 24 boxes with 12 pencils in each box. How many pencils are there in all?", "word_problem", "288 pencils"),
+    ("A shopkeeper bought a fan for Rs. 1200 and sold it for Rs. 1500. Find profit or loss.", "profit_loss", "Profit of ₹300."),
+    ("What is 2/3 + 5?", "arithmetic", "2/3 + 5 = 17/3 = 5 2/3"),
+    ("What is 3/4 ÷ 1/2?", "arithmetic", "3/4 ÷ 1/2 = 3/2 = 1 1/2"),
+])
+def test_solves_supported_questions(question, kind, answer):
+    solution = math_solver.solve(question)
+    assert solution is not None
+    assert (solution.kind, solution.answer) == (kind, answer)
+
+
+def test_profit_and_loss_percent():
+    profit = math_solver.solve("A pen costs Rs 40 and sells for Rs 50. Find the profit percent.")
+    assert profit.answer == "Profit of ₹10, which is a profit of 25%."
+    assert any("Profit % = Profit ÷ CP × 100" in step for step in profit.steps)
+
+    loss = math_solver.solve("A toy was bought for ₹200 and sold for ₹150. Find the loss percentage.")
+    assert loss.answer == "Loss of ₹50, which is a loss of 25%."
+
+
+@pytest.mark.parametrize("question, answer", [
+    ("Ram has 24 apples and 6 friends. How many apples will each friend get?", "4 apples"),
+    ("There are 36 eggs with 6 eggs in each basket. How many baskets are there?", "6 baskets"),
+    ("Sita has 60 rupees. Each pencil costs 5 rupees. How many pencils can she buy?", "12 pencils"),
+    ("A box has 12 pencils. How many pencils are in 5 boxes?", "60 pencils"),
+    ("Each pencil costs 5 rupees. What is the total cost of 12 pencils?", "₹60"),
+    ("Ravi walks 3 km every day. How many km does he walk in 7 days?", "21 km"),
+])
+def test_each_multiplies_only_for_a_given_rate(question, answer):
+    solution = math_solver.solve(question)
+    assert (solution.kind, solution.answer) == ("word_problem", answer)
+    assert "'each' with a total" not in solution.explanation
+
+
+def test_fraction_answers_stay_exact():
+    steps = math_solver.solve("What is 2/3 + 5?").steps
+    assert not any("remainder" in step or "about" in step for step in steps)
+
+
+@pytest.mark.parametrize("question", [
+    "Ram has 25 apples and 6 friends. How many apples will each friend get?",
+    "What is 3 + 4%?",
+    "What is 100 - 20%?",
+    "How many questions are on page 4 and 5 in all?",
+    "How many planets are there, 8 or 9, in total?",
+    "Read page 12 and answer question 3 and 4 in total",
+    "How many sums are in Q3 and Q4 altogether?",
+    "Explain 1/2",
+    "Why is the sky blue?",
+    "Chapter 3: what is 2/3 of 12 apples?",
+    "What is the area of a rectangle 5 m by 3 m?",
+    "What is 5 / 0?",
+])
+def test_leaves_other_questions_to_the_llm(question):
+    assert math_solver.solve(question) is None
@@ -0,0 +1,56 @@
+import unicodedata
+
+import pytest
+
+from prompt_builder import build_page_context, context_budget, estimate_tokens, truncate_text, DEFAULT_CONTEXT_BUDGET
+
+HINDI = "भारत की राजधानी नई दिल्ली है। "
+TELUGU = "తెలుగు భాష చాలా అందమైనది. "
+
+
+def test_estimate_tokens_counts_indic_scripts_more_densely():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a" * 400) == 101
+    assert estimate_tokens("क" * 400) == 201
+
+
+def test_context_budget_falls_back_to_default():
+    assert context_budget("hint") == 1500
+    assert context_budget("unknown_call_site") == DEFAULT_CONTEXT_BUDGET
+
+
+def test_truncate_text_keeps_text_that_fits():
+    assert truncate_text("Short text.", 100) == "Short text."
+    assert truncate_text("Short text.", 0) == ""
+
+
+def test_truncate_text_prefers_paragraph_then_sentence_boundaries():
+    paragraphs = "First paragraph here.\n" + "Second paragraph is much longer than the first. " * 5
+    assert truncate_text(paragraphs, 10) == "First paragraph here."
+    assert truncate_text("One. Two two. Three three three.", 4) == "One."
+
+
+@pytest.mark.parametrize("text", [HINDI * 20, TELUGU * 20])
+def test_truncate_text_never_splits_indic_words(text):
+    trimmed = truncate_text(text, 25)
+    assert trimmed and estimate_tokens(trimmed) <= 25
+    assert set(trimmed.split()) <= set(text.split())
+
+
+def test_truncate_text_without_spaces_keeps_grapheme_clusters_whole():
+    trimmed = truncate_text("क्षत्रिय" * 30, 7)
+    assert estimate_tokens(trimmed) <= 7
+    last = trimmed[-1]
+    assert not unicodedata.category(last).startswith("M") and last != "्"
+
+
+def test_build_page_context_keeps_whole_pages_then_trims_one():
+    pages = [(1, "Plants make food. " * 10), (2, "Animals eat plants. " * 10), (3, "Never reached.")]
+    whole = build_page_context(pages)
+    assert whole.count("--- Page") == 3
+
+    context = build_page_context(pages, max_tokens=80)
+    assert "--- Page 1 ---" in context and "--- Page 2 ---" in context
+    assert "--- Page 3 ---" not in context
+    assert context.rstrip().endswith("Animals eat plants.")
+    assert estimate_tokens(context) <= 80
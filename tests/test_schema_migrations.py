@@ -0,0 +1,84 @@
+import sqlite3
+
+from sqlalchemy import inspect, text
+
+from app import create_app, db, init_db
+from schema_migrations import LEGACY_STUDENT_KEY, upgrade_schema
+
+# Tables as the first release created them, before student profiles and answer keys
+BASELINE_SCHEMA = """
+CREATE TABLE homework_session (
+    id INTEGER NOT NULL PRIMARY KEY, session_id VARCHAR(100) NOT NULL UNIQUE, subject VARCHAR(100) NOT NULL,
+    session_type VARCHAR(50), task_description TEXT, start_time DATETIME, end_time DATETIME, status VARCHAR(20),
+    total_questions INTEGER, total_hints_used INTEGER, total_attempts INTEGER, performance_score FLOAT,
+    created_date DATETIME
+);
+CREATE TABLE homework_question (
+    id INTEGER NOT NULL PRIMARY KEY, session_id INTEGER NOT NULL REFERENCES homework_session (id),
+    question_text TEXT NOT NULL, question_type VARCHAR(50), difficulty_level VARCHAR(20), start_time DATETIME,
+    end_time DATETIME, hints_used INTEGER, attempts_count INTEGER, final_answer TEXT, is_correct BOOLEAN,
+    evaluation_score FLOAT, created_date DATETIME
+);
+CREATE TABLE student_progress (
+    id INTEGER NOT NULL PRIMARY KEY, subject VARCHAR(100) NOT NULL, total_sessions INTEGER, total_questions INTEGER,
+    correct_answers INTEGER, partially_correct_answers INTEGER, total_hints_used INTEGER,
+    average_hints_per_question FLOAT, success_rate FLOAT, difficulty_level VARCHAR(20), last_updated DATETIME
+);
+INSERT INTO homework_session (id, session_id, subject) VALUES (1, 's1', 'Maths');
+INSERT INTO homework_question (id, session_id, question_text, is_correct, evaluation_score) VALUES (1, 1, '3/4 of 20?', 0, 0.2);
+INSERT INTO student_progress (id, subject, total_sessions, total_questions, correct_answers, partially_correct_answers, total_hints_used)
+    VALUES (1, 'Maths', 2, 4, 2, 0, 3), (2, 'Maths', 1, 2, 2, 0, 1), (3, 'Science', 1, 1, 1, 0, 0);
+"""
+
+
+def make_app(tmp_path):
+    path = tmp_path / "tutor.db"
+    with sqlite3.connect(path) as connection:
+        connection.executescript(BASELINE_SCHEMA)
+    return create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+
+
+def test_init_db_upgrades_a_baseline_database(tmp_path):
+    app = make_app(tmp_path)
+    init_db(app)
+
+    with app.app_context():
+        inspector = inspect(db.engine)
+        session_columns = {column["name"] for column in inspector.get_columns("homework_session")}
+        question_columns = {column["name"] for column in inspector.get_columns("homework_question")}
+        assert {"student_key", "document_id", "difficulty_level"} <= session_columns
+        assert {"position", "options", "correct_answer", "subject", "chapter", "topic"} <= question_columns
+        assert "uq_student_progress_student_subject" in {index["name"] for index in inspector.get_indexes("student_progress")}
+
+        assert db.session.execute(text("SELECT student_key FROM homework_session")).scalar() == LEGACY_STUDENT_KEY
+        assert db.session.execute(text("SELECT subject, position FROM homework_question")).one() == ("Maths", 0)
+        progress = db.session.execute(text(
+            "SELECT student_key, subject, total_sessions, total_questions, correct_answers "
+            "FROM student_progress ORDER BY subject"
+        )).all()
+        assert progress == [(LEGACY_STUDENT_KEY, "Maths", 3, 6, 4), (LEGACY_STUDENT_KEY, "Science", 1, 1, 1)]
+        assert db.session.execute(
+            text("SELECT COUNT(*) FROM student WHERE student_key = :key"), {"key": LEGACY_STUDENT_KEY}
+        ).scalar() == 1
+
+        assert upgrade_schema(db) == []
+
+
+def test_upgraded_database_serves_per_student_queries(tmp_path):
+    app = make_app(tmp_path)
+    init_db(app)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["student_key"] = LEGACY_STUDENT_KEY
+
+    response = client.get("/api/exam/weak-topics")
+
+    assert response.status_code == 200
+    assert response.get_json()["success"] is True
+
+
+def test_fresh_database_needs_no_upgrade(tmp_path):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'fresh.db'}"})
+    with app.app_context():
+        db.create_all()
+        assert upgrade_schema(db) == []
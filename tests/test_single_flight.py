@@ -0,0 +1,133 @@
+import os
+import time
+import threading
+
+import pytest
+
+from single_flight import SingleFlight, SingleFlightTimeout, make_key
+
+
+def test_make_key_separates_parts_and_namespaces():
+    assert make_key("quiz", "a", "b-c") != make_key("quiz", "a-b", "c")
+    assert make_key("quiz", 1) != make_key("tts", 1)
+    assert make_key("quiz", "a", "b") == make_key("quiz", "a", "b")
+
+
+def test_concurrent_callers_share_one_execution(tmp_path):
+    flight = SingleFlight(state_dir=str(tmp_path))
+    release = threading.Event()
+    calls, results = [], []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    def caller():
+        results.append(flight.do("key", work))
+
+    threads = [threading.Thread(target=caller) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == ["answer"] * 5
+
+
+def test_followers_get_the_leaders_error(tmp_path):
+    flight = SingleFlight(state_dir=str(tmp_path))
+    release = threading.Event()
+    errors = []
+
+    def work():
+        release.wait(5)
+        raise ValueError("boom")
+
+    def caller():
+        try:
+            flight.do("key", work)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=caller) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert errors == ["boom"] * 3
+
+
+def test_follower_times_out(tmp_path):
+    flight = SingleFlight(state_dir=str(tmp_path))
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: flight.do("key", lambda: release.wait(5)))
+    leader.start()
+    time.sleep(0.05)
+    try:
+        with pytest.raises(SingleFlightTimeout):
+            flight.do("key", lambda: "late", timeout=0.1)
+    finally:
+        release.set()
+        leader.join(5)
+
+
+def test_shared_calls_coalesce_across_workers_and_leave_no_lock_files(tmp_path):
+    # Two instances with one state directory stand in for two gunicorn workers
+    workers = [SingleFlight(state_dir=str(tmp_path), poll_interval=0.01) for _ in range(2)]
+    release = threading.Event()
+    calls, results = [], []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return {"audio": "a.mp3"}
+
+    def caller(worker):
+        results.append(worker.do("tts-key", work, shared=True))
+
+    threads = [threading.Thread(target=caller, args=(worker,)) for worker in workers]
+    threads[0].start()
+    time.sleep(0.1)
+    threads[1].start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == [{"audio": "a.mp3"}] * 2
+    assert sorted(os.listdir(tmp_path)) == ["tts-key.json"]
+
+
+def test_lock_files_do_not_accumulate(tmp_path):
+    flight = SingleFlight(state_dir=str(tmp_path))
+    for number in range(20):
+        flight.do(f"key-{number}", lambda: number, shared=True, share_result=lambda result: False)
+    assert os.listdir(tmp_path) == []
+
+
+def test_unshared_result_is_not_written(tmp_path):
+    flight = SingleFlight(state_dir=str(tmp_path))
+    assert flight.do("key", lambda: {"success": False}, shared=True,
+                     share_result=lambda result: result["success"]) == {"success": False}
+    assert not (tmp_path / "key.json").exists()
+
+
+def test_sweep_removes_expired_results_and_free_locks(tmp_path):
+    flight = SingleFlight(state_dir=str(tmp_path), result_ttl=60)
+    old = time.time() - 3600
+    for name in ("old.json", "old.json.abc.part", "abandoned.lock", "fresh.json"):
+        (tmp_path / name).write_text("{}")
+    for name in ("old.json", "old.json.abc.part", "abandoned.lock"):
+        os.utime(tmp_path / name, (old, old))
+
+    flight.do("new", lambda: 1, shared=True)
+
+    assert sorted(os.listdir(tmp_path)) == ["fresh.json", "new.json"]
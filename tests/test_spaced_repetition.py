@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import ReviewCard
+from spaced_repetition import MIN_EASE_FACTOR, describe_last_review, schedule_review
+
+NOW = datetime(2026, 1, 10, 9, 0)
+
+
+def new_card(**state):
+    fields = dict(ease_factor=2.5, interval_days=0, repetitions=0, lapses=0, due_at=NOW)
+    fields.update(state)
+    return ReviewCard(student_key="s", card_key="chapter:1", source="chapter", subject="Maths", topic="Fractions", **fields)
+
+
+def test_successful_reviews_follow_sm2_intervals():
+    card = new_card()
+    intervals = []
+    for _ in range(4):
+        schedule_review(card, 4, now=NOW)
+        intervals.append(card.interval_days)
+
+    assert intervals == [1, 6, 15, 38]
+    assert card.repetitions == 4
+    assert card.ease_factor == pytest.approx(2.5)
+    assert card.due_at == NOW + timedelta(days=38)
+    assert card.last_reviewed_at == NOW
+
+
+def test_perfect_recall_raises_ease_and_hard_recall_lowers_it():
+    easy, hard = new_card(), new_card()
+    schedule_review(easy, 5, now=NOW)
+    schedule_review(hard, 3, now=NOW)
+    assert easy.ease_factor == pytest.approx(2.6)
+    assert hard.ease_factor == pytest.approx(2.36)
+
+
+def test_lapse_restarts_the_card_but_keeps_reduced_ease():
+    card = new_card(ease_factor=2.5, interval_days=15, repetitions=3)
+    schedule_review(card, 2, now=NOW)
+
+    assert (card.repetitions, card.interval_days, card.lapses) == (0, 1, 1)
+    assert card.ease_factor == pytest.approx(2.18)
+    assert card.due_at == NOW + timedelta(days=1)
+
+
+def test_ease_never_drops_below_minimum_and_quality_is_clamped():
+    card = new_card(ease_factor=1.4)
+    schedule_review(card, -3, now=NOW)
+    assert card.ease_factor == MIN_EASE_FACTOR
+
+    schedule_review(card, 9, now=NOW)
+    assert card.ease_factor == pytest.approx(MIN_EASE_FACTOR + 0.1)
+
+
+@pytest.mark.parametrize("days_ago, text", [
+    (None, "Never"), (0, "Today"), (1, "1 day ago"), (3, "3 days ago"), (8, "1 week ago"), (21, "3 weeks ago"),
+])
+def test_describe_last_review(days_ago, text):
+    card = new_card(last_reviewed_at=None if days_ago is None else NOW - timedelta(days=days_ago))
+    assert describe_last_review(card, now=NOW) == text
@@ -4,11 +4,13 @@ import pygame
 import tempfile
 import time
 import logging
-from gtts import gTTS
 import speech_recognition as sr
 import re
 from models import Document, DocumentPage
 from app import db
+from gemini_client import generate_content
+from model_router import model_router
+from speech_synthesizer import speech_synthesizer
 
 # Import Gemini client
 try:
@@ -71,17 +73,12 @@ class VoiceTutor:
         try:
             voice_config = self.get_voice_config(subject)
             
-            # Create TTS object
-            tts = gTTS(
-                text=text,
-                lang=voice_config['lang'],
-                tld=voice_config['tld'],
-                slow=slow
-            )
+            audio = speech_synthesizer.synthesize(text, voice_config, slow=slow)
             
             # Save to temporary file
             with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as tmp_file:
-                tts.save(tmp_file.name)
+                tmp_file.write(audio)
+                tmp_file.flush()
                 
                 # Play the audio
                 pygame.mixer.music.load(tmp_file.name)
@@ -183,9 +180,12 @@ class VoiceTutor:
             Content: {content[:1000]}...
             """
             
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt
+            route = model_router.route('identify_key_topics')
+            response = generate_content(
+                self.client, 'identify_key_topics',
+                model=route.model,
+                contents=prompt,
+                config=route.config()
             )
             
             if response.text:
@@ -231,9 +231,12 @@ class VoiceTutor:
                 Provide only the question, no explanation.
                 """
             
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt
+            route = model_router.route('comprehension_question', subject)
+            response = generate_content(
+                self.client, 'comprehension_question',
+                model=route.model,
+                contents=prompt,
+                config=route.config()
             )
             
             if response.text:
@@ -283,9 +286,12 @@ class VoiceTutor:
                 🎯 Encourage the child while providing gentle guidance.
                 """
             
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt
+            route = model_router.route('encouragement', subject)
+            response = generate_content(
+                self.client, 'encouragement',
+                model=route.model,
+                contents=prompt,
+                config=route.config()
             )
             
             if response.text:
@@ -329,9 +335,12 @@ class VoiceTutor:
                 🎯 Make it fun and easy to understand with child-friendly language.
                 """
             
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt
+            route = model_router.route('simplify_content', subject)
+            response = generate_content(
+                self.client, 'simplify_content',
+                model=route.model,
+                contents=prompt,
+                config=route.config()
             )
             
             if response.text: